@@ -1,136 +1,578 @@
-import json
-import os
+import io
 import codecs
+import threading
 from math import sqrt
 
-import scipy
-from PIL import Image
+import numpy as np
 
-import _pymeanshift
+# PIL, scipy and the _pymeanshift extension are imported where they are used, so that importing the package
+# stays cheap for short-lived processes that may not need them
 from .distance import deltaE_ciede2000
-from .conversion import *
+from .lut import load_lut
+from .palette import Palette, get_palette, register_palette
+from .cache import ResultCache, cache_key
+from .progressive import count_progressive
+from .stream import StreamState, STREAM_THRESHOLD
+from .tiled import ColorCounts, count_tiled, tile_seams, TILED_TILE_SIZE, MARGIN, FUSE_RADIUS
+from .instrument import FindStats, NULL_STATS, print_stats
+from .backends import get_backend, MeanShiftBackend, KMeansBackend, HistogramBackend
+from .profiles import get_color_space, srgb_transform, register_color_space
+from .conversion import (RGB_TO_XYZ, XYZ_TO_RGB, WHITE_POINT, rgb_to_xyz_array, xyz_to_lab_array, lab_to_xyz_array,
+                         xyz_to_rgb_array, lab_to_rgb_array, rgb_to_lab_array, srgb_to_linear, linear_to_srgb,
+                         rgb_to_xyz, xyz_to_lab, lab_to_xyz, xyz_to_rgb, lab_to_rgb, rgb_to_lab, rgb_hash_array,
+                         rgb_dehash_array)
+
+# images are downsized so that their width and heigth are at most this many pixels
+MAX_DIMENSION = 300
+# images are decoded or reduced to no less than this many times the target size before the final resize,
+# so that the cheap scaling on decode does not show in the result
+REDUCING_GAP = 2
+
+# EXIF orientation tag and the transpositions that bring each orientation upright, as names of PIL.Image
+# constants
+EXIF_ORIENTATION = 0x0112
+ORIENTATION_TRANSPOSE = {
+    2: ['FLIP_LEFT_RIGHT'],
+    3: ['ROTATE_180'],
+    4: ['FLIP_TOP_BOTTOM'],
+    5: ['ROTATE_90', 'FLIP_TOP_BOTTOM'],
+    6: ['ROTATE_270'],
+    7: ['ROTATE_270', 'FLIP_TOP_BOTTOM'],
+    8: ['ROTATE_90'],
+}
 
 
 class ColorFinder:
-    def __init__(self, palette=None):
-        if palette is None:
-            colors_file = open(os.path.join(os.path.dirname(__file__), 'colorchecker_sg.json'))
-            self.palette = json.load(colors_file)
-        elif isinstance(palette, basestring) and palette.lower() == "colorchecker":
-            colors_file = open(os.path.join(os.path.dirname(__file__), 'colorchecker.json'))
-            self.palette = json.load(colors_file)
-        elif isinstance(palette, basestring) and palette.lower() == "colorchecker_sg":
-            colors_file = open(os.path.join(os.path.dirname(__file__), 'colorchecker_sg.json'))
-            self.palette = json.load(colors_file)
+    def __init__(self, palette=None, lut=None, lut_cache_dir=None, segment_threads=1, counting='sample',
+                 sample_grid=40, cache=None, max_concurrency=None, instrument=None, pyramid_levels=0,
+                 backend='meanshift', progressive=None):
+        # palettes are loaded once per process and shared by every ColorFinder, see colorfinder.palette
+        self.palette = get_palette(palette)
+        self.palette_lab = self.palette.lab
+        self.palette_labels = self.palette.labels
+        # large palettes are searched with a k-d tree instead of a distance matrix
+        self.palette_index = self.palette.index()
+
+        self.segment_threads = segment_threads
+
+        # 'sample' counts the colors of ~1500 pixels sampled from the segmented image,
+        # 'regions' counts every pixel exactly, using the colors and sizes of the segmented regions
+        self.counting = counting.lower()
+        if self.counting not in ('sample', 'regions'):
+            raise ValueError("'counting' parameter needs to be one of 'sample' or 'regions'")
+        # number of sampled pixels along each side of the image in 'sample' counting
+        if sample_grid < 1:
+            raise ValueError("'sample_grid' parameter needs to be a positive number")
+        self.sample_grid = sample_grid
+        # with a tolerance, the image is segmented and counted tile by tile until the found colors and their
+        # shares move by less than the tolerance, see colorfinder.progressive
+        if progressive is not None and progressive <= 0:
+            raise ValueError("'progressive' parameter needs to be a positive number")
+        self.progressive = progressive
+        # with pyramid levels, images are loaded at up to 2 ** pyramid_levels times MAX_DIMENSION, segmented at
+        # MAX_DIMENSION and the regions are refined back up to the loaded size
+        if pyramid_levels < 0:
+            raise ValueError("'pyramid_levels' parameter needs to be a non-negative number")
+
+        # segmentation backend, a name of colorfinder.backends.BACKENDS or a backend instance
+        if isinstance(backend, (str, type(u''))) and backend.lower() == 'meanshift':
+            self.backend = MeanShiftBackend(pyramid_levels=pyramid_levels)
         else:
-            self.palette = palette
+            self.backend = get_backend(backend)
+        # a mean-shift backend instance brings its own pyramid levels
+        self.pyramid_levels = getattr(self.backend, 'pyramid_levels', pyramid_levels)
+        self.max_dimension = MAX_DIMENSION * 2 ** self.pyramid_levels
+        if getattr(self.backend, 'max_dimension', None):
+            self.max_dimension = self.backend.max_dimension
+        # segmentation results are written into per-thread buffers that are reused across calls
+        self._buffers = threading.local()
+
+        # optional RGB -> palette lookup table, memory-mapped from a cache file shared between processes
+        self.lut = None
+        if lut is not None:
+            if lut.lower() not in ('full', 'quantized'):
+                raise ValueError("'lut' parameter needs to be one of 'full' or 'quantized'")
+            self.lut = load_lut(self.palette_lab, lut, cache_dir=lut_cache_dir)
+
+        # number of images find_async processes at once, further calls wait for a free place
+        if max_concurrency is None:
+            from multiprocessing import cpu_count
+            max_concurrency = cpu_count()
+        self.max_concurrency = max_concurrency
+        if self.max_concurrency < 1:
+            raise ValueError("'max_concurrency' parameter needs to be a positive number")
+
+        # optional hook called with the FindStats of every find call, nothing is measured without it
+        self.instrument = instrument
+
+        # optional ResultCache of find results, keyed by the image bytes and everything that affects the result
+        self.cache = cache
+        self._cache_params = {
+            'palette': self.palette.digest,
+            'lut': lut.lower() if lut is not None else None,
+            'counting': self.counting,
+            'sample_grid': self.sample_grid,
+            'pyramid_levels': self.pyramid_levels,
+            'progressive': self.progressive,
+            'backend': self.backend.params(),
+        }
 
     def closest_color(self, color, mode):
         if len(color) != 3:
             raise ValueError("'color' parameter needs to be 1D array of length 3")
 
+        labels, indices, distances = self.closest_colors([color], mode)
+        return self.palette[indices[0]], distances[0]
+
+    def closest_colors(self, colors, mode):
+        colors = np.asarray(colors, dtype=float)
+        if colors.ndim != 2 or colors.shape[1] != 3:
+            raise ValueError("'colors' parameter needs to be 2D array of shape (N, 3)")
+
         mode = mode.lower()
         if mode not in ('rgb', 'xyz', 'lab'):
             raise ValueError("'mode' parameter needs to be one of 'RGB', 'XYZ' or 'LAB'")
 
+        # 8-bit RGB colors are answered by the lookup table without any conversion or distance calculation
+        if mode == 'rgb' and self.lut is not None and np.all((colors >= 0) & (colors <= 255) & (colors % 1 == 0)):
+            indices, distances = self.lut.lookup(colors)
+            return self.palette_labels[indices], indices, distances
+
         if mode == 'xyz':
-            color = xyz_to_lab(color)
+            colors = xyz_to_lab_array(colors)
 
         if mode == 'rgb':
-            color = rgb_to_lab(color)
-
-        min_dist = float("inf")
-        best_color = None
-        for clr in self.palette:
-            color_dist = deltaE_ciede2000(color, clr['lab'])
-            if color_dist < min_dist:
-                min_dist = color_dist
-                best_color = clr
-
-        return best_color, min_dist
-
-    def find(self, image, color_space='sRGB', html_output=None):
-        color_space = color_space.lower()
-        if color_space not in ('srgb', 'adobe'):
-            raise ValueError("'color_space' parameter needs to be one of 'sRGB' or 'Adobe'")
-
-        im = Image.open(image)
-        im = downsize_image(im, 300)
-        width = im.size[0]
-        heigth = im.size[1]
-
-        # if color space is Adobe RGB, convert it to sRGB
-        if color_space == 'adobe':
-            print 'converting Adobe RGB to sRGB'
-            im = im.convert('RGB', (
-                0.57667, 0.18556, 0.18823, 0,
-                0.29734, 0.62736, 0.07529, 0,
-                0.02703, 0.07069, 0.99134, 0,
-            ))
-            im = im.convert('RGB', (
-                3.2406, -1.5372, -0.4986, 0,
-                -0.9689, 1.8758, 0.0415, 0,
-                0.0557, -0.2040, 1.0570, 0,
-            ))
-
-        print "applying mean-shift filter"
-        spatial_radius = tune_radius(width, heigth)
-        print("calculated spatial radius: %d" % spatial_radius)
-        sgm, labels_image, number_regions = segment(im, spatial_radius=spatial_radius,
-                                                    range_radius=8, min_density=300)
+            colors = rgb_to_lab_array(colors)
+
+        if self.palette_index is not None:
+            indices, distances = self.palette_index.match(colors)
+        else:
+            # (found colors x palette) distance matrix
+            dists = deltaE_ciede2000(colors[:, np.newaxis, :], self.palette_lab[np.newaxis, :, :],
+                                     chroma2=self.palette.chroma[np.newaxis, :])
+            indices = dists.argmin(axis=1)
+            distances = dists[np.arange(len(indices)), indices]
+
+        return self.palette_labels[indices], indices, distances
+
+    def find(self, image, color_space='sRGB', html_output=None, exif_orientation=False):
+        stats = self._new_stats()
+        if self.cache is None:
+            colors = self._find_uncached(image, color_space, exif_orientation, stats)
+        else:
+            with stats.stage('read'):
+                data = read_image_data(image)
+            params = dict(self._cache_params, color_space=get_color_space(color_space).name.lower(),
+                          exif_orientation=bool(exif_orientation))
+            key = cache_key(data, params)
+            colors = self.cache.get(key)
+            stats.count('cache_hit', colors is not None)
+            if colors is None:
+                colors = self._find_uncached(io.BytesIO(data), color_space, exif_orientation, stats)
+                self.cache.put(key, colors)
+
+        if html_output:
+            with codecs.open(html_output, 'w', 'utf-8') as html_file:
+                write_to_html(html_file, colors)
+
+        self._report(stats)
+        return colors
+
+    def _find_uncached(self, image, color_space, exif_orientation, stats):
+        im = load_image(image, color_space, exif_orientation=exif_orientation, stats=stats,
+                        max_dimension=self.max_dimension)
+        return self.find_in_array(np.asarray(im), stats=stats)
+
+    def find_in_array(self, ar, stats=None):
+        """Find colors in an sRGB image given as an array of shape (height, width, 3).
+
+Measurements go to stats if given, otherwise they are reported to the instrument hook when the call ends.
+"""
+        report = stats is None
+        if report:
+            stats = self._new_stats()
+        heigth, width = ar.shape[:2]
+        stats.count('pixels', heigth * width)
+
+        if self.progressive is not None:
+            colors = self._find_progressive(ar, stats)
+            if report:
+                self._report(stats)
+            return colors
+
+        stats.count('spatial_radius', tune_radius(width, heigth))
+        out_image, out_labels = self._segment_buffers(heigth, width)
+        with stats.stage('segment'):
+            sgm, labels_image, number_regions, region_colors, region_counts = self.backend.segment(
+                ar, tune_radius, threads=self.segment_threads, out_image=out_image, out_labels=out_labels)
 
         # save_image_from_array('after_filter.bmp', sgm)
 
-        # sample pixels
-        print("sampling pixels")
-        sgm = sgm.reshape(sgm.shape[0] * sgm.shape[1], sgm.shape[2])
-        sgm = get_sample(sgm, width, heigth, (width / 40) + 1, (heigth / 40) + 1)
-        print("%d pixels sampled" % sgm.shape[0])
-
-        # count pixels w.r.t colors
-        print("counting pixels")
-        counts = {}
-        for pixel in sgm:
-            rgbhash = rgb_hash(pixel)
-            if rgbhash in counts:
-                counts[rgbhash] += 1
-            else:
-                counts[rgbhash] = 1
+        if self.counting == 'regions':
+            # count pixels w.r.t colors, regions may share a color
+            with stats.stage('count'):
+                total = heigth * width
+                keys, counts = count_colors(region_colors, weights=region_counts)
+        else:
+            # sample pixels and count them w.r.t colors
+            with stats.stage('count'):
+                sgm = get_sample(sgm, (width // self.sample_grid) + 1, (heigth // self.sample_grid) + 1)
+                total = sgm.shape[0]
+                keys, counts = count_colors(sgm)
+            stats.count('samples', total)
+        stats.count('regions', number_regions)
+        stats.count('distinct_colors', len(keys))
 
         # match colors with the predefined colors
-        print("matching found colors with predefined colors")
-        colors = {}
-        for rgbhash in counts:
-            if counts[rgbhash] > sgm.shape[0] * 0.02:
-                (color, dist) = self.closest_color(rgb_dehash(rgbhash), 'rgb')
-                print color, dist
+        with stats.stage('match'):
+            colors = {}
+            found = counts > total * 0.02
+            found_counts = counts[found].tolist()
+            labels, indices, distances = self.closest_colors(rgb_dehash_array(keys[found]), 'rgb')
+            for count, index in zip(found_counts, indices):
+                color = self.palette[index]
                 if color['label'] in colors:
-                    colors[color['label']]['count'] += counts[rgbhash]
+                    colors[color['label']]['count'] += count
                 else:
-                    colors[color['label']] = {'count': counts[rgbhash], 'lab': color['lab'],
+                    colors[color['label']] = {'count': count, 'lab': color['lab'],
                                               'rgb': lab_to_rgb(color['lab'])}
+        stats.count('candidates', len(found_counts))
 
         # delete colors that have a close neighbour with bigger pixel count
-        print("deleting colors that have a close neighbour with bigger pixel count")
-        for c1 in colors.keys():
-            for c2 in colors.keys():
-                if c1 != c2 and c1 in colors.keys() and c2 in colors.keys():
-                    dist = deltaE_ciede2000(colors[c1]['lab'], colors[c2]['lab'])
-                    if dist < 10.0:
-                        if colors[c1]['count'] < colors[c2]['count']:
-                            del colors[c1]
-                        else:
-                            del colors[c2]
-
-        print("processing finished")
+        with stats.stage('prune'):
+            prune_colors(colors)
+        stats.count('colors', len(colors))
 
-        if html_output:
-            print("generation html file")
-            with codecs.open(html_output, 'w', 'utf-8') as html_file:
-                write_to_html(html_file, colors)
+        if report:
+            self._report(stats)
+        return colors
 
+    def _find_progressive(self, ar, stats):
+        """Find colors counting the regions of tiles of the image until the counts converge, see count_progressive.
+
+Regions are matched with the palette tile by tile, and counts are numbers of pixels of the segmented tiles.
+Every color has a 'consumed' entry, the fraction of the image that was segmented.
+"""
+        heigth, width = ar.shape[:2]
+        count_tile = self._tile_counter(tune_radius(width, heigth), stats)
+        counts, consumed = count_progressive(ar, count_tile, len(self.palette), self.progressive)
+        consumed_fraction = consumed / float(heigth * width)
+        stats.count('consumed', consumed_fraction)
+        return self._palette_colors(counts, consumed, stats, consumed=consumed_fraction)
+
+    def _palette_colors(self, counts, total, stats, **entries):
+        """The find result of pixel counts by palette index, out of total pixels, with entries added to every
+color."""
+        with stats.stage('match'):
+            colors = {}
+            found = np.flatnonzero(counts > total * 0.02)
+            for index in found:
+                color = self.palette[index]
+                # palette entries may share a label
+                if color['label'] in colors:
+                    colors[color['label']]['count'] += int(counts[index])
+                else:
+                    colors[color['label']] = dict(entries, count=int(counts[index]), lab=color['lab'],
+                                                  rgb=lab_to_rgb(color['lab']))
+        stats.count('candidates', len(found))
+
+        with stats.stage('prune'):
+            prune_colors(colors)
+        stats.count('colors', len(colors))
         return colors
 
+    def find_stream(self, frames, color_space='sRGB', exif_orientation=False, threshold=STREAM_THRESHOLD):
+        """Find colors in a sequence of frames, such as those of a video, yielding the colors of every frame.
+
+Frames are images as given to find, or sRGB arrays of shape (height, width, 3), and are downsized the same way.
+Each frame is segmented tile by tile, and a tile whose pixels moved by at most threshold 8-bit levels on average
+since it was last segmented keeps the colors counted then, so the cost follows how much the scene changes
+rather than the number of frames. A frame where no tile changed yields the colors of the previous one.
+Region colors are matched with the palette once per stream. Counts are numbers of pixels of the segmented
+tiles, as in progressive counting.
+"""
+        state = None
+        colors = None
+        for frame in frames:
+            stats = self._new_stats()
+            if isinstance(frame, np.ndarray):
+                ar = frame
+                if max(ar.shape[:2]) > self.max_dimension:
+                    from PIL import Image
+
+                    with stats.stage('decode'):
+                        ar = np.asarray(downsize_image(Image.fromarray(ar), self.max_dimension))
+            else:
+                ar = np.asarray(load_image(frame, color_space, exif_orientation=exif_orientation, stats=stats,
+                                           max_dimension=self.max_dimension))
+            heigth, width = ar.shape[:2]
+            stats.count('pixels', heigth * width)
+
+            # frames of another size start over
+            if state is None or state.shape != ar.shape:
+                state = StreamState(ar.shape)
+                colors = None
+            changed = state.changed(ar, threshold)
+            stats.count('changed_tiles', len(changed))
+            if changed or colors is None:
+                # region colors seen in earlier frames are not matched again
+                count_tile = self._tile_counter(tune_radius(width, heigth), stats,
+                                                lambda keys: state.match(keys, self._match_keys))
+                state.update(ar, count_tile, changed)
+                colors = self._palette_colors(state.counts(len(self.palette)), heigth * width, stats)
+
+            self._report(stats)
+            yield dict((label, dict(color)) for label, color in colors.items())
+
+    def _tile_counter(self, radius, stats, match_keys=None):
+        """The count_tile of progressive and stream counting, which segments a tile with the spatial radius of the
+whole image and returns the palette indices and the pixel counts of its region colors. match_keys maps
+rgb_hash_array keys to palette indices, with closest_colors by default."""
+        if match_keys is None:
+            match_keys = self._match_keys
+
+        def count_tile(tile):
+            with stats.stage('segment'):
+                _, _, _, region_colors, region_counts = self.backend.segment(
+                    np.ascontiguousarray(tile), lambda w, h: radius, threads=self.segment_threads)
+            with stats.stage('count'):
+                keys, counts = count_colors(region_colors, weights=region_counts)
+            with stats.stage('match'):
+                indices = match_keys(keys)
+            return indices, counts
+        return count_tile
+
+    def _match_keys(self, keys):
+        return self.closest_colors(rgb_dehash_array(keys), 'rgb')[1]
+
+    def _new_stats(self):
+        return NULL_STATS if self.instrument is None else FindStats()
+
+    def _report(self, stats):
+        if stats is not NULL_STATS:
+            stats.finish()
+            self.instrument(stats)
+
+    def _segment_buffers(self, heigth, width):
+        size = heigth * width
+        buffers = self._buffers
+        if getattr(buffers, 'labels', None) is None or buffers.labels.size < size:
+            capacity = max(size, MAX_DIMENSION * MAX_DIMENSION)
+            buffers.image = np.empty(capacity * 3, dtype=np.uint8)
+            buffers.labels = np.empty(capacity, dtype=np.intc)
+        return buffers.image[:size * 3].reshape(heigth, width, 3), buffers.labels[:size].reshape(heigth, width)
+
+    def find_tiled(self, image, color_space='sRGB', exif_orientation=False, max_dimension=None,
+                   tile_size=TILED_TILE_SIZE, margin=MARGIN, max_workers=None, fuse_radius=FUSE_RADIUS):
+        """Find colors in a large image at up to max_dimension pixels (its full size by default), tile by tile.
+
+image is an image file or an array of shape (height, width, 3), which may be memory-mapped, e.g. with
+np.load(path, mmap_mode='r'), and is then only read a tile at a time. Arrays are not downsized, max_dimension
+only applies to image files, which PIL decodes whole (JPEG files at a reduced scale when max_dimension allows),
+so their decoded pixels take 3 bytes per pixel besides the tiles. Each tile is converted to sRGB and segmented
+with margin pixels of its neighbours around it, on max_workers threads (one per core by default), and the color
+counts of the tiles are merged, so the memory of the segmentation is bounded by the tile size rather than the
+image size. Regions stop at the tile margins, so before matching, the region colors of neighbouring tiles that
+meet along a seam and are closer than fuse_radius in L*a*b* are fused into their mean weighted by their counts,
+as the region fusion of the whole image would fuse them, see ColorCounts.fuse; a fuse_radius of 0 turns this
+off. The merged colors are matched with the palette and pruned once. Counts are numbers of pixels, as with
+counting='regions'.
+
+The filter of the whole image can also move pixels towards modes farther away than the margins, e.g. along a
+lighting gradient, which no fusion of the tiles recovers, so results still differ from find_in_array on the
+whole image: with 256 pixel tiles, the colors of the samples at full size agree with the whole image's by 0.67
+on average, see python -m colorfinder.benchmark --tiled.
+"""
+        stats = self._new_stats()
+        space = get_color_space(color_space)
+        transform = None if space.name.lower() == 'srgb' else srgb_transform(space.name)
+        if isinstance(image, np.ndarray):
+            if max_dimension is not None:
+                raise ValueError("'max_dimension' parameter needs to be None for arrays, which are not downsized")
+            source = image
+            heigth, width = image.shape[:2]
+        else:
+            with stats.stage('decode'):
+                source = decode_image(image, max_dimension, exif_orientation)
+                # loaded once here, not by the first crop of every thread
+                source.load()
+            width, heigth = source.size
+        stats.count('pixels', heigth * width)
+        radius = tune_radius(width, heigth)
+
+        def count_tile(outer, inner):
+            top, bottom, left, right = outer
+            if isinstance(source, np.ndarray):
+                tile = np.ascontiguousarray(source[top:bottom, left:right, :3], dtype=np.uint8)
+            else:
+                tile = np.asarray(source.crop((left, top, right, bottom)))
+            if transform is not None:
+                with stats.stage('convert'):
+                    tile = transform.apply(tile)
+            out_image, out_labels = self._segment_buffers(bottom - top, right - left)
+            with stats.stage('segment'):
+                _, labels, number_regions, region_colors, region_counts = self.backend.segment(
+                    tile, lambda w, h: radius, threads=self.segment_threads, out_image=out_image,
+                    out_labels=out_labels)
+            # count the regions over the tile without its margins
+            with stats.stage('count'):
+                inner_top, inner_bottom, inner_left, inner_right = inner
+                inner_labels = labels[inner_top:inner_bottom, inner_left:inner_right]
+                keys, counts = count_colors(region_colors,
+                                            weights=np.bincount(inner_labels.ravel(), minlength=number_regions))
+                seams = tile_seams(rgb_hash_array(region_colors)[inner_labels], top + inner_top, left + inner_left)
+            return ColorCounts(keys[counts > 0], counts[counts > 0], seams)
+
+        if max_workers is None:
+            from multiprocessing import cpu_count
+
+            max_workers = cpu_count()
+        merged = count_tiled(heigth, width, count_tile, tile_size, margin, max_workers)
+        stats.count('distinct_colors', len(merged))
+        if fuse_radius:
+            with stats.stage('fuse'):
+                merged = merged.fuse(fuse_radius)
+            stats.count('fused_colors', len(merged))
+
+        with stats.stage('match'):
+            labels, indices, distances = self.closest_colors(rgb_dehash_array(merged.keys), 'rgb')
+            counts = np.bincount(indices, weights=merged.counts, minlength=len(self.palette)).round().astype(np.int64)
+        colors = self._palette_colors(counts, heigth * width, stats)
+        self._report(stats)
+        return colors
+
+    def find_async(self, image, color_space='sRGB', exif_orientation=False, executor=None):
+        """Coroutine of find for asyncio, see colorfinder.aio.find_async. Requires Python 3.7."""
+        from .aio import find_async
+        return find_async(self, image, color_space, exif_orientation, executor)
+
+    def find_many_async(self, images, color_space='sRGB', exif_orientation=False, executor=None, ordered=True):
+        """Asynchronous generator of find_many for asyncio, see colorfinder.aio.find_many_async."""
+        from .aio import find_many_async
+        return find_many_async(self, images, color_space, exif_orientation, executor, ordered)
+
+    def find_many(self, images, color_space='sRGB', max_workers=None, ordered=True, exif_orientation=False):
+        """Find colors in several images on a pool of threads, yielding (image, colors) pairs.
+
+Segmentation releases the GIL, so the threads of a single process can keep all cores busy.
+Results are yielded in the order of images, or as they complete if ordered is False.
+"""
+        from multiprocessing import cpu_count
+        from multiprocessing.pool import ThreadPool
+
+        if max_workers is None:
+            max_workers = cpu_count()
+
+        def find_one(image):
+            return image, self.find(image, color_space=color_space, exif_orientation=exif_orientation)
+
+        pool = ThreadPool(max_workers)
+        try:
+            if ordered:
+                results = pool.imap(find_one, images)
+            else:
+                results = pool.imap_unordered(find_one, images)
+            for result in results:
+                yield result
+        finally:
+            pool.terminate()
+
+
+def prune_colors(colors, min_distance=10.0):
+    """Delete the colors of a find result that have a neighbour closer than min_distance with a bigger count."""
+    for c1 in list(colors):
+        for c2 in list(colors):
+            if c1 != c2 and c1 in colors and c2 in colors:
+                dist = deltaE_ciede2000(colors[c1]['lab'], colors[c2]['lab'])
+                if dist < min_distance:
+                    if colors[c1]['count'] < colors[c2]['count']:
+                        del colors[c1]
+                    else:
+                        del colors[c2]
+    return colors
+
+
+def load_image(image, color_space='sRGB', exif_orientation=False, stats=NULL_STATS, max_dimension=MAX_DIMENSION):
+    """Open an image file, downsize it to max_dimension and convert it to sRGB, returning a PIL image."""
+    space = get_color_space(color_space)
+
+    with stats.stage('decode'):
+        im = decode_image(image, max_dimension, exif_orientation)
+
+    # if the image is in another color space, e.g. Adobe RGB, convert it to sRGB in one pass
+    if space.name.lower() != 'srgb':
+        from PIL import Image
+
+        with stats.stage('convert'):
+            ar = np.asarray(im)
+            im = Image.fromarray(srgb_transform(space.name).apply(ar))
+
+    return im
+
+
+def read_image_data(image):
+    """The bytes of an image given as a file name or a file object."""
+    if hasattr(image, 'read'):
+        return image.read()
+    with open(image, 'rb') as image_file:
+        return image_file.read()
+
+
+def decode_image(image, maxd, exif_orientation=False):
+    """Open an image file as an RGB image downsized to at most maxd pixels wide and high.
+
+Large images are not decoded at full size: JPEG files are decoded at a reduced scale, other formats are
+reduced by an integer factor first, and only the remaining pixels are resized. A maxd of None keeps the full
+size. With exif_orientation, the image is rotated upright according to its EXIF orientation tag.
+"""
+    from PIL import Image
+
+    im = Image.open(image)
+    orientation = _exif_orientation(im) if exif_orientation else None
+
+    # JPEG DCT scaling, a no-op for other formats
+    if maxd is not None:
+        target = _target_size(im.size, maxd * REDUCING_GAP)
+        if target != im.size:
+            im.draft('RGB', target)
+
+    # CMYK, palette, gray and 16-bit images are converted before resizing, so they are resampled as RGB
+    if im.mode != 'RGB':
+        im = im.convert('RGB')
+
+    if maxd is not None:
+        factor = max(im.size) // (maxd * REDUCING_GAP)
+        if factor > 1 and hasattr(im, 'reduce'):
+            im = im.reduce(factor)
+        im = downsize_image(im, maxd)
+
+    for method in ORIENTATION_TRANSPOSE.get(orientation, []):
+        im = im.transpose(getattr(Image, method))
+    return im
+
+
+def _target_size(size, maxd):
+    w, h = size
+    if max(w, h) <= maxd:
+        return size
+    if w > h:
+        return maxd, max(h * maxd // w, 1)
+    return max(w * maxd // h, 1), maxd
+
+
+def _exif_orientation(im):
+    try:
+        if hasattr(im, 'getexif'):
+            exif = im.getexif()
+        else:
+            exif = im._getexif()
+    except Exception:
+        # missing or broken EXIF data leaves the image as it is
+        return None
+    if not exif:
+        return None
+    return exif.get(EXIF_ORIENTATION)
+
 
 def tune_radius(width, heigth):
     smaller = width if width < heigth else heigth
@@ -138,18 +580,31 @@ def tune_radius(width, heigth):
 
 
 def save_image_from_array(path, ar):
-    fp = open(path, 'w')
+    from PIL import Image
+
+    fp = open(path, 'wb')
     filtered_image = Image.fromarray(ar)
     filtered_image.save(fp)
     fp.close()
 
 
-def get_sample(ar, width, heigth, step_x, step_y):
-    sample = []
-    for x in range(0, width, step_x):
-        for y in range(0, heigth, step_y):
-            sample.append(ar[x * y])
-    return scipy.array(sample)
+def get_sample(ar, step_x, step_y):
+    """Sample the pixels of an image of shape (height, width, 3) on a grid, returning an array of shape (N, 3)."""
+    ar = np.asarray(ar)
+    return ar[::step_y, ::step_x].reshape(-1, ar.shape[-1])
+
+
+def count_colors(colors, weights=None):
+    """Count the distinct colors of an (N, 3) array of 8-bit RGB colors.
+
+Returns the sorted hashes of the distinct colors and their counts. If weights is given, a color counts
+as the sum of its weights instead of the number of its occurrences.
+"""
+    keys, inverse = np.unique(rgb_hash_array(colors), return_inverse=True)
+    counts = np.bincount(inverse, weights=weights, minlength=len(keys))
+    if weights is not None:
+        counts = counts.round().astype(np.int64)
+    return keys, counts
 
 
 def rgb_hash(rgb):
@@ -164,6 +619,8 @@ def rgb_dehash(rgbhash):
 
 
 def downsize_image(im, maxd):
+    from PIL import Image
+
     if im.size[0] > im.size[1]:
         if im.size[0] > maxd:
             w = maxd
@@ -196,5 +653,10 @@ def write_to_html(fp, colors):
     fp.write(html)
 
 
-def segment(image, spatial_radius, range_radius, min_density):
-    return _pymeanshift.segment(image, spatial_radius, range_radius, min_density, _pymeanshift.SPEEDUP_HIGH)
+def segment(image, spatial_radius, range_radius, min_density, threads=1, out_image=None, out_labels=None,
+            return_regions=False):
+    import _pymeanshift
+
+    return _pymeanshift.segment(image, spatial_radius, range_radius, min_density, _pymeanshift.SPEEDUP_HIGH,
+                                threads=threads, out_image=out_image, out_labels=out_labels,
+                                return_regions=return_regions)
@@ -0,0 +1,247 @@
+"""Find colors in a batch of images.
+
+Usage: python -m colorfinder [options] INPUT [INPUT ...]
+       python -m colorfinder serve [options]
+
+Inputs can be image files, directories (searched recursively) or glob patterns. More inputs can
+be listed one per line in a file given with --files-from. Images are decoded and downsized on a
+prefetch thread, and handed to a pool of worker processes through shared memory, which segment
+and match them. Results are written as JSON lines or CSV rows as soon as each image finishes.
+
+The serve command runs an HTTP service instead, see colorfinder.server.
+"""
+from __future__ import print_function
+import os
+import sys
+import csv
+import glob
+import json
+import argparse
+import threading
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+from multiprocessing import Pool, RawArray, cpu_count
+
+import numpy as np
+
+from . import ColorFinder, load_image, MAX_DIMENSION
+from .instrument import print_stats
+from .palette import get_palette
+from .profiles import COLOR_SPACES
+
+# size of a shared memory slot, enough for any downsized RGB image
+SLOT_SIZE = MAX_DIMENSION * MAX_DIMENSION * 3
+
+CSV_FIELDS = ['image', 'label', 'count', 'rgb_r', 'rgb_g', 'rgb_b', 'lab_l', 'lab_a', 'lab_b']
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ['serve']:
+        from .server import main as serve_main
+        return serve_main(argv[1:])
+
+    parser = argparse.ArgumentParser(prog='python -m colorfinder', description='Find major colors in images.')
+    parser.add_argument('inputs', nargs='*', metavar='INPUT', help='image file, directory or glob pattern')
+    parser.add_argument('--files-from', metavar='FILE', help="read more inputs from FILE, one per line ('-' for stdin)")
+    parser.add_argument('--palette', default='colorchecker_sg',
+                        help="'colorchecker', 'colorchecker_sg' or a palette JSON or .npz file")
+    parser.add_argument('--color-space', default='sRGB', choices=sorted(space.name for space in COLOR_SPACES.values()),
+                        help='color space of the images')
+    parser.add_argument('--exif-orientation', action='store_true', help='rotate images upright by their EXIF tag')
+    parser.add_argument('--lut', choices=['full', 'quantized'], help='match colors through a cached lookup table')
+    parser.add_argument('--lut-cache-dir', help='directory of the lookup table cache')
+    parser.add_argument('--workers', type=int, default=cpu_count(), help='number of worker processes')
+    parser.add_argument('--prefetch', type=int, default=2, help='number of decoded images per worker to keep ready')
+    parser.add_argument('--stats', action='store_true', help='write stage times and counts of every image to stderr')
+    parser.add_argument('--format', default='jsonl', choices=['jsonl', 'csv'], help='output format')
+    parser.add_argument('-o', '--output', help='output file (default: stdout)')
+    args = parser.parse_args(argv)
+
+    inputs = list(args.inputs)
+    if args.files_from:
+        list_file = sys.stdin if args.files_from == '-' else open(args.files_from)
+        inputs.extend(line.strip() for line in list_file if line.strip())
+        if list_file is not sys.stdin:
+            list_file.close()
+    if not inputs:
+        parser.error('no inputs given')
+
+    # loaded here once, the workers share it
+    try:
+        get_palette(args.palette)
+    except ValueError as e:
+        parser.error(str(e))
+    output = sys.stdout if args.output is None else _open_output(args.output)
+    try:
+        if args.format == 'csv':
+            writer = CSVWriter(output)
+        else:
+            writer = JSONLinesWriter(output)
+        failed = 0
+        for path, colors, error in run(expand_inputs(inputs), args.palette, args.color_space, args.lut,
+                                       args.lut_cache_dir, args.workers, args.prefetch,
+                                       args.exif_orientation, args.stats):
+            if error is not None:
+                failed += 1
+                print('%s: %s' % (path, error), file=sys.stderr)
+            writer.write(path, colors, error)
+    finally:
+        if args.output is not None:
+            output.close()
+
+    return 1 if failed else 0
+
+
+def _open_output(path):
+    # the writers write str, bytes on Python 2 and text on Python 3; csv ends its own lines
+    if sys.version_info[0] < 3:
+        return open(path, 'wb')
+    return open(path, 'w', newline='')
+
+
+def expand_inputs(inputs):
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    yield os.path.join(root, name)
+        elif os.path.exists(item):
+            yield item
+        else:
+            matches = sorted(glob.glob(item))
+            if not matches:
+                print('%s: no such file' % item, file=sys.stderr)
+            for path in matches:
+                if os.path.isfile(path):
+                    yield path
+
+
+def run(paths, palette, color_space='sRGB', lut=None, lut_cache_dir=None, workers=None, prefetch=2,
+        exif_orientation=False, stats=False):
+    """Find colors in the images at paths, yielding (path, colors, error) tuples as they finish."""
+    if workers is None:
+        workers = cpu_count()
+    slots = [RawArray('B', SLOT_SIZE) for _ in range(workers * (prefetch + 1))]
+    free_slots = Queue()
+    for slot in range(len(slots)):
+        free_slots.put(slot)
+    finished = Queue()
+
+    pool = Pool(workers, initializer=_init_worker, initargs=(slots, palette, lut, lut_cache_dir, stats))
+    try:
+        decoder = threading.Thread(target=_decode, args=(paths, color_space, exif_orientation, slots, free_slots,
+                                                         finished, pool))
+        decoder.daemon = True
+        decoder.start()
+
+        submitted = None
+        done = 0
+        while submitted is None or done < submitted:
+            item = finished.get()
+            if item[0] is _END:
+                submitted, error = item[1:]
+                # the inputs could not be listed, e.g. an unreadable --files-from file
+                if error is not None:
+                    raise error
+                continue
+            path, slot, colors, error = item
+            if slot is not None:
+                free_slots.put(slot)
+            done += 1
+            yield path, colors, error
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+class JSONLinesWriter(object):
+    def __init__(self, fp):
+        self.fp = fp
+
+    def write(self, path, colors, error):
+        if error is None:
+            record = {'image': path, 'colors': colors}
+        else:
+            record = {'image': path, 'error': error}
+        self.fp.write(json.dumps(record, sort_keys=True) + '\n')
+        self.fp.flush()
+
+
+class CSVWriter(object):
+    def __init__(self, fp):
+        self.fp = fp
+        self.writer = csv.writer(fp)
+        self.writer.writerow(CSV_FIELDS)
+
+    def write(self, path, colors, error):
+        if error is not None:
+            return
+        for label in sorted(colors):
+            color = colors[label]
+            self.writer.writerow([path, label, color['count']] + list(color['rgb']) + list(color['lab']))
+        self.fp.flush()
+
+
+_END = object()
+
+
+def _decode(paths, color_space, exif_orientation, slots, free_slots, finished, pool):
+    # runs on the prefetch thread, blocks when all slots are in use so decoding stays ahead of the workers.
+    # _END is always queued, with the error that stopped the iteration of paths if any, so run never waits
+    # for a thread that died
+    submitted = 0
+    error = None
+    try:
+        for path in paths:
+            slot = free_slots.get()
+            submitted += 1
+            try:
+                ar = np.asarray(load_image(path, color_space, exif_orientation))
+                if ar.ndim != 3 or ar.shape[2] != 3:
+                    raise ValueError('not an RGB image')
+                _slot_array(slots[slot], ar.shape)[...] = ar
+            except Exception as e:
+                free_slots.put(slot)
+                finished.put((path, None, None, _error_message(e)))
+                continue
+            pool.apply_async(_process_slot, (path, slot, ar.shape), callback=finished.put)
+    except Exception as e:
+        error = e
+    finally:
+        finished.put((_END, submitted, error))
+
+
+def _slot_array(slot, shape):
+    return np.frombuffer(slot, dtype=np.uint8, count=shape[0] * shape[1] * shape[2]).reshape(shape)
+
+
+def _error_message(e):
+    return '%s: %s' % (type(e).__name__, e)
+
+
+_worker = {}
+
+
+def _init_worker(slots, palette, lut, lut_cache_dir, stats):
+    _worker['slots'] = slots
+    _worker['finder'] = ColorFinder(palette, lut=lut, lut_cache_dir=lut_cache_dir,
+                                    instrument=print_stats if stats else None)
+
+
+def _process_slot(path, slot, shape):
+    # runs in a worker process, the pixels are read in place from the shared slot
+    try:
+        colors = _worker['finder'].find_in_array(_slot_array(_worker['slots'][slot], shape))
+    except Exception as e:
+        return path, slot, None, _error_message(e)
+    return path, slot, colors, None
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""asyncio interface of ColorFinder, requires Python 3.7 or newer.
+
+Image files are read and segmented on an executor, so the event loop is never blocked. Every ColorFinder
+limits the number of images being processed at once to its max_concurrency, further calls wait for a free
+place before reading their image, so a burst of requests cannot queue up unbounded work and memory.
+"""
+import io
+import asyncio
+import weakref
+import collections
+
+from . import read_image_data
+
+# per finder, the event loop and the semaphore that limits its concurrency on that loop
+_limits = weakref.WeakKeyDictionary()
+
+
+async def find_async(finder, image, color_space='sRGB', exif_orientation=False, executor=None):
+    """Find colors in an image given as a file name, a file object or the bytes of the file.
+
+The work runs on executor, or on the default executor of the event loop if it is None.
+"""
+    loop = asyncio.get_running_loop()
+    async with _limit(finder, loop):
+        if isinstance(image, bytes):
+            data = image
+        else:
+            data = await loop.run_in_executor(executor, read_image_data, image)
+        return await loop.run_in_executor(executor, _find, finder, data, color_space, exif_orientation)
+
+
+async def find_many_async(finder, images, color_space='sRGB', exif_orientation=False, executor=None,
+                          ordered=True):
+    """Find colors in several images, yielding (image, colors) pairs.
+
+Results are yielded in the order of images, or as they complete if ordered is False. Images are taken from
+the iterable only as places free up, so it can be long or endless.
+"""
+    window = finder.max_concurrency
+    pending = collections.deque()
+    images = iter(images)
+    exhausted = False
+
+    async def find_one(image):
+        return image, await find_async(finder, image, color_space, exif_orientation, executor)
+
+    try:
+        while True:
+            while not exhausted and len(pending) < window:
+                try:
+                    image = next(images)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.append(asyncio.ensure_future(find_one(image)))
+            if not pending:
+                return
+
+            if ordered:
+                task = pending.popleft()
+                yield await task
+            else:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.remove(task)
+                    yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def _limit(finder, loop):
+    entry = _limits.get(finder)
+    if entry is None or entry[0] is not loop:
+        entry = (loop, asyncio.Semaphore(finder.max_concurrency))
+        _limits[finder] = entry
+    return entry[1]
+
+
+def _find(finder, data, color_space, exif_orientation):
+    return finder.find(io.BytesIO(data), color_space=color_space, exif_orientation=exif_orientation)
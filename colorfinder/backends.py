@@ -0,0 +1,170 @@
+from __future__ import division
+import numpy as np
+
+from .conversion import rgb_to_lab_array, lab_to_rgb_array, rgb_hash_array, rgb_dehash_array
+from .pyramid import segment_pyramid, COARSE_DIMENSION
+
+# Segmentation backends split an RGB image of shape (height, width, 3) into regions of a single color. Their
+# segment method returns the image of region colors, the labels of shape (height, width), the number of
+# regions, the region colors as an (n, 3) uint8 array and the region sizes in pixels, like
+# colorfinder.segment with return_regions. Results may be written into the out_image and out_labels arrays.
+# params returns what the results depend on, for cache keys. A backend whose cost does not grow with the image
+# size may have a max_dimension attribute, the size ColorFinder loads images at instead of MAX_DIMENSION.
+
+# speedup levels of the mean-shift filter, the values of the SPEEDUP_* constants of _pymeanshift
+SPEEDUP_NO = 0
+SPEEDUP_MEDIUM = 1
+SPEEDUP_HIGH = 2
+
+
+class MeanShiftBackend(object):
+    """Mean-shift filtering and region fusing of the pymeanshift library, optionally on a pyramid."""
+
+    name = 'meanshift'
+
+    def __init__(self, range_radius=8, min_density=300, speedup=SPEEDUP_HIGH, pyramid_levels=0):
+        self.range_radius = range_radius
+        self.min_density = min_density
+        self.speedup = speedup
+        self.pyramid_levels = pyramid_levels
+
+    def params(self):
+        return {'backend': self.name, 'range_radius': self.range_radius, 'min_density': self.min_density,
+                'speedup': self.speedup, 'pyramid_levels': self.pyramid_levels}
+
+    def segment(self, ar, tune_radius, threads=1, out_image=None, out_labels=None):
+        import _pymeanshift
+
+        heigth, width = ar.shape[:2]
+        if self.pyramid_levels and max(heigth, width) > COARSE_DIMENSION:
+            return segment_pyramid(ar, self.pyramid_levels, tune_radius, self.range_radius, self.min_density,
+                                   self.speedup, threads=threads, out_image=out_image, out_labels=out_labels)
+        return _pymeanshift.segment(ar, tune_radius(width, heigth), self.range_radius, self.min_density,
+                                    self.speedup, threads=threads, out_image=out_image, out_labels=out_labels,
+                                    return_regions=True)
+
+
+class KMeansBackend(object):
+    """k-means clustering of the pixel colors in L*a*b*, with scipy.cluster.vq.
+
+The clusters are fitted on at most sample_size pixels taken on a grid, starting from pixels spread evenly
+over the sample sorted by lightness, so results are deterministic. Every pixel is then assigned to the
+closest cluster. Regions are clusters, they are not spatially connected.
+"""
+
+    name = 'kmeans'
+
+    def __init__(self, clusters=8, sample_size=4096, iterations=10):
+        if clusters < 1:
+            raise ValueError("'clusters' parameter needs to be a positive number")
+        self.clusters = clusters
+        self.sample_size = sample_size
+        self.iterations = iterations
+
+    def params(self):
+        return {'backend': self.name, 'clusters': self.clusters, 'sample_size': self.sample_size,
+                'iterations': self.iterations}
+
+    def segment(self, ar, tune_radius=None, threads=1, out_image=None, out_labels=None):
+        from scipy.cluster.vq import kmeans2, vq
+
+        heigth, width = ar.shape[:2]
+        rgb = ar[..., :3].reshape(-1, 3)
+        lab = rgb_to_lab_array(rgb, dtype=np.float32)
+
+        step = max(int(np.sqrt(len(lab) / self.sample_size)), 1)
+        sample = lab.reshape(heigth, width, 3)[::step, ::step].reshape(-1, 3)
+        k = min(self.clusters, len(sample))
+        ordered = sample[np.argsort(sample[:, 0], kind='mergesort')]
+        initial = ordered[np.linspace(0, len(ordered) - 1, k).round().astype(np.intp)]
+        centroids, _ = kmeans2(sample.astype(float), initial.astype(float), iter=self.iterations, minit='matrix')
+        labels, _ = vq(lab, centroids.astype(np.float32))
+
+        # drop clusters that no pixel is assigned to, and number the rest from 0
+        used, labels = np.unique(labels, return_inverse=True)
+        modes = np.clip(lab_to_rgb_array(centroids[used]).round(), 0, 255).astype(np.uint8)
+        counts = np.bincount(labels, minlength=len(used)).astype(np.int32)
+
+        if out_labels is None:
+            out_labels = np.empty((heigth, width), dtype=np.intc)
+        out_labels[...] = labels.reshape(heigth, width)
+        if out_image is None:
+            out_image = np.empty((heigth, width, 3), dtype=np.uint8)
+        np.take(modes, out_labels, axis=0, out=out_image)
+        return out_image, out_labels, len(used), modes, counts
+
+
+class HistogramBackend(object):
+    """Mean-shift over the color histogram of the image in L*a*b*, ignoring pixel positions.
+
+The distinct colors of the image are binned into cubes of bin_size L*a*b* units, and the occupied bins,
+weighted by their pixel counts, are shifted to their modes with a uniform kernel of radius range_radius by
+the MeanShift class of the pymeanshift library. The cost grows with the number of occupied bins rather than
+with the number of pixels, so images are loaded at up to max_dimension pixels. Regions are modes, they are
+not spatially connected.
+"""
+
+    name = 'histogram'
+
+    def __init__(self, range_radius=6, bin_size=2, max_dimension=1200):
+        if bin_size <= 0:
+            raise ValueError("'bin_size' parameter needs to be a positive number")
+        self.range_radius = range_radius
+        self.bin_size = bin_size
+        self.max_dimension = max_dimension
+
+    def params(self):
+        return {'backend': self.name, 'range_radius': self.range_radius, 'bin_size': self.bin_size,
+                'max_dimension': self.max_dimension}
+
+    def segment(self, ar, tune_radius=None, threads=1, out_image=None, out_labels=None):
+        import _pymeanshift
+
+        heigth, width = ar.shape[:2]
+        rgb = ar[..., :3].reshape(-1, 3)
+
+        # distinct colors first, so only those are converted to L*a*b*
+        keys, pixel_colors = np.unique(rgb_hash_array(rgb), return_inverse=True)
+        color_counts = np.bincount(pixel_colors, minlength=len(keys)).astype(float)
+        colors = rgb_dehash_array(keys)
+        lab = rgb_to_lab_array(colors, dtype=np.float32)
+
+        # occupied bins, at the count weighted mean of their colors
+        cells = np.floor(lab / self.bin_size).astype(np.intp)
+        cells -= cells.min(axis=0)
+        cells = np.ravel_multi_index(cells.T, cells.max(axis=0) + 1)
+        _, color_bins = np.unique(cells, return_inverse=True)
+        weights = np.bincount(color_bins, weights=color_counts)
+        means = np.empty((len(weights), 3), dtype=np.float32)
+        for c in range(3):
+            means[:, c] = np.bincount(color_bins, weights=lab[:, c] * color_counts) / weights
+
+        modes_lab, bin_modes, _ = _pymeanshift.histogram_modes(means, weights, self.range_radius)
+        labels = bin_modes[color_bins][pixel_colors]
+        modes = np.clip(lab_to_rgb_array(modes_lab).round(), 0, 255).astype(np.uint8)
+        counts = np.bincount(labels, minlength=len(modes)).astype(np.int32)
+
+        if out_labels is None:
+            out_labels = np.empty((heigth, width), dtype=np.intc)
+        out_labels[...] = labels.reshape(heigth, width)
+        if out_image is None:
+            out_image = np.empty((heigth, width, 3), dtype=np.uint8)
+        np.take(modes, out_labels, axis=0, out=out_image)
+        return out_image, out_labels, len(modes), modes, counts
+
+
+BACKENDS = {
+    MeanShiftBackend.name: MeanShiftBackend,
+    KMeansBackend.name: KMeansBackend,
+    HistogramBackend.name: HistogramBackend,
+}
+
+
+def get_backend(backend, **options):
+    """A backend instance given by name, with options passed to its constructor, or the backend itself."""
+    if not isinstance(backend, (str, type(u''))):
+        return backend
+    if backend.lower() not in BACKENDS:
+        names = ["'%s'" % name for name in sorted(BACKENDS)]
+        raise ValueError("'backend' parameter needs to be one of %s or %s" % (', '.join(names[:-1]), names[-1]))
+    return BACKENDS[backend.lower()](**options)
@@ -0,0 +1,344 @@
+"""Stage-level benchmarks: python -m colorfinder.benchmark [options]
+
+Every stage of find is timed separately on the bundled samples and on synthetic JPEG images of several
+sizes. A stage's time is the best of --repeat runs. The stages are:
+
+decode          decode_image, the image file decoded at a reduced scale and downsized
+downsize        downsize_image of the fully decoded image
+convert         the Adobe RGB to sRGB transform of the downsized image
+segment_no, segment_medium, segment_high
+                the mean-shift segmentation at each speedup level
+count           sampling and counting the colors of the segmented image
+match           matching the found colors with the palette
+prune           deleting found colors that have a close neighbour
+
+With --backends, whole find_in_array calls are also timed with each segmentation backend, as find_<backend>
+stages, and the agreement of each backend's colors with the mean-shift backend's is reported: the overlap of
+the two color distributions, from 0 (no color in common) to 1 (same colors and counts).
+
+With --tiled SIZE, find_tiled is timed on the images decoded at up to SIZE pixels with each of --tile-sizes,
+as find_tiled_<tile size> stages, against find_in_array on the whole image (find_whole), and the agreement of
+the tiled colors with the whole image's is reported the same way. Region fusion in the whole image can chain
+regions across the image, which tiles cannot, so this measures the error of tiled processing.
+
+Results can be saved as a JSON baseline with --save. With --baseline, the run fails if a stage got slower
+than its baseline time by more than --threshold (a fraction) and --min-delta seconds.
+
+The time to import colorfinder in a fresh interpreter is measured too, with python -X importtime where
+available, and the run fails if it is over --import-budget seconds or if the import loaded any of the
+modules that are meant to load on first use (PIL, scipy and the _pymeanshift extension). Use
+--no-samples --sizes '' to check only the import.
+"""
+from __future__ import print_function
+import io
+import os
+import sys
+import json
+import argparse
+import platform
+import subprocess
+from timeit import default_timer
+
+import numpy as np
+from PIL import Image
+
+import _pymeanshift
+from . import (ColorFinder, MAX_DIMENSION, load_image, decode_image, downsize_image, tune_radius, get_sample,
+               count_colors, rgb_dehash_array, prune_colors, lab_to_rgb)
+from .backends import BACKENDS
+from .profiles import srgb_transform
+
+BENCHMARK_VERSION = 1
+STAGES = ['decode', 'downsize', 'convert', 'segment_no', 'segment_medium', 'segment_high', 'count', 'match',
+          'prune']
+SPEEDUP_LEVELS = [('segment_no', 'SPEEDUP_NO'), ('segment_medium', 'SPEEDUP_MEDIUM'),
+                  ('segment_high', 'SPEEDUP_HIGH')]
+SYNTHETIC_SIZES = [(640, 480), (1600, 1200), (4000, 3000)]
+TILE_SIZES = [256, 512]
+# modules that importing colorfinder must not load
+LAZY_MODULES = ['PIL', 'scipy', '_pymeanshift']
+IMPORT_BUDGET = 0.25
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'samples')
+
+
+def sample_images(samples_dir=SAMPLES_DIR):
+    """(name, file data) pairs of the bundled samples."""
+    if not os.path.isdir(samples_dir):
+        return []
+    images = []
+    for name in sorted(os.listdir(samples_dir)):
+        path = os.path.join(samples_dir, name)
+        if os.path.isfile(path) and not name.endswith('.html'):
+            with open(path, 'rb') as image_file:
+                images.append(('samples/' + name, image_file.read()))
+    return images
+
+
+def synthetic_image(width, height, seed=0):
+    """JPEG file data of a fabric-like test image: a few flat colors in stripes and patches, with noise."""
+    rs = np.random.RandomState(seed)
+    colors = rs.randint(0, 256, (6, 3))
+    y, x = np.mgrid[0:height, 0:width]
+    index = ((x // max(width // 12, 1)) + 2 * (y // max(height // 5, 1))) % len(colors)
+    ar = colors[index] + rs.normal(0, 6, (height, width, 3))
+    ar = np.clip(ar, 0, 255).astype(np.uint8)
+    out = io.BytesIO()
+    Image.fromarray(ar).save(out, 'JPEG', quality=90)
+    return out.getvalue()
+
+
+def synthetic_images(sizes=SYNTHETIC_SIZES):
+    return [('synthetic/%dx%d' % size, synthetic_image(*size)) for size in sizes]
+
+
+def best_time(function, repeat):
+    """The shortest of repeat runs of function, and its last result."""
+    best = None
+    for _ in range(repeat):
+        start = default_timer()
+        result = function()
+        elapsed = default_timer() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def import_time(repeat=3, module='colorfinder'):
+    """Seconds to import module in a fresh interpreter, the best of repeat runs, and the LAZY_MODULES it loaded.
+
+With python -X importtime (Python 3.7+) this is the cumulative time reported for module. Otherwise it is the
+run time of an interpreter importing module minus that of an interpreter doing nothing.
+"""
+    code = 'import sys, %s; print(" ".join(m for m in %r if m in sys.modules))' % (module, LAZY_MODULES)
+    importtime = sys.version_info >= (3, 7)
+    best = None
+    for _ in range(repeat):
+        if importtime:
+            process = subprocess.Popen([sys.executable, '-X', 'importtime', '-c', code], stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE, universal_newlines=True)
+            out, err = process.communicate()
+            # lines of "import time: self [us] | cumulative | imported package"
+            seconds = None
+            for line in err.splitlines():
+                fields = line.split('|')
+                if len(fields) == 3 and fields[2].strip() == module:
+                    seconds = int(fields[1]) / 1e6
+        else:
+            start = default_timer()
+            process = subprocess.Popen([sys.executable, '-c', code], stdout=subprocess.PIPE,
+                                       universal_newlines=True)
+            out, _ = process.communicate()
+            seconds = default_timer() - start
+            start = default_timer()
+            subprocess.call([sys.executable, '-c', 'pass'])
+            seconds -= default_timer() - start
+        if process.returncode != 0 or seconds is None:
+            raise RuntimeError('could not import %s' % module)
+        if best is None or seconds < best:
+            best = seconds
+    return best, out.split()
+
+
+def benchmark_image(finder, data, repeat=3, stages=STAGES):
+    """Time the stages of find on one image file, returning seconds by stage."""
+    times = {}
+
+    t, im = best_time(lambda: decode_image(io.BytesIO(data), MAX_DIMENSION), repeat)
+    times['decode'] = t
+    full = Image.open(io.BytesIO(data)).convert('RGB')
+    full.load()
+    times['downsize'], _ = best_time(lambda: downsize_image(full, MAX_DIMENSION), repeat)
+    ar = np.asarray(im)
+    transform = srgb_transform('Adobe')
+    times['convert'], ar = best_time(lambda: transform.apply(ar), repeat)
+
+    heigth, width = ar.shape[:2]
+    radius = tune_radius(width, heigth)
+    sgm = None
+    for stage, level in SPEEDUP_LEVELS:
+        if stage in stages or (stage == 'segment_high' and sgm is None):
+            times[stage], result = best_time(
+                lambda: _pymeanshift.segment(ar, radius, 8, 300, getattr(_pymeanshift, level)), repeat)
+            if stage == 'segment_high':
+                sgm = result[0]
+
+    def count():
+        sample = get_sample(sgm, (width // finder.sample_grid) + 1, (heigth // finder.sample_grid) + 1)
+        keys, counts = count_colors(sample)
+        return keys[counts > len(sample) * 0.02], counts[counts > len(sample) * 0.02]
+    times['count'], (keys, counts) = best_time(count, repeat)
+
+    found_rgb = rgb_dehash_array(keys)
+    times['match'], (labels, indices, distances) = best_time(lambda: finder.closest_colors(found_rgb, 'rgb'),
+                                                             repeat)
+
+    colors = {}
+    for n, index in zip(counts.tolist(), indices):
+        color = finder.palette[index]
+        entry = colors.setdefault(color['label'], {'count': 0, 'lab': color['lab'], 'rgb': lab_to_rgb(color['lab'])})
+        entry['count'] += n
+    times['prune'], _ = best_time(lambda: prune_colors(dict((k, dict(v)) for k, v in colors.items())), repeat)
+
+    return dict((stage, times[stage]) for stage in stages if stage in times)
+
+
+def benchmark_backends(finders, data, repeat=3):
+    """Time find_in_array on one image file with each finder, given by backend name, and compare their colors
+with those of the 'meanshift' finder. Returns seconds by find_<backend> stage and agreement by backend."""
+    ar = np.asarray(load_image(io.BytesIO(data)))
+    times = {}
+    colors = {}
+    for name, finder in sorted(finders.items()):
+        times['find_' + name], colors[name] = best_time(lambda: finder.find_in_array(ar), repeat)
+    agreement = dict((name, color_agreement(colors['meanshift'], colors[name])) for name in colors)
+    return times, agreement
+
+
+def benchmark_tiled(finder, data, max_dimension, tile_sizes=TILE_SIZES, repeat=1):
+    """Time find_in_array on one image file decoded at up to max_dimension pixels, and find_tiled with each tile
+size, and compare the tiled colors with the whole image's. Returns seconds by find_whole and find_tiled_<tile size>
+stage and agreement by tile size."""
+    ar = np.asarray(decode_image(io.BytesIO(data), max_dimension))
+    times = {}
+    times['find_whole'], whole = best_time(lambda: finder.find_in_array(ar), repeat)
+    agreement = {}
+    for tile_size in tile_sizes:
+        stage = 'find_tiled_%d' % tile_size
+        times[stage], colors = best_time(lambda: finder.find_tiled(ar, tile_size=tile_size, max_workers=1), repeat)
+        agreement['tiled_%d' % tile_size] = color_agreement(whole, colors)
+    return times, agreement
+
+
+def color_agreement(colors, other):
+    """Overlap of the color distributions of two find results, from 0 to 1."""
+    def distribution(result):
+        total = float(sum(color['count'] for color in result.values())) or 1.0
+        return dict((label, color['count'] / total) for label, color in result.items())
+    colors, other = distribution(colors), distribution(other)
+    return sum(min(share, other[label]) for label, share in colors.items() if label in other)
+
+
+def run(images, repeat=3, stages=STAGES, finder=None, log=None, backends=(), tiled=None, tile_sizes=TILE_SIZES):
+    """Benchmark images, given as (name, file data) pairs, returning the results document."""
+    if finder is None:
+        finder = ColorFinder()
+    finders = {}
+    if backends:
+        for backend in set(backends) | set(['meanshift']):
+            finders[backend] = ColorFinder(counting='regions', backend=backend)
+    results = {}
+    agreement = {}
+    for name, data in images:
+        results[name] = benchmark_image(finder, data, repeat, stages)
+        if finders:
+            times, agreement[name] = benchmark_backends(finders, data, repeat)
+            results[name].update(times)
+        if tiled:
+            # whole images at a high resolution are slow to segment, so these run once
+            times, tiled_agreement = benchmark_tiled(ColorFinder(counting='regions'), data, tiled, tile_sizes)
+            results[name].update(times)
+            agreement.setdefault(name, {}).update(tiled_agreement)
+        if log is not None:
+            line = ' '.join('%s=%.4f' % (stage, results[name][stage]) for stage in sorted(results[name]))
+            if name in agreement:
+                line += ' ' + ' '.join('agreement_%s=%.3f' % item for item in sorted(agreement[name].items()))
+            log('%-24s %s' % (name, line))
+    document = {
+        'version': BENCHMARK_VERSION,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'repeat': repeat,
+        'results': results,
+    }
+    if agreement:
+        document['agreement'] = agreement
+    return document
+
+
+def compare(results, baseline, threshold=0.25, min_delta=0.002):
+    """Stages slower than in baseline, as (image, stage, baseline seconds, seconds) tuples.
+
+A stage regresses when it is slower by more than threshold times its baseline time and by more than
+min_delta seconds, so jitter on very fast stages is ignored. Images and stages missing from either side
+are not compared.
+"""
+    if baseline.get('version') != BENCHMARK_VERSION:
+        raise ValueError('baseline was recorded by another benchmark version')
+    regressions = []
+    for name in sorted(results['results']):
+        old_times = baseline['results'].get(name, {})
+        for stage, seconds in sorted(results['results'][name].items()):
+            old = old_times.get(stage)
+            if old is not None and seconds > old * (1 + threshold) and seconds - old > min_delta:
+                regressions.append((name, stage, old, seconds))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m colorfinder.benchmark', description='Benchmark the stages of find.')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage, the best one counts')
+    parser.add_argument('--stages', default=','.join(STAGES), help='comma separated stages to run')
+    parser.add_argument('--samples-dir', default=SAMPLES_DIR, help='directory of sample images')
+    parser.add_argument('--no-samples', action='store_true', help='skip the sample images')
+    parser.add_argument('--sizes', default=','.join('%dx%d' % size for size in SYNTHETIC_SIZES),
+                        help="comma separated WIDTHxHEIGHT of synthetic images, '' for none")
+    parser.add_argument('--backends', default='', help='comma separated segmentation backends to compare (%s)'
+                        % ', '.join(sorted(BACKENDS)))
+    parser.add_argument('--tiled', type=int, metavar='SIZE',
+                        help='compare find_tiled with the whole image, both at up to SIZE pixels')
+    parser.add_argument('--tile-sizes', default=','.join(str(size) for size in TILE_SIZES),
+                        help='comma separated tile sizes of --tiled')
+    parser.add_argument('--baseline', metavar='FILE', help='JSON baseline to compare with')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown as a fraction of the baseline')
+    parser.add_argument('--min-delta', type=float, default=0.002, help='allowed slowdown in seconds')
+    parser.add_argument('--save', metavar='FILE', help='save the results as a JSON baseline')
+    parser.add_argument('--import-budget', type=float, default=IMPORT_BUDGET,
+                        help='allowed seconds to import colorfinder')
+    args = parser.parse_args(argv)
+
+    stages = [stage for stage in args.stages.split(',') if stage]
+    for stage in stages:
+        if stage not in STAGES:
+            parser.error("stages need to be some of %s" % ', '.join(STAGES))
+    backends = [backend for backend in args.backends.split(',') if backend]
+    for backend in backends:
+        if backend not in BACKENDS:
+            parser.error("backends need to be some of %s" % ', '.join(sorted(BACKENDS)))
+    sizes = [tuple(int(n) for n in size.split('x')) for size in args.sizes.split(',') if size]
+
+    images = [] if args.no_samples else sample_images(args.samples_dir)
+    images += synthetic_images(sizes)
+    tile_sizes = [int(size) for size in args.tile_sizes.split(',') if size]
+    results = run(images, args.repeat, stages, log=lambda line: print(line, file=sys.stderr), backends=backends,
+                  tiled=args.tiled, tile_sizes=tile_sizes)
+
+    seconds, loaded = import_time(args.repeat)
+    results['import'] = {'seconds': seconds, 'loaded': loaded}
+    print('%-24s %.4fs%s' % ('import colorfinder', seconds, ' loaded ' + ', '.join(loaded) if loaded else ''),
+          file=sys.stderr)
+    failed = False
+    if seconds > args.import_budget:
+        print('import colorfinder is over budget: %.4fs > %.4fs' % (seconds, args.import_budget), file=sys.stderr)
+        failed = True
+    if loaded:
+        print('import colorfinder loaded %s' % ', '.join(loaded), file=sys.stderr)
+        failed = True
+
+    if args.save:
+        with open(args.save, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, args.threshold, args.min_delta)
+        for name, stage, old, seconds in regressions:
+            print('%s %s regressed: %.4fs -> %.4fs (%+.0f%%)' % (name, stage, old, seconds, (seconds / old - 1) * 100),
+                  file=sys.stderr)
+        if regressions:
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+import os
+import json
+import errno
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+# bump when find results for the same inputs change, so stale disk entries are not reused
+CACHE_VERSION = 1
+
+
+def cache_key(image_data, params):
+    """Hash of the bytes of an image file and the parameters its colors were found with."""
+    key = hashlib.sha1()
+    key.update(('v%d\n' % CACHE_VERSION).encode('ascii'))
+    key.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+    key.update(b'\n')
+    key.update(image_data)
+    return key.hexdigest()
+
+
+class ResultCache(object):
+    """Cache of find results by cache_key.
+
+Results are kept in memory for the max_entries most recently used keys. If a directory is given, they are
+also stored there as small JSON files, which outlive the process and are shared by every process using the
+same directory. Files are written to a temporary name and renamed, so concurrent readers and writers never
+see partial entries.
+
+hits, memory_hits, disk_hits and misses count the lookups since the cache was created.
+"""
+
+    def __init__(self, max_entries=1024, directory=None):
+        if max_entries < 0:
+            raise ValueError("'max_entries' parameter needs to be a non-negative number")
+        self.max_entries = max_entries
+        self.directory = directory
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if directory is not None and not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # another process may have created it in the meantime
+                if not os.path.isdir(directory):
+                    raise
+
+    @property
+    def hits(self):
+        return self.memory_hits + self.disk_hits
+
+    def stats(self):
+        return {'hits': self.hits, 'memory_hits': self.memory_hits, 'disk_hits': self.disk_hits,
+                'misses': self.misses, 'entries': len(self._entries)}
+
+    def get(self, key):
+        """The cached colors of key, or None. Every call returns a new copy."""
+        with self._lock:
+            data = self._entries.pop(key, None)
+            if data is not None:
+                self._entries[key] = data
+                self.memory_hits += 1
+                return json.loads(data)
+
+        data = self._read(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, data)
+        return json.loads(data)
+
+    def put(self, key, colors):
+        data = json.dumps(colors, sort_keys=True)
+        with self._lock:
+            self._remember(key, data)
+        self._write(key, data)
+
+    def clear(self):
+        """Forget the entries in memory, the files on disk are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key, data):
+        self._entries.pop(key, None)
+        if self.max_entries == 0:
+            return
+        self._entries[key] = data
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    def _read(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key)) as entry_file:
+                return entry_file.read()
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return None
+
+    def _write(self, key, data):
+        if self.directory is None:
+            return
+        path = self._path(key)
+        subdir = os.path.dirname(path)
+        if not os.path.isdir(subdir):
+            try:
+                os.makedirs(subdir)
+            except OSError:
+                if not os.path.isdir(subdir):
+                    raise
+        fd, tmp_path = tempfile.mkstemp(dir=subdir, suffix='.json.tmp')
+        try:
+            with os.fdopen(fd, 'w') as entry_file:
+                entry_file.write(data)
+            os.rename(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
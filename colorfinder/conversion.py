@@ -1,107 +1,178 @@
 from __future__ import division
-
+import numpy as np
+
+RGB_TO_XYZ = np.array([
+    [0.4124, 0.3576, 0.1805],
+    [0.2126, 0.7152, 0.0722],
+    [0.0193, 0.1192, 0.9505],
+])
+XYZ_TO_RGB = np.array([
+    [3.2406, -1.5372, -0.4986],
+    [-0.9689, 1.8758, 0.0415],
+    [0.0557, -0.2040, 1.0570],
+])
+WHITE_POINT = np.array([95.047, 100.000, 108.883])
+
+
+# Array functions take arrays of shape (..., 3), e.g. (N, 3) color lists or (H, W, 3) images, of any
+# float or integer dtype. Results are float64, or float32 if the input is float32 or dtype='float32'
+# is given. The result can be written into a preallocated array of the input's shape with out=, which
+# may also be the input array itself.
+
+def rgb_to_xyz_array(rgb, out=None, dtype=None):
+    rgb, out = _prepare(rgb, out, dtype)
+    c = rgb.astype(out.dtype)
+    c /= 255
+    srgb_to_linear(c, out=c)
+    c *= 100
+    return _mix(c, RGB_TO_XYZ, out)
+
+
+def xyz_to_lab_array(xyz, out=None, dtype=None):
+    xyz, out = _prepare(xyz, out, dtype)
+    f = xyz.astype(out.dtype)
+    f /= WHITE_POINT.astype(out.dtype)
+    mask = f > 0.008856
+    f[mask] **= 1 / 3
+    mask = ~mask
+    f[mask] = (7.787 * f[mask]) + (16 / 116)
+
+    out[..., 0] = (116 * f[..., 1]) - 16
+    out[..., 1] = 500 * (f[..., 0] - f[..., 1])
+    out[..., 2] = 200 * (f[..., 1] - f[..., 2])
+    return out
+
+
+def lab_to_xyz_array(lab, out=None, dtype=None):
+    lab, out = _prepare(lab, out, dtype)
+    f = np.empty(lab.shape, dtype=out.dtype)
+    f[..., 1] = (lab[..., 0] + 16) / 116
+    f[..., 0] = lab[..., 1] / 500 + f[..., 1]
+    f[..., 2] = f[..., 1] - lab[..., 2] / 200
+
+    cube = f ** 3
+    mask = cube > 0.008856
+    f[mask] = cube[mask]
+    mask = ~mask
+    f[mask] = (f[mask] - 16 / 116) / 7.787
+
+    return np.multiply(f, WHITE_POINT.astype(out.dtype), out=out)
+
+
+def xyz_to_rgb_array(xyz, out=None, dtype=None):
+    xyz, out = _prepare(xyz, out, dtype)
+    c = xyz.astype(out.dtype)
+    c /= 100
+    _mix(c, XYZ_TO_RGB, c)
+    linear_to_srgb(c, out=c)
+    return np.multiply(c, 255, out=out)
+
+
+def lab_to_rgb_array(lab, out=None, dtype=None):
+    out = lab_to_xyz_array(lab, out=out, dtype=dtype)
+    return xyz_to_rgb_array(out, out=out)
+
+
+def rgb_to_lab_array(rgb, out=None, dtype=None):
+    out = rgb_to_xyz_array(rgb, out=out, dtype=dtype)
+    return xyz_to_lab_array(out, out=out)
+
+
+def srgb_to_linear(c, out=None):
+    """sRGB transfer curve, from gamma encoded values in [0, 1] to linear light."""
+    c = np.asarray(c)
+    if out is None:
+        out = c.astype(float)
+    elif out is not c:
+        out[...] = c
+    mask = out > 0.04045
+    out[mask] = ((out[mask] + 0.055) / 1.055) ** 2.4
+    mask = ~mask
+    out[mask] /= 12.92
+    return out
+
+
+def linear_to_srgb(c, out=None):
+    """Inverse of srgb_to_linear."""
+    c = np.asarray(c)
+    if out is None:
+        out = c.astype(float)
+    elif out is not c:
+        out[...] = c
+    mask = out > 0.0031308
+    out[mask] = 1.055 * (out[mask] ** (1 / 2.4)) - 0.055
+    mask = ~mask
+    out[mask] *= 12.92
+    return out
+
+
+def rgb_hash_array(rgb):
+    """Pack the 8-bit colors of an array of shape (..., 3) into uint32 keys, red in the lowest byte, like
+colorfinder.rgb_hash."""
+    rgb = np.asarray(rgb).astype(np.uint32)
+    return rgb[..., 0] | (rgb[..., 1] << 8) | (rgb[..., 2] << 16)
+
+
+def rgb_dehash_array(keys):
+    """Inverse of rgb_hash_array, returning a uint8 array of shape (..., 3)."""
+    keys = np.asarray(keys, dtype=np.uint32)
+    rgb = np.empty(keys.shape + (3,), dtype=np.uint8)
+    rgb[..., 0] = keys & 0xff
+    rgb[..., 1] = (keys >> 8) & 0xff
+    rgb[..., 2] = keys >> 16
+    return rgb
+
+
+def _prepare(ar, out, dtype):
+    ar = np.asarray(ar)
+    if ar.shape[-1:] != (3,):
+        raise ValueError("color array needs to be of shape (..., 3)")
+
+    if dtype is None:
+        if out is not None:
+            dtype = out.dtype
+        elif ar.dtype == np.float32:
+            dtype = np.float32
+        else:
+            dtype = np.float64
+    dtype = np.dtype(dtype)
+    if dtype not in (np.dtype(np.float32), np.dtype(np.float64)):
+        raise ValueError("'dtype' parameter needs to be one of float32 or float64")
+
+    if out is None:
+        out = np.empty(ar.shape, dtype=dtype)
+    elif out.shape != ar.shape or out.dtype != dtype:
+        raise ValueError("'out' parameter needs to be an array of shape %s and dtype %s" % (ar.shape, dtype))
+    return ar, out
+
+
+def _mix(c, matrix, out):
+    # multiply every color in c with the matrix, out may be c itself
+    out[...] = np.dot(c, matrix.T.astype(c.dtype))
+    return out
+
+
+# Scalar functions take and return a single color as a list of 3 numbers.
 
 def rgb_to_xyz(rgb):
-    r = rgb[0] / 255
-    g = rgb[1] / 255
-    b = rgb[2] / 255
-
-    if r > 0.04045:
-        r = ((r + 0.055) / 1.055) ** 2.4
-    else:
-        r /= 12.92
-    if g > 0.04045:
-        g = ((g + 0.055) / 1.055) ** 2.4
-    else:
-        g /= 12.92
-    if b > 0.04045:
-        b = ((b + 0.055) / 1.055) ** 2.4
-    else:
-        b /= 12.92
-
-    r *= 100
-    g *= 100
-    b *= 100
-
-    x = r * 0.4124 + g * 0.3576 + b * 0.1805
-    y = r * 0.2126 + g * 0.7152 + b * 0.0722
-    z = r * 0.0193 + g * 0.1192 + b * 0.9505
-    return [x, y, z]
+    return rgb_to_xyz_array(np.asarray(rgb, dtype=float)).tolist()
 
 
 def xyz_to_lab(xyz):
-    x = xyz[0] / 95.047
-    y = xyz[1] / 100.000
-    z = xyz[2] / 108.883
-
-    if x > 0.008856:
-        x **= 1 / 3
-    else:
-        x = (7.787 * x) + (16 / 116)
-    if y > 0.008856:
-        y **= 1 / 3
-    else:
-        y = (7.787 * y) + (16 / 116)
-    if z > 0.008856:
-        z **= 1 / 3
-    else:
-        z = (7.787 * z) + (16 / 116)
-
-    l = (116 * y) - 16
-    a = 500 * (x - y)
-    b = 200 * (y - z)
-    return [l, a, b]
+    return xyz_to_lab_array(np.asarray(xyz, dtype=float)).tolist()
 
 
 def lab_to_xyz(lab):
-    y = (lab[0] + 16) / 116
-    x = lab[1] / 500 + y
-    z = y - lab[2] / 200
-
-    if y ** 3 > 0.008856:
-        y **= 3
-    else:
-        y = (y - 16 / 116) / 7.787
-    if x ** 3 > 0.008856:
-        x **= 3
-    else:
-        x = (x - 16 / 116) / 7.787
-    if z ** 3 > 0.008856:
-        z **= 3
-    else:
-        z = (z - 16 / 116) / 7.787
-
-    return [95.047 * x, 100.000 * y, 108.883 * z]
+    return lab_to_xyz_array(np.asarray(lab, dtype=float)).tolist()
 
 
 def xyz_to_rgb(xyz):
-    x = xyz[0] / 100
-    y = xyz[1] / 100
-    z = xyz[2] / 100
-
-    r = x * 3.2406 + y * -1.5372 + z * -0.4986
-    g = x * -0.9689 + y * 1.8758 + z * 0.0415
-    b = x * 0.0557 + y * -0.2040 + z * 1.0570
-
-    if r > 0.0031308:
-        r = 1.055 * (r ** (1 / 2.4)) - 0.055
-    else:
-        r *= 12.92
-    if g > 0.0031308:
-        g = 1.055 * (g ** (1 / 2.4)) - 0.055
-    else:
-        g *= 12.92
-    if b > 0.0031308:
-        b = 1.055 * (b ** (1 / 2.4)) - 0.055
-    else:
-        b *= 12.92
-
-    return [r * 255, g * 255, b * 255]
+    return xyz_to_rgb_array(np.asarray(xyz, dtype=float)).tolist()
 
 
 def lab_to_rgb(lab):
-    return xyz_to_rgb(lab_to_xyz(lab))
+    return lab_to_rgb_array(np.asarray(lab, dtype=float)).tolist()
 
 
 def rgb_to_lab(rgb):
-    return xyz_to_lab(rgb_to_xyz(rgb))
+    return rgb_to_lab_array(np.asarray(rgb, dtype=float)).tolist()
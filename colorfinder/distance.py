@@ -59,7 +59,7 @@ Color Res. Appl. 2, 7-11 (1977).
     return np.sqrt((L2 - L1) ** 2 + (a2 - a1) ** 2 + (b2 - b1) ** 2)
 
 
-def deltaE_ciede2000(lab1, lab2, kL=1, kC=1, kH=1):
+def deltaE_ciede2000(lab1, lab2, kL=1, kC=1, kH=1, chroma1=None, chroma2=None, bound=None):
     """Color difference as given by the CIEDE 2000 standard.
 
 CIEDE 2000 is a major revision of CIDE94. The perceptual calibration is
@@ -78,6 +78,13 @@ kC : float (range), optional
 chroma scale factor, usually 1
 kH : float (range), optional
 hue scale factor, usually 1
+chroma1, chroma2 : array_like, optional
+precomputed chroma ``np.hypot(a, b)`` of `lab1` and `lab2`, e.g. of a palette
+that many colors are compared with
+bound : {None, 'lower', 'upper'}, optional
+return the smaller or the larger of the differences given by either mean hue
+of the two colors, which bound the difference and, unlike it, do not jump
+where the hues of the colors become opposite
 
 Returns
 -------
@@ -98,6 +105,8 @@ References
 color metrics tested with an accurate color-difference tolerance
 dataset," Appl. Opt. 33, 8069-8077 (1994).
 """
+    if bound not in (None, 'lower', 'upper'):
+        raise ValueError("'bound' parameter needs to be one of None, 'lower' or 'upper'")
     lab1 = np.asarray(lab1)
     lab2 = np.asarray(lab2)
     unroll = False
@@ -114,7 +123,11 @@ dataset," Appl. Opt. 33, 8069-8077 (1994).
     # then convert to lch coordines from distorted `a`
     # all subsequence calculations are in the new coordiantes
     # (often denoted "prime" in the literature)
-    Cbar = 0.5 * (np.hypot(a1, b1) + np.hypot(a2, b2))
+    if chroma1 is None:
+        chroma1 = np.hypot(a1, b1)
+    if chroma2 is None:
+        chroma2 = np.hypot(a2, b2)
+    Cbar = 0.5 * (chroma1 + chroma2)
     c7 = Cbar ** 7
     G = 0.5 * (1 - np.sqrt(c7 / (c7 + 25 ** 7)))
     scale = 1 + G
@@ -157,27 +170,36 @@ dataset," Appl. Opt. 33, 8069-8077 (1994).
     Hbar[CC == 0.] *= 2
     Hbar *= 0.5
 
-    T = (1 -
-         0.17 * np.cos(Hbar - np.deg2rad(30)) +
-         0.24 * np.cos(2 * Hbar) +
-         0.32 * np.cos(3 * Hbar + np.deg2rad(6)) -
-         0.20 * np.cos(4 * Hbar - np.deg2rad(63))
-         )
-    SH = 1 + 0.015 * Cbar * T
-
-    H_term = dH_term / (kH * SH)
-
-    # hue rotation
-    c7 = Cbar ** 7
-    Rc = 2 * np.sqrt(c7 / (c7 + 25 ** 7))
-    dtheta = np.deg2rad(30) * np.exp(-((np.rad2deg(Hbar) - 275) / 25) ** 2)
-    R_term = -np.sin(2 * dtheta) * Rc * C_term * H_term
-
-    # put it all together
-    dE2 = L_term ** 2
-    dE2 += C_term ** 2
-    dE2 += H_term ** 2
-    dE2 += R_term
+    def difference2(Hbar, dH_term):
+        T = (1 -
+             0.17 * np.cos(Hbar - np.deg2rad(30)) +
+             0.24 * np.cos(2 * Hbar) +
+             0.32 * np.cos(3 * Hbar + np.deg2rad(6)) -
+             0.20 * np.cos(4 * Hbar - np.deg2rad(63))
+             )
+        SH = 1 + 0.015 * Cbar * T
+
+        H_term = dH_term / (kH * SH)
+
+        # hue rotation
+        c7 = Cbar ** 7
+        Rc = 2 * np.sqrt(c7 / (c7 + 25 ** 7))
+        dtheta = np.deg2rad(30) * np.exp(-((np.rad2deg(Hbar) - 275) / 25) ** 2)
+        R_term = -np.sin(2 * dtheta) * Rc * C_term * H_term
+
+        # put it all together
+        dE2 = L_term ** 2
+        dE2 += C_term ** 2
+        dE2 += H_term ** 2
+        dE2 += R_term
+        return dE2
+
+    dE2 = difference2(Hbar, dH_term)
+    if bound is not None:
+        # where the hues become opposite, the mean hue moves to the other side of the hue circle and the hue
+        # difference changes sign, the other side continues the difference across
+        other = Hbar + np.where(Hbar < np.pi, np.pi, -np.pi)
+        (np.minimum if bound == 'lower' else np.maximum)(dE2, difference2(other, -dH_term), out=dE2)
     ans = np.sqrt(dE2)
     if unroll:
         ans = ans[0]
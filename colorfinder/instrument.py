@@ -0,0 +1,127 @@
+from __future__ import print_function
+import os
+import sys
+from timeit import default_timer
+try:
+    import resource
+except ImportError:
+    # not available on Windows, peak memory is not reported there
+    resource = None
+
+# stages of find in the order they run
+STAGES = ['read', 'decode', 'convert', 'segment', 'count', 'match', 'prune']
+
+
+class StageStats(object):
+    """Measurements of one stage: wall and CPU seconds, and in bytes, how much the stage raised the peak
+resident memory of the process and that peak at the end of the stage (None where memory cannot be
+measured). The process peak covers its whole lifetime, so once a large image has been processed later
+stages only raise it if they need more; peak_memory_delta is 0 for stages that stay below it.
+"""
+
+    def __init__(self):
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak_memory_delta = None
+        self.process_peak_memory = None
+
+    def as_dict(self):
+        return {'wall': self.wall, 'cpu': self.cpu, 'peak_memory_delta': self.peak_memory_delta,
+                'process_peak_memory': self.process_peak_memory}
+
+
+class FindStats(object):
+    """Measurements of a single find call, passed to the instrument hook of ColorFinder when the call ends.
+
+stages maps stage names to StageStats, counts maps names to numbers such as pixels, samples, regions,
+candidates and colors, and wall is the duration of the whole call. CPU times are those of the process,
+so they include other threads that run at the same time.
+"""
+
+    def __init__(self):
+        self.stages = {}
+        self.counts = {}
+        self.wall = None
+        self._start = default_timer()
+
+    def stage(self, name):
+        """Context manager that measures the enclosed code as stage name."""
+        return _StageTimer(self.stages.setdefault(name, StageStats()))
+
+    def count(self, name, value):
+        self.counts[name] = value
+
+    def finish(self):
+        self.wall = default_timer() - self._start
+
+    def as_dict(self):
+        return {'wall': self.wall, 'counts': dict(self.counts),
+                'stages': dict((name, stats.as_dict()) for name, stats in self.stages.items())}
+
+
+class NullStats(object):
+    """Stats that measure nothing, used when no hook is installed."""
+
+    def stage(self, name):
+        return _NULL_TIMER
+
+    def count(self, name, value):
+        pass
+
+    def finish(self):
+        pass
+
+
+class _StageTimer(object):
+    def __init__(self, stats):
+        self.stats = stats
+
+    def __enter__(self):
+        self.cpu = _cpu_time()
+        self.wall = default_timer()
+        self.peak_memory = _peak_memory()
+        return self.stats
+
+    def __exit__(self, *exc_info):
+        self.stats.wall += default_timer() - self.wall
+        self.stats.cpu += _cpu_time() - self.cpu
+        peak_memory = _peak_memory()
+        if peak_memory is not None:
+            # stages entered several times in a call, e.g. once per tile, add up
+            self.stats.peak_memory_delta = (self.stats.peak_memory_delta or 0) + peak_memory - self.peak_memory
+            self.stats.process_peak_memory = peak_memory
+        return False
+
+
+class _NullTimer(object):
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_STATS = NullStats()
+_NULL_TIMER = _NullTimer()
+
+
+def _cpu_time():
+    times = os.times()
+    return times[0] + times[1]
+
+
+def _peak_memory():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def print_stats(stats, file=None):
+    """A hook that writes a line per find call with its stage times and counts, to stderr by default."""
+    if file is None:
+        file = sys.stderr
+    stages = ' '.join('%s=%.4fs' % (name, stats.stages[name].wall) for name in STAGES if name in stats.stages)
+    counts = ' '.join('%s=%s' % (name, stats.counts[name]) for name in sorted(stats.counts))
+    print('find %.4fs %s %s' % (stats.wall, stages, counts), file=file)
@@ -0,0 +1,216 @@
+from __future__ import division
+import os
+import hashlib
+import tempfile
+
+import numpy as np
+
+from .distance import deltaE_ciede2000
+from .conversion import rgb_to_lab_array
+from .palette_index import PaletteIndex, INDEX_MIN_SIZE
+
+# bump when the table layout or the way it is built changes, so stale cache files are not reused
+LUT_VERSION = 3
+LUT_DTYPE = np.dtype([('index', '<u2'), ('dist', '<f4')])
+QUANTIZED_LUT_STEP = 4
+# palette colors closest to a grid cell that the triples of the cell are matched against
+CELL_CANDIDATES = 16
+# a palette color is taken to win inside a cell only if it is within this many times the distance across the cell
+# of the closest color at its corner; 2 would suffice for a metric, CIEDE2000 is not one, so this is measured
+SAFE_MARGIN = 3.0
+
+# number of colors matched against the whole palette at once, bounds the size of the distance matrix
+MATCH_CHUNK = 4096
+
+
+class PaletteLUT(object):
+    """Maps every 8-bit sRGB triple to the index of its closest palette color and the CIEDE2000 distance."""
+
+    def __init__(self, table, path=None):
+        self.table = table
+        self.path = path
+
+    def lookup(self, rgb):
+        rgb = np.asarray(rgb)
+        if rgb.shape[-1] != 3:
+            raise ValueError("'rgb' parameter needs to be an array of shape (..., 3)")
+        rgb = rgb.astype(np.intp)
+        entries = self.table[rgb[..., 0], rgb[..., 1], rgb[..., 2]]
+        return entries['index'].astype(np.intp), entries['dist'].astype(float)
+
+
+def default_cache_dir():
+    return os.environ.get('COLORFINDER_CACHE_DIR',
+                          os.path.join(os.path.expanduser('~'), '.cache', 'colorfinder'))
+
+
+def palette_hash(palette_lab):
+    palette_lab = np.ascontiguousarray(palette_lab, dtype='<f8')
+    return hashlib.sha1(palette_lab.tobytes()).hexdigest()
+
+
+def load_lut(palette_lab, mode='quantized', cache_dir=None, step=QUANTIZED_LUT_STEP):
+    """Load the lookup table of a palette from the cache directory, building and storing it if needed.
+
+The table is memory-mapped read-only, so processes using the same palette share its pages.
+"""
+    mode = mode.lower()
+    if mode not in ('full', 'quantized'):
+        raise ValueError("'mode' parameter needs to be one of 'full' or 'quantized'")
+    if mode == 'full':
+        step = 1
+
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    if not os.path.isdir(cache_dir):
+        try:
+            os.makedirs(cache_dir)
+        except OSError:
+            # another process may have created it in the meantime
+            if not os.path.isdir(cache_dir):
+                raise
+
+    path = os.path.join(cache_dir, 'lut-v%d-%s-%d.npy' % (LUT_VERSION, palette_hash(palette_lab), step))
+    if not os.path.exists(path):
+        # build into a temporary file and rename it, so readers never see a partially written table
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.npy.tmp')
+        os.close(fd)
+        try:
+            table = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=LUT_DTYPE, shape=(256, 256, 256))
+            build_lut(palette_lab, step, out=table)
+            table.flush()
+            del table
+            os.rename(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    return PaletteLUT(np.load(path, mmap_mode='r'), path)
+
+
+def build_lut(palette_lab, step=1, out=None):
+    """Compute the closest palette color of every 8-bit sRGB triple.
+
+With step 1 every triple is matched against the whole palette. With a bigger step, the palette is
+matched at the corners of the cells of a grid with the given spacing first. Only the palette colors within
+SAFE_MARGIN times the distance across a cell of the closest color at its corner are taken to win inside it,
+comparing the bounds of the distances over both mean hues, as CIEDE2000 jumps where hues become opposite:
+a cell with a single such color takes it, the triples of a cell with up to CELL_CANDIDATES are matched
+against those, and the triples of the other cells against the whole palette.
+
+CIEDE2000 is not a metric, so this is not proven to give the table of step 1. It gave the same table for
+every triple checked by test_lut.py, with the colorchecker and a near-grey palette; build
+with step 1 when every entry needs to be exact. Large palettes, searched with a PaletteIndex, are always
+matched triple by triple.
+"""
+    palette_lab = np.asarray(palette_lab, dtype=float).reshape(-1, 3)
+    if len(palette_lab) == 0:
+        raise ValueError("palette needs to contain at least one color")
+    if len(palette_lab) > np.iinfo(LUT_DTYPE['index']).max:
+        raise ValueError("palette is too big for a lookup table")
+    if out is None:
+        out = np.empty((256, 256, 256), dtype=LUT_DTYPE)
+    # large palettes are searched with a k-d tree instead of a distance matrix, they have no candidates by cell
+    palette_index = None
+    if len(palette_lab) >= INDEX_MIN_SIZE:
+        palette_index = PaletteIndex(palette_lab)
+        step = 1
+
+    levels = np.arange(256)
+    gb = np.empty((256, 256, 3), dtype=float)
+    gb[:, :, 1] = levels[:, np.newaxis]
+    gb[:, :, 2] = levels[np.newaxis, :]
+
+    if step > 1:
+        nodes = list(range(0, 256, step))
+        if nodes[-1] != 255:
+            nodes.append(255)
+        nodes = np.array(nodes)
+        ncells = len(nodes) - 1
+
+        grid = np.empty((len(nodes), len(nodes), len(nodes), 3), dtype=float)
+        grid[..., 0] = nodes[:, np.newaxis, np.newaxis]
+        grid[..., 1] = nodes[np.newaxis, :, np.newaxis]
+        grid[..., 2] = nodes[np.newaxis, np.newaxis, :]
+        grid_lab = rgb_to_lab_array(grid.reshape(-1, 3)).reshape(grid.shape)
+
+        # the largest distance from the first corner of every cell to its other corners
+        first = grid_lab[:ncells, :ncells, :ncells]
+        spread = np.zeros((ncells, ncells, ncells), dtype=float)
+        for dr in (0, 1):
+            for dg in (0, 1):
+                for db in (0, 1):
+                    corner = grid_lab[dr:dr + ncells, dg:dg + ncells, db:db + ncells]
+                    np.maximum(spread, deltaE_ciede2000(first, corner, bound='upper'), out=spread)
+
+        # the closest palette color at the first corner, and which cells have a single or a few contenders: the
+        # palette colors are ranked by the lower bound of their distance, which does not jump within the cell
+        # where the hues become opposite, and compared with the upper bound of the distance of the closest one
+        first = first.reshape(-1, 3)
+        closest, _ = _match(first, palette_lab)
+        threshold = deltaE_ciede2000(first, palette_lab[closest], bound='upper') + SAFE_MARGIN * spread.ravel()
+        candidates, candidate_dists = _nearest(first, palette_lab, CELL_CANDIDATES)
+        single = candidate_dists[:, min(1, candidate_dists.shape[1] - 1)] > threshold
+        single |= candidate_dists.shape[1] == 1
+        complete = candidate_dists[:, -1] > threshold
+        complete |= candidate_dists.shape[1] == len(palette_lab)
+
+        cell = np.minimum(levels // step, ncells - 1)
+
+    for r in range(256):
+        gb[:, :, 0] = r
+        lab = rgb_to_lab_array(gb.reshape(-1, 3))
+        if step > 1:
+            cells = ((cell[r] * ncells + cell[:, np.newaxis]) * ncells + cell[np.newaxis, :]).ravel()
+            index = closest[cells]
+            dist = np.empty(len(lab), dtype=float)
+            one = single[cells]
+            dist[one] = deltaE_ciede2000(lab[one], palette_lab[index[one]])
+            # near a decision boundary, pick the closest among the candidates of the cell
+            few = ~one & complete[cells]
+            cell_candidates = candidates[cells[few]]
+            dists = deltaE_ciede2000(lab[few][:, np.newaxis, :], palette_lab[cell_candidates])
+            best = dists.argmin(axis=1)
+            index[few] = cell_candidates[np.arange(len(best)), best]
+            dist[few] = dists[np.arange(len(best)), best]
+            many = ~complete[cells]
+            index[many], dist[many] = _match(lab[many], palette_lab)
+        else:
+            index, dist = _match(lab, palette_lab, palette_index)
+        out['index'][r] = index.reshape(256, 256)
+        out['dist'][r] = dist.reshape(256, 256)
+
+    return out
+
+
+def _nearest(lab, palette_lab, k):
+    """Indices of the k palette colors with the smallest lower bound of their distance to lab, see
+deltaE_ciede2000, and those lower bounds, smallest first."""
+    k = min(k, len(palette_lab))
+    index = np.empty((len(lab), k), dtype=np.intp)
+    dist = np.empty((len(lab), k), dtype=float)
+    for start in range(0, len(lab), MATCH_CHUNK):
+        dists = deltaE_ciede2000(lab[start:start + MATCH_CHUNK, np.newaxis, :], palette_lab[np.newaxis, :, :],
+                                 bound='lower')
+        nearest = np.argpartition(dists, k - 1, axis=1)[:, :k] if k < len(palette_lab) else \
+            np.tile(np.arange(k), (len(dists), 1))
+        nearest_dists = dists[np.arange(len(dists))[:, np.newaxis], nearest]
+        order = nearest_dists.argsort(axis=1)
+        rows = np.arange(len(dists))[:, np.newaxis]
+        index[start:start + MATCH_CHUNK] = nearest[rows, order]
+        dist[start:start + MATCH_CHUNK] = nearest_dists[rows, order]
+    return index, dist
+
+
+def _match(lab, palette_lab, palette_index=None):
+    index = np.empty(len(lab), dtype=np.intp)
+    dist = np.empty(len(lab), dtype=float)
+    for start in range(0, len(lab), MATCH_CHUNK):
+        chunk = lab[start:start + MATCH_CHUNK]
+        if palette_index is not None:
+            index[start:start + MATCH_CHUNK], dist[start:start + MATCH_CHUNK] = palette_index.match(chunk)
+            continue
+        dists = deltaE_ciede2000(chunk[:, np.newaxis, :], palette_lab[np.newaxis, :, :])
+        index[start:start + MATCH_CHUNK] = dists.argmin(axis=1)
+        dist[start:start + MATCH_CHUNK] = dists[np.arange(len(chunk)), index[start:start + MATCH_CHUNK]]
+    return index, dist
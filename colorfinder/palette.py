@@ -0,0 +1,226 @@
+"""Palettes of colors to match against: python -m colorfinder.palette PALETTE.json PALETTE.npz
+
+Compiles a palette JSON file into the binary format, which is memory-mapped when loaded.
+"""
+from __future__ import print_function
+import os
+import sys
+import json
+import hashlib
+import threading
+
+import numpy as np
+
+from .palette_index import PaletteIndex, INDEX_MIN_SIZE
+
+# bump when the arrays stored in palette files change
+PALETTE_VERSION = 2
+# palettes shipped with the package, loaded on first use
+BUILTIN_PALETTES = {
+    'colorchecker': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'colorchecker.json'),
+    'colorchecker_sg': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'colorchecker_sg.json'),
+}
+
+
+class Palette(object):
+    """Colors to match against, as an (n, 3) array of L*a*b* values and an array of n labels.
+
+The chroma of every color, np.hypot(a, b), is computed once and used by every CIEDE2000 distance against the
+palette. Arrays are read-only, as palettes are shared by every ColorFinder of the process. Indexing gives the
+color as a dict like those of palette JSON files, with the other keys of the color dicts it was made of.
+"""
+
+    def __init__(self, lab, labels, name=None, chroma=None, extras=None):
+        self.lab = _read_only(np.asarray(lab, dtype=float).reshape(-1, 3))
+        self.labels = _read_only(np.asarray(labels, dtype='U').reshape(-1))
+        if len(self.lab) != len(self.labels):
+            raise ValueError("palette needs to have as many labels as colors")
+        if chroma is None:
+            chroma = np.hypot(self.lab[:, 1], self.lab[:, 2])
+        self.chroma = _read_only(np.asarray(chroma, dtype=float))
+        # the other keys of every color, as dicts, or None when colors have no other keys
+        if extras is not None and not any(extras):
+            extras = None
+        if extras is not None and len(extras) != len(self.lab):
+            raise ValueError("palette needs to have as many extras as colors")
+        self.extras = tuple(extras) if extras is not None else None
+        self.name = name
+        self._digest = None
+        self._index = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_colors(cls, colors, name=None):
+        """Palette of a list of colors given as dicts with 'label' and 'lab' entries, as in palette JSON files.
+Other entries of the dicts are kept, and given back by indexing."""
+        colors = list(colors)
+        extras = [dict((key, value) for key, value in color.items() if key not in ('label', 'lab'))
+                  for color in colors]
+        return cls([color['lab'] for color in colors], [color['label'] for color in colors], name, extras=extras)
+
+    @classmethod
+    def load(cls, path, mmap=True, name=None):
+        """Palette of a file written by save, with its arrays memory-mapped unless mmap is False."""
+        arrays = _load_npz(path, mmap)
+        if int(arrays['version']) != PALETTE_VERSION:
+            raise ValueError('%s was written by another palette version' % path)
+        extras = [json.loads(extra) for extra in arrays['extras'].tolist()]
+        return cls(arrays['lab'], arrays['labels'], name, arrays['chroma'], extras)
+
+    def save(self, path):
+        """Write the palette to path as an uncompressed .npz file, whose arrays can be memory-mapped."""
+        with open(path, 'wb') as palette_file:
+            # the other keys of the colors as one JSON object per color
+            extras = [json.dumps(extra, sort_keys=True) for extra in self.extras or [{}] * len(self)]
+            np.savez(palette_file, version=np.array(PALETTE_VERSION), lab=self.lab, labels=self.labels,
+                     chroma=self.chroma, extras=np.array(extras, dtype='U'))
+
+    def to_colors(self):
+        return [self[i] for i in range(len(self))]
+
+    @property
+    def digest(self):
+        """sha1 of the colors and labels, identifying the palette in cache keys."""
+        if self._digest is None:
+            digest = hashlib.sha1(np.ascontiguousarray(self.lab, dtype='<f8').tobytes())
+            digest.update(u'\0'.join(self.labels.tolist()).encode('utf-8'))
+            self._digest = digest.hexdigest()
+        return self._digest
+
+    def index(self):
+        """The PaletteIndex of large palettes, built on first use, or None for palettes smaller than
+INDEX_MIN_SIZE."""
+        if len(self) < INDEX_MIN_SIZE:
+            return None
+        with self._lock:
+            if self._index is None:
+                self._index = PaletteIndex(self.lab, chroma=self.chroma)
+        return self._index
+
+    def __len__(self):
+        return len(self.lab)
+
+    def __getitem__(self, index):
+        color = dict(self.extras[index]) if self.extras is not None else {}
+        color.update(label=self.labels[index].item(), lab=self.lab[index].tolist())
+        return color
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+# palettes by lower case name, and by absolute path for palette files
+_palettes = {}
+_palettes_lock = threading.Lock()
+
+
+def register_palette(name, palette):
+    """Make a palette available by name, e.g. as the palette parameter of ColorFinder. palette is anything
+get_palette accepts."""
+    palette = get_palette(palette)
+    with _palettes_lock:
+        _palettes[name.lower()] = palette
+    return palette
+
+
+def get_palette(palette=None):
+    """The Palette given by a Palette, a list of color dicts, a registered name or the path of a JSON or .npz
+palette file. Names and files are loaded once per process, later calls share the same Palette.
+The default is the 'colorchecker_sg' palette.
+"""
+    if palette is None:
+        palette = 'colorchecker_sg'
+    if isinstance(palette, Palette):
+        return palette
+    if not isinstance(palette, (str, type(u''))):
+        return Palette.from_colors(palette)
+
+    key = palette.lower()
+    with _palettes_lock:
+        if key not in _palettes and key in BUILTIN_PALETTES:
+            _palettes[key] = load_palette_file(BUILTIN_PALETTES[key])
+        if key not in _palettes:
+            path = os.path.abspath(palette)
+            key = 'file:' + path
+            if key not in _palettes:
+                if not os.path.isfile(path):
+                    raise ValueError("'palette' parameter needs to be one of %s or a palette file" % _names())
+                _palettes[key] = load_palette_file(path)
+        return _palettes[key]
+
+
+def load_palette_file(path, mmap=True):
+    """Palette of a .npz file written by Palette.save, or of a JSON file of color dicts."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    if path.lower().endswith('.npz'):
+        return Palette.load(path, mmap, name)
+    with open(path) as palette_file:
+        return Palette.from_colors(json.load(palette_file), name)
+
+
+def _names():
+    names = set(BUILTIN_PALETTES) | set(name for name in _palettes if not name.startswith('file:'))
+    return ', '.join("'%s'" % name for name in sorted(names))
+
+
+def _read_only(ar):
+    if ar.flags.writeable:
+        ar = ar.view()
+        ar.flags.writeable = False
+    return ar
+
+
+def _load_npz(path, mmap):
+    """Arrays of an .npz file by name. Arrays stored uncompressed are memory-mapped when mmap is True, so
+processes loading the same file share its pages."""
+    import struct
+    import zipfile
+
+    if not mmap:
+        with np.load(path) as npz:
+            return dict((name, npz[name]) for name in npz.files)
+
+    arrays = {}
+    with zipfile.ZipFile(path) as archive:
+        infos = archive.infolist()
+    with open(path, 'rb') as npz_file:
+        for info in infos:
+            name = info.filename[:-len('.npy')]
+            if info.compress_type == zipfile.ZIP_STORED:
+                # the .npy data follows the local file header of the zip member
+                npz_file.seek(info.header_offset)
+                name_length, extra_length = struct.unpack('<HH', npz_file.read(30)[26:30])
+                npz_file.seek(info.header_offset + 30 + name_length + extra_length)
+                version = np.lib.format.read_magic(npz_file)
+                if version == (1, 0):
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(npz_file)
+                else:
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(npz_file)
+                if not dtype.hasobject and 0 not in shape:
+                    arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=npz_file.tell(), shape=shape,
+                                             order='F' if fortran_order else 'C')
+                    continue
+            # compressed, empty or object arrays cannot be mapped
+            with np.load(path) as npz:
+                arrays[name] = npz[name]
+    return arrays
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m colorfinder.palette',
+                                     description='Compile a palette into the binary format.')
+    parser.add_argument('palette', help="'colorchecker', 'colorchecker_sg' or a palette JSON file")
+    parser.add_argument('output', help='.npz file to write')
+    args = parser.parse_args(argv)
+
+    palette = get_palette(args.palette)
+    palette.save(args.output)
+    print('%s: %d colors' % (args.output, len(palette)), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
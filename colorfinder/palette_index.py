@@ -0,0 +1,64 @@
+from __future__ import division
+import numpy as np
+
+from .distance import deltaE_ciede2000
+
+# palettes with fewer colors are matched against a full CIEDE2000 distance matrix, which is faster for them
+INDEX_MIN_SIZE = 1024
+# nearest palette colors by CIE76 distance that are reranked by CIEDE2000 at first
+CANDIDATES = 16
+# CIE76 distance is at most this many times the CIEDE2000 distance between colors of chroma up to 150, which
+# covers the surface colors of the widest RGB spaces (about 1 / 0.066 measured on random pairs, rounded up)
+CIE76_PER_CIEDE2000 = 16.0
+
+
+class PaletteIndex(object):
+    """Closest palette colors by CIEDE2000 distance, with a k-d tree of the palette L*a*b* values.
+
+The nearest palette colors by Euclidean (CIE76) distance are fetched from the tree and reranked by CIEDE2000.
+A palette color further away by CIE76 can still be closer by CIEDE2000, but only within
+CIE76_PER_CIEDE2000 times the best CIEDE2000 distance found, so the search is widened until that radius is
+covered. The result is the same as matching against the whole palette, at a cost that grows slowly with
+the palette size.
+"""
+
+    def __init__(self, palette_lab, candidates=CANDIDATES, chroma=None):
+        from scipy.spatial import cKDTree
+
+        self.palette_lab = np.asarray(palette_lab, dtype=float).reshape(-1, 3)
+        if len(self.palette_lab) == 0:
+            raise ValueError("palette needs to contain at least one color")
+        self.tree = cKDTree(self.palette_lab)
+        # np.hypot(a, b) of the palette colors, computed here unless given
+        self.chroma = np.hypot(self.palette_lab[:, 1], self.palette_lab[:, 2]) if chroma is None else chroma
+        self.candidates = candidates
+
+    def match(self, lab):
+        """Indices of the closest palette colors of an (n, 3) array of L*a*b* colors, and their distances."""
+        lab = np.asarray(lab, dtype=float).reshape(-1, 3)
+        size = len(self.palette_lab)
+        indices = np.zeros(len(lab), dtype=np.intp)
+        distances = np.empty(len(lab), dtype=float)
+        distances.fill(np.inf)
+        pending = np.arange(len(lab))
+        checked = 0
+        k = min(self.candidates, size)
+        while len(pending):
+            queries = lab[pending]
+            radii, nearest = self.tree.query(queries, k)
+            radii, nearest = radii.reshape(len(pending), k), nearest.reshape(len(pending), k)
+            # only the candidates that were not reranked in a previous round
+            nearest = nearest[:, checked:]
+            dists = deltaE_ciede2000(queries[:, np.newaxis, :], self.palette_lab[nearest],
+                                     chroma2=self.chroma[nearest])
+            best = dists.argmin(axis=1)
+            rows = np.arange(len(pending))
+            closer = dists[rows, best] < distances[pending]
+            indices[pending[closer]] = nearest[rows[closer], best[closer]]
+            distances[pending[closer]] = dists[rows[closer], best[closer]]
+            if k == size:
+                break
+            # fetch more candidates where a closer color may lie beyond the furthest candidate
+            pending = pending[distances[pending] * CIE76_PER_CIEDE2000 > radii[:, -1]]
+            checked, k = k, min(k * 4, size)
+        return indices, distances
@@ -0,0 +1,116 @@
+from __future__ import division
+import threading
+
+import numpy as np
+
+from .conversion import RGB_TO_XYZ, srgb_to_linear, linear_to_srgb
+
+# Input color spaces are converted to sRGB by a transform compiled from the space's primaries and transfer
+# curve: a 256 entry table per channel decodes 8-bit values to linear light, a single matrix maps linear
+# light to linear sRGB, and a table over quantized linear light encodes the result back to 8-bit sRGB.
+
+# number of levels of the linear light table that encodes to 8-bit sRGB
+ENCODE_LEVELS = 65536
+
+# chromatic adaptation from D50 to the D65 white point of sRGB (Bradford)
+D50_TO_D65 = np.array([
+    [0.9555766, -0.0230393, 0.0631636],
+    [-0.0282895, 1.0099416, 0.0210077],
+    [0.0122982, -0.0204830, 1.3299098],
+])
+
+
+def gamma_to_linear(gamma):
+    def decode(c):
+        return c ** gamma
+    return decode
+
+
+def prophoto_to_linear(c):
+    return np.where(c < 16 / 512, c / 16, c ** 1.8)
+
+
+class ColorSpace(object):
+    """An RGB color space given by its linear RGB to XYZ matrix, relative to D65, and its decoding transfer curve."""
+
+    def __init__(self, name, to_xyz, to_linear):
+        self.name = name
+        self.to_xyz = np.asarray(to_xyz, dtype=float)
+        self.to_linear = to_linear
+
+
+COLOR_SPACES = {}
+# compiled transforms by color space name
+_transforms = {}
+_transforms_lock = threading.Lock()
+
+
+def register_color_space(name, to_xyz, to_linear):
+    """Make an input color space available by name, e.g. as the color_space parameter of ColorFinder.find."""
+    COLOR_SPACES[name.lower()] = ColorSpace(name, to_xyz, to_linear)
+    _transforms.pop(name.lower(), None)
+
+
+register_color_space('sRGB', RGB_TO_XYZ, srgb_to_linear)
+register_color_space('Adobe', [
+    [0.5767309, 0.1855540, 0.1881852],
+    [0.2973769, 0.6273491, 0.0752741],
+    [0.0270343, 0.0706872, 0.9911085],
+], gamma_to_linear(563 / 256))
+register_color_space('DisplayP3', [
+    [0.4865709, 0.2656677, 0.1982173],
+    [0.2289746, 0.6917385, 0.0792869],
+    [0.0000000, 0.0451134, 1.0439444],
+], srgb_to_linear)
+register_color_space('ProPhoto', np.dot(D50_TO_D65, [
+    [0.7976749, 0.1351917, 0.0313534],
+    [0.2880402, 0.7118741, 0.0000857],
+    [0.0000000, 0.0000000, 0.8252100],
+]), prophoto_to_linear)
+
+
+def get_color_space(name):
+    try:
+        return COLOR_SPACES[name.lower()]
+    except KeyError:
+        raise ValueError("'color_space' parameter needs to be one of %s" % _names())
+
+
+def _names():
+    names = ["'%s'" % space.name for space in sorted(COLOR_SPACES.values(), key=lambda space: space.name.lower())]
+    return ', '.join(names[:-1]) + ' or ' + names[-1]
+
+
+class SRGBTransform(object):
+    """Compiled conversion of 8-bit RGB images from a color space to 8-bit sRGB."""
+
+    def __init__(self, color_space):
+        levels = np.arange(256) / 255
+        self.decode = np.asarray(color_space.to_linear(levels), dtype=np.float32)
+        # source linear light -> XYZ -> linear sRGB, scaled to the levels of the encoding table
+        matrix = np.dot(np.linalg.inv(RGB_TO_XYZ), color_space.to_xyz)
+        self.matrix = (matrix.T * (ENCODE_LEVELS - 1)).astype(np.float32)
+        self.encode = np.round(linear_to_srgb(np.arange(ENCODE_LEVELS) / (ENCODE_LEVELS - 1)) * 255).astype(np.uint8)
+
+    def apply(self, rgb, out=None):
+        """Convert an 8-bit array of shape (..., 3), out may be rgb itself."""
+        rgb = np.asarray(rgb)
+        if rgb.shape[-1:] != (3,) or rgb.dtype != np.uint8:
+            raise ValueError("'rgb' parameter needs to be a uint8 array of shape (..., 3)")
+        linear = np.dot(self.decode[rgb], self.matrix)
+        np.clip(linear, 0, ENCODE_LEVELS - 1, out=linear)
+        linear += 0.5
+        if out is None:
+            out = np.empty(rgb.shape, dtype=np.uint8)
+        out[...] = self.encode[linear.astype(np.intp)]
+        return out
+
+
+def srgb_transform(color_space):
+    """The compiled sRGB transform of a color space, built once and cached."""
+    space = get_color_space(color_space)
+    key = space.name.lower()
+    with _transforms_lock:
+        if key not in _transforms:
+            _transforms[key] = SRGBTransform(space)
+        return _transforms[key]
@@ -0,0 +1,60 @@
+from __future__ import division
+import numpy as np
+
+# side of the square tiles progressive counting segments one at a time, in pixels of the loaded image
+TILE_SIZE = 100
+# the tiles are consumed in about this many batches, the counts are checked for convergence after each one
+BATCHES = 16
+# consecutive batches that must leave the found colors and their shares unchanged before stopping
+PATIENCE = 2
+
+
+def tile_order(heigth, width, tile_size=TILE_SIZE, seed=0):
+    """Tiles of about tile_size pixels along each side covering an image, as (top, bottom, left, right) bounds, in
+a fixed pseudo-random order, so that the first tiles are spread over the whole image.
+
+The image is split evenly rather than in tiles of exactly tile_size, so no thin strip is left over along the
+edges, the segmenter needs tiles at least as big as its spatial radius.
+"""
+    rows = np.linspace(0, heigth, max(int(round(heigth / tile_size)), 1) + 1).round().astype(int).tolist()
+    cols = np.linspace(0, width, max(int(round(width / tile_size)), 1) + 1).round().astype(int).tolist()
+    tiles = [(top, bottom, left, right) for top, bottom in zip(rows[:-1], rows[1:])
+             for left, right in zip(cols[:-1], cols[1:])]
+    order = np.random.RandomState(seed).permutation(len(tiles))
+    return [tiles[i] for i in order]
+
+
+def count_progressive(ar, count_tile, size, tolerance, threshold=0.02, tile_size=TILE_SIZE, batches=BATCHES,
+                      patience=PATIENCE):
+    """Count the colors of an image of shape (height, width, 3) tile by tile, until the counts converge.
+
+count_tile(tile) returns the indices and the pixel counts of the colors of a tile, from a set of size colors.
+After every batch of tiles, the colors whose share of the counted pixels is above threshold, and their
+shares, are compared with those of the previous batch. Counting stops when the colors were the same and no
+share moved by more than tolerance for patience batches in a row, or when every tile is counted. Returns
+the counts by color index and the number of counted pixels.
+"""
+    heigth, width = ar.shape[:2]
+    tiles = tile_order(heigth, width, tile_size)
+    batch_size = max(len(tiles) // batches, 1)
+    counts = np.zeros(size, dtype=np.int64)
+    consumed = 0
+    previous = None
+    stable = 0
+    for start in range(0, len(tiles), batch_size):
+        for top, bottom, left, right in tiles[start:start + batch_size]:
+            indices, tile_counts = count_tile(ar[top:bottom, left:right])
+            np.add.at(counts, indices, tile_counts)
+            consumed += (bottom - top) * (right - left)
+
+        shares = counts / consumed
+        shares[shares <= threshold] = 0
+        if previous is not None and np.array_equal(shares > 0, previous > 0) and \
+                np.abs(shares - previous).max() <= tolerance:
+            stable += 1
+        else:
+            stable = 0
+        previous = shares
+        if stable >= patience:
+            break
+    return counts, consumed
@@ -0,0 +1,88 @@
+from __future__ import division
+import numpy as np
+
+from .conversion import rgb_to_lab_array
+
+# the mean-shift filter runs on the first pyramid level whose width and heigth are at most this many pixels
+COARSE_DIMENSION = 300
+
+
+def build_pyramid(ar, levels, coarse_dimension=COARSE_DIMENSION):
+    """Halve an (height, width, 3) image with 2x2 box filtering until it fits coarse_dimension, at most levels
+times. Returns the list of levels from the given image to the coarsest one."""
+    pyramid = [ar]
+    while len(pyramid) <= levels and max(pyramid[-1].shape[:2]) > coarse_dimension:
+        fine = pyramid[-1]
+        h, w = fine.shape[0] // 2, fine.shape[1] // 2
+        if h == 0 or w == 0:
+            break
+        blocks = fine[:h * 2, :w * 2].reshape(h, 2, w, 2, fine.shape[2]).astype(np.uint16)
+        coarse = blocks.sum(axis=(1, 3))
+        coarse += 2
+        coarse //= 4
+        pyramid.append(coarse.astype(np.uint8))
+    return pyramid
+
+
+def segment_pyramid(ar, levels, tune_radius, range_radius, min_density, speedup, threads=1, out_image=None,
+                    out_labels=None):
+    """Coarse-to-fine mean-shift segmentation of an RGB image of shape (height, width, 3).
+
+The image is segmented at the coarsest of up to levels halvings, with the spatial radius tune_radius(width,
+heigth) of that level and the given speedup level of the filter. The labels are then carried up a level at a time: every pixel inherits the label of
+the coarse pixel it came from, and the pixels on region boundaries are assigned to the neighbouring region
+whose mode is closest to their color at that level. Returns the same tuple as segment with return_regions:
+the image of region modes, the labels, the number of regions, the modes and the region sizes in pixels.
+"""
+    import _pymeanshift
+
+    pyramid = build_pyramid(ar, levels)
+    coarse = pyramid[-1]
+    spatial_radius = tune_radius(coarse.shape[1], coarse.shape[0])
+    _, labels, number_regions, modes, _ = _pymeanshift.segment(
+        coarse, spatial_radius, range_radius, min_density, speedup, threads=threads,
+        return_regions=True)
+    modes_lab = rgb_to_lab_array(modes)
+
+    for fine in reversed(pyramid[:-1]):
+        labels = refine_labels(fine, upsample_labels(labels, fine.shape[:2]), modes_lab)
+
+    heigth, width = ar.shape[:2]
+    if out_labels is None:
+        out_labels = np.empty((heigth, width), dtype=np.intc)
+    out_labels[...] = labels
+    if out_image is None:
+        out_image = np.empty((heigth, width, 3), dtype=np.uint8)
+    np.take(modes, out_labels, axis=0, out=out_image)
+    counts = np.bincount(out_labels.ravel(), minlength=number_regions).astype(np.int32)
+    return out_image, out_labels, number_regions, modes, counts
+
+
+def upsample_labels(labels, shape):
+    """Labels of a level twice as big, of the given shape; rows and columns left over by halving repeat the last."""
+    up = labels.repeat(2, axis=0).repeat(2, axis=1)
+    rows = np.minimum(np.arange(shape[0]), up.shape[0] - 1)
+    cols = np.minimum(np.arange(shape[1]), up.shape[1] - 1)
+    return up[rows[:, np.newaxis], cols[np.newaxis, :]]
+
+
+def refine_labels(image, labels, modes_lab):
+    """Assign every pixel that has a differently labelled 8-neighbour to the closest of its neighbours' regions."""
+    h, w = labels.shape
+    padded = np.pad(labels, 1, mode='edge')
+    neighbours = np.empty((9, h, w), dtype=labels.dtype)
+    k = 0
+    for dy in (0, 1, 2):
+        for dx in (0, 1, 2):
+            neighbours[k] = padded[dy:dy + h, dx:dx + w]
+            k += 1
+    boundary = np.any(neighbours != labels, axis=0)
+    if not boundary.any():
+        return labels
+
+    candidates = neighbours[:, boundary]
+    colors = rgb_to_lab_array(image[boundary])
+    dists = ((modes_lab[candidates] - colors) ** 2).sum(axis=-1)
+    refined = labels.copy()
+    refined[boundary] = candidates[dists.argmin(axis=0), np.arange(candidates.shape[1])]
+    return refined
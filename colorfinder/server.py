@@ -0,0 +1,309 @@
+"""HTTP service mode: python -m colorfinder serve [options]
+
+The palettes are loaded, their lookup tables mapped, and PIL and the mean-shift extension imported once in
+the main process before the workers are forked, so every worker starts warm and shares that state. Endpoints:
+
+POST /find       body is an image file, responds with the find result as JSON
+POST /batch      body is multipart/form-data with one image file per part, responds with a JSON object of
+                 results by part name, failed images get {"error": message}
+GET  /metrics    request counts and per-stage latency histograms in the Prometheus text format
+GET  /health     responds with 'ok'
+
+/find and /batch take the query parameters palette (one of the served palette names), color_space and
+exif_orientation (0 or 1).
+"""
+from __future__ import print_function
+import io
+import os
+import sys
+import json
+import time
+import email
+import signal
+import argparse
+from multiprocessing import Lock, RawArray, cpu_count
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from urllib.parse import urlparse, parse_qs
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from urlparse import urlparse, parse_qs
+
+import numpy as np
+
+from . import ColorFinder, load_image
+from .profiles import get_color_space
+from .instrument import FindStats, STAGES as FIND_STAGES
+
+STAGES = FIND_STAGES + ['request']
+# upper bounds of the latency histogram buckets in seconds, the last bucket is unbounded
+BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+STATUSES = [200, 400, 404, 413, 500]
+
+# biggest accepted request body
+MAX_BODY = 256 * 1024 * 1024
+
+
+class Metrics(object):
+    """Request counts and latency histograms in shared memory, updated by every worker process."""
+
+    def __init__(self):
+        self._lock = Lock()
+        # per stage: a count per bucket, the unbounded bucket, the sum and the number of observations
+        self._width = len(BUCKETS) + 3
+        self._latencies = RawArray('d', len(STAGES) * self._width)
+        self._statuses = RawArray('l', len(STATUSES) + 1)
+
+    def observe(self, stage, seconds):
+        base = STAGES.index(stage) * self._width
+        bucket = len(BUCKETS)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                bucket = i
+                break
+        with self._lock:
+            self._latencies[base + bucket] += 1
+            self._latencies[base + len(BUCKETS) + 1] += seconds
+            self._latencies[base + len(BUCKETS) + 2] += 1
+
+    def count_status(self, status):
+        index = STATUSES.index(status) if status in STATUSES else len(STATUSES)
+        with self._lock:
+            self._statuses[index] += 1
+
+    def render(self):
+        with self._lock:
+            latencies = list(self._latencies)
+            statuses = list(self._statuses)
+        lines = ['# TYPE colorfinder_requests_total counter']
+        for status, count in zip(STATUSES + ['other'], statuses):
+            lines.append('colorfinder_requests_total{status="%s"} %d' % (status, count))
+        lines.append('# TYPE colorfinder_stage_seconds histogram')
+        for s, stage in enumerate(STAGES):
+            values = latencies[s * self._width:(s + 1) * self._width]
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ['+Inf'], values):
+                cumulative += count
+                lines.append('colorfinder_stage_seconds_bucket{stage="%s",le="%s"} %d' % (stage, bound, cumulative))
+            lines.append('colorfinder_stage_seconds_sum{stage="%s"} %f' % (stage, values[-2]))
+            lines.append('colorfinder_stage_seconds_count{stage="%s"} %d' % (stage, values[-1]))
+        return '\n'.join(lines) + '\n'
+
+
+class ClientError(Exception):
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+class ColorFinderService(object):
+    """Finds colors for the request handlers, with a warm ColorFinder per palette name."""
+
+    def __init__(self, finders, default_palette, metrics=None):
+        self.finders = finders
+        self.default_palette = default_palette
+        self.metrics = metrics if metrics is not None else Metrics()
+
+    def finder(self, params):
+        name = params.get('palette', self.default_palette)
+        if name not in self.finders:
+            raise ClientError(400, "'palette' parameter needs to be one of %s" % ', '.join(sorted(self.finders)))
+        return self.finders[name]
+
+    def find(self, data, params):
+        finder = self.finder(params)
+        color_space = params.get('color_space', 'sRGB')
+        try:
+            get_color_space(color_space)
+        except ValueError as e:
+            raise ClientError(400, str(e))
+        exif_orientation = params.get('exif_orientation', '0') not in ('0', 'false', '')
+
+        stats = FindStats()
+        try:
+            im = load_image(io.BytesIO(data), color_space, exif_orientation=exif_orientation, stats=stats,
+                            max_dimension=finder.max_dimension)
+            ar = np.asarray(im)
+            if ar.ndim != 3 or ar.shape[2] != 3:
+                raise ValueError('not an RGB image')
+        except Exception as e:
+            raise ClientError(400, 'cannot decode image: %s' % e)
+        colors = finder.find_in_array(ar, stats=stats)
+        for stage, stage_stats in stats.stages.items():
+            self.metrics.observe(stage, stage_stats.wall)
+        return colors
+
+    def find_batch(self, body, content_type, params):
+        results = {}
+        for name, data in parse_multipart(body, content_type):
+            try:
+                results[name] = self.find(data, params)
+            except ClientError as e:
+                if e.status != 400:
+                    raise
+                results[name] = {'error': str(e)}
+        return results
+
+
+def parse_multipart(body, content_type):
+    """(name, data) pairs of the parts of a multipart/form-data body."""
+    if not content_type or not content_type.startswith('multipart/'):
+        raise ClientError(400, 'batch requests need to be multipart/form-data')
+    head = ('Content-Type: %s\r\nMIME-Version: 1.0\r\n\r\n' % content_type).encode('latin-1')
+    if hasattr(email, 'message_from_bytes'):
+        message = email.message_from_bytes(head + body)
+    else:
+        message = email.message_from_string(head + body)
+    if not message.is_multipart():
+        raise ClientError(400, 'cannot parse multipart body')
+    parts = []
+    for i, part in enumerate(message.get_payload()):
+        name = part.get_param('name', header='content-disposition') or part.get_filename() or str(i)
+        parts.append((name, part.get_payload(decode=True) or b''))
+    return parts
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    server_version = 'colorfinder'
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/metrics':
+            self._respond(200, self.server.service.metrics.render(), 'text/plain; version=0.0.4')
+        elif path == '/health':
+            self._respond(200, 'ok\n', 'text/plain')
+        else:
+            self._respond(404, {'error': 'not found'})
+
+    def do_POST(self):
+        start = time.time()
+        service = self.server.service
+        url = urlparse(self.path)
+        params = dict((key, values[-1]) for key, values in parse_qs(url.query).items())
+        try:
+            if url.path not in ('/find', '/batch'):
+                raise ClientError(404, 'not found')
+            body = self._read_body()
+            service.metrics.observe('read', time.time() - start)
+            if url.path == '/find':
+                result = service.find(body, params)
+            else:
+                result = service.find_batch(body, self.headers.get('Content-Type'), params)
+            status = 200
+        except ClientError as e:
+            status, result = e.status, {'error': str(e)}
+        except Exception as e:
+            status, result = 500, {'error': '%s: %s' % (type(e).__name__, e)}
+        self._respond(status, result)
+        service.metrics.observe('request', time.time() - start)
+
+    def _read_body(self):
+        try:
+            length = int(self.headers.get('Content-Length'))
+        except (TypeError, ValueError):
+            raise ClientError(400, 'Content-Length header is required')
+        if length > MAX_BODY:
+            raise ClientError(413, 'request body is too big')
+        return self.rfile.read(length)
+
+    def _respond(self, status, body, content_type='application/json'):
+        if not isinstance(body, str):
+            body = json.dumps(body, sort_keys=True)
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.service.metrics.count_status(status)
+
+    def log_message(self, format, *args):
+        # access logs go to stderr like BaseHTTPRequestHandler's, prefixed with the worker's pid
+        sys.stderr.write('[%d] %s - %s\n' % (os.getpid(), self.address_string(), format % args))
+
+
+def make_server(address, service):
+    """An HTTPServer bound to address that answers requests with service."""
+    server = HTTPServer(address, RequestHandler)
+    server.service = service
+    return server
+
+
+def warm_up():
+    """Import what every request needs, which colorfinder only imports on first use, so that workers forked
+afterwards share it instead of each importing it on its first request."""
+    from PIL import Image
+    import _pymeanshift
+
+    # the decoders of the common formats, Image.open would import them on first use
+    Image.preinit()
+
+
+def serve(server, workers):
+    """Serve forever on a listening server, with workers forked processes sharing its socket.
+
+With 0 workers, requests are served in this process.
+"""
+    if workers == 0:
+        server.serve_forever()
+        return
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            try:
+                server.serve_forever()
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        while children:
+            pid, _ = os.wait()
+            if pid in children:
+                children.remove(pid)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m colorfinder serve', description='Serve ColorFinder over HTTP.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='port to listen on')
+    parser.add_argument('--workers', type=int, default=cpu_count(),
+                        help='number of worker processes, 0 serves in the main process')
+    parser.add_argument('--palette', action='append', metavar='PALETTE',
+                        help="'colorchecker', 'colorchecker_sg' or a palette JSON or .npz file, can be given several times; "
+                             "the palette of a request is chosen by name, the first one is the default")
+    parser.add_argument('--lut', choices=['full', 'quantized'], help='match colors through a cached lookup table')
+    parser.add_argument('--lut-cache-dir', help='directory of the lookup table cache')
+    args = parser.parse_args(argv)
+
+    finders = {}
+    names = []
+    for palette in args.palette or ['colorchecker_sg']:
+        name = os.path.splitext(os.path.basename(palette))[0].lower()
+        finders[name] = ColorFinder(palette, lut=args.lut, lut_cache_dir=args.lut_cache_dir)
+        names.append(name)
+
+    warm_up()
+    server = make_server((args.host, args.port), ColorFinderService(finders, names[0]))
+    print('serving palettes %s on http://%s:%d with %d workers'
+          % (', '.join(names), args.host, server.server_address[1], args.workers), file=sys.stderr)
+    serve(server, args.workers)
+    return 0
+
@@ -0,0 +1,63 @@
+from __future__ import division
+import numpy as np
+
+from .progressive import tile_order, TILE_SIZE
+
+# a tile of a frame whose pixels differ from those it had when it was last segmented by at most this many 8-bit
+# levels on average keeps the colors counted then
+STREAM_THRESHOLD = 3.0
+
+
+class StreamState(object):
+    """What find_stream carries from one frame to the next, for frames of a given shape.
+
+Frames are split into the tiles of progressive counting. For every tile, the pixels it had when it was last
+segmented and the palette indices and pixel counts of its colors are kept, and the palette matches of region
+colors are kept for the whole stream, so colors seen in earlier frames are not matched again.
+"""
+
+    def __init__(self, shape, tile_size=TILE_SIZE):
+        heigth, width = shape[:2]
+        self.shape = shape
+        self.tiles = sorted(tile_order(heigth, width, tile_size))
+        self.reference = None
+        self.tile_counts = [None] * len(self.tiles)
+        # palette index by rgb_hash_array key of region colors
+        self.matches = {}
+
+    def changed(self, ar, threshold=STREAM_THRESHOLD):
+        """Indices of the tiles of frame ar that moved by more than threshold since they were last segmented."""
+        if self.reference is None:
+            return list(range(len(self.tiles)))
+        changed = []
+        for i, (top, bottom, left, right) in enumerate(self.tiles):
+            diff = np.abs(ar[top:bottom, left:right].astype(np.int16) - self.reference[top:bottom, left:right])
+            if diff.mean() > threshold:
+                changed.append(i)
+        return changed
+
+    def update(self, ar, count_tile, changed):
+        """Count the changed tiles of frame ar again with count_tile, which returns the palette indices and the
+pixel counts of the colors of a tile."""
+        if self.reference is None:
+            self.reference = np.empty(self.shape, dtype=np.uint8)
+        for i in changed:
+            top, bottom, left, right = self.tiles[i]
+            tile = ar[top:bottom, left:right]
+            self.tile_counts[i] = count_tile(tile)
+            self.reference[top:bottom, left:right] = tile
+
+    def counts(self, size):
+        """Pixel counts of the frame by palette index, from a palette of size colors."""
+        counts = np.zeros(size, dtype=np.int64)
+        for indices, tile_counts in self.tile_counts:
+            np.add.at(counts, indices, tile_counts)
+        return counts
+
+    def match(self, keys, match_keys):
+        """Palette indices of the region colors given by their keys, calling match_keys only with the keys
+that were not matched before."""
+        new = np.array([key for key in keys.tolist() if key not in self.matches], dtype=keys.dtype)
+        if len(new):
+            self.matches.update(zip(new.tolist(), np.asarray(match_keys(new)).tolist()))
+        return np.array([self.matches[key] for key in keys.tolist()], dtype=np.intp)
@@ -0,0 +1,155 @@
+from __future__ import division
+import numpy as np
+
+from .conversion import rgb_hash_array, rgb_dehash_array, rgb_to_lab_array, lab_to_rgb_array
+from .progressive import tile_order
+
+# side of the tiles of tiled processing, in pixels, the memory of the segmentation grows with its square
+TILED_TILE_SIZE = 256
+# pixels around each tile that are segmented with it but counted with the neighbouring tile, so that the pixels
+# near tile edges are filtered with all their neighbours; it needs to be at least the spatial radius
+MARGIN = 16
+# L*a*b* distance below which the region colors of neighbouring tiles are fused across their seam; wider than
+# the range radius of the segmentation, as tile regions are themselves fused from regions within the radius
+FUSE_RADIUS = 12
+# passes of fusion, each fusing the colors of the regions fused by the previous pass
+FUSE_PASSES = 5
+
+
+class ColorCounts(object):
+    """Pixel counts of distinct 8-bit RGB colors, given by their rgb_hash_array keys.
+
+Counts of separate parts of an image merge into the counts of the whole image, in any order, so tiles can be
+counted apart, on several threads or machines. seams holds the colors along the edges of the parts, see
+tile_seams, by which fuse joins the regions that continue from one part into the next.
+"""
+
+    def __init__(self, keys=None, counts=None, seams=None):
+        self.keys = np.zeros(0, dtype=np.uint32) if keys is None else np.asarray(keys, dtype=np.uint32)
+        self.counts = np.zeros(0, dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        if self.keys.shape != self.counts.shape:
+            raise ValueError("'counts' parameter needs to have the shape of 'keys'")
+        self.seams = {} if seams is None else seams
+
+    def merge(self, other):
+        """The counts of both parts together."""
+        keys, inverse = np.unique(np.concatenate([self.keys, other.keys]), return_inverse=True)
+        counts = np.zeros(len(keys), dtype=np.int64)
+        np.add.at(counts, inverse, np.concatenate([self.counts, other.counts]))
+        seams = dict(self.seams)
+        seams.update(other.seams)
+        return ColorCounts(keys, counts, seams)
+
+    def fuse(self, radius=FUSE_RADIUS, passes=FUSE_PASSES):
+        """The counts with the colors of neighbouring parts fused where they meet at a seam, as the region
+fusion of the segmenter fuses neighbouring regions: colors adjacent across a seam and closer than radius in
+L*a*b* are joined, every group of joined colors takes their mean weighted by their counts, and groups are
+joined again by their means for up to passes passes. Requires scipy."""
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import connected_components
+
+        pairs = self._seam_pairs()
+        if len(pairs) == 0:
+            return ColorCounts(self.keys, self.counts)
+        order = np.argsort(self.keys)
+        first, second = order[np.searchsorted(self.keys, pairs.T, sorter=order)]
+        lab = rgb_to_lab_array(rgb_dehash_array(self.keys))
+        groups = np.arange(len(self.keys))
+        for _ in range(passes):
+            number_groups = groups.max() + 1
+            means = _weighted_means(lab, self.counts, groups, number_groups)
+            joined = np.sqrt(((means[groups[first]] - means[groups[second]]) ** 2).sum(axis=1)) < radius
+            graph = coo_matrix((np.ones(joined.sum()), (groups[first][joined], groups[second][joined])),
+                               shape=(number_groups, number_groups))
+            number_fused, fused = connected_components(graph, directed=False)
+            groups = fused[groups]
+            if number_fused == number_groups:
+                break
+
+        means = _weighted_means(lab, self.counts, groups, groups.max() + 1)
+        colors = np.clip(lab_to_rgb_array(means).round(), 0, 255).astype(np.uint8)
+        # group means may round to the same color
+        keys, inverse = np.unique(rgb_hash_array(colors)[groups], return_inverse=True)
+        return ColorCounts(keys, np.bincount(inverse, weights=self.counts, minlength=len(keys)).round())
+
+    def _seam_pairs(self):
+        """Distinct pairs of different colors adjacent across the seams, as an (n, 2) array of keys."""
+        pairs = []
+        for (axis, position, start, stop), keys in self.seams.items():
+            following = self.seams.get((axis, position + 1, start, stop))
+            if following is not None:
+                pairs.append(np.stack([keys, following], axis=1))
+        if not pairs:
+            return np.zeros((0, 2), dtype=np.uint32)
+        pairs = np.concatenate(pairs)
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+        # distinct pairs, as single 64-bit keys
+        pairs = np.unique(pairs[:, 0].astype(np.uint64) << np.uint64(32) | pairs[:, 1])
+        return np.stack([pairs >> np.uint64(32), pairs & np.uint64(0xffffffff)], axis=1).astype(np.uint32)
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def _weighted_means(values, weights, groups, number_groups):
+    totals = np.bincount(groups, weights=weights, minlength=number_groups)
+    return np.stack([np.bincount(groups, weights=values[:, c] * weights, minlength=number_groups) / totals
+                     for c in range(values.shape[1])], axis=1)
+
+
+def tile_seams(keys, top, left):
+    """The seams of a tile whose pixels are given by an array of keys, with its top left pixel at (top, left)
+in the image: its first and last rows and columns, by ('row', y, left, right) and ('col', x, top, bottom)
+bounds in the image. The seams of neighbouring tiles of tile_windows meet at consecutive y or x."""
+    heigth, width = keys.shape
+    bottom, right = top + heigth, left + width
+    return {
+        ('row', top, left, right): keys[0].copy(),
+        ('row', bottom - 1, left, right): keys[-1].copy(),
+        ('col', left, top, bottom): keys[:, 0].copy(),
+        ('col', right - 1, top, bottom): keys[:, -1].copy(),
+    }
+
+
+def tile_windows(heigth, width, tile_size=TILED_TILE_SIZE, margin=MARGIN):
+    """Tiles of about tile_size pixels along each side covering an image, in row order, as pairs of the
+(top, bottom, left, right) bounds of the tile grown by margin pixels within the image, and of the tile itself
+relative to the grown one."""
+    windows = []
+    for top, bottom, left, right in sorted(tile_order(heigth, width, tile_size)):
+        outer = (max(top - margin, 0), min(bottom + margin, heigth), max(left - margin, 0), min(right + margin, width))
+        windows.append((outer, (top - outer[0], bottom - outer[0], left - outer[2], right - outer[2])))
+    return windows
+
+
+def count_tiled(heigth, width, count_tile, tile_size=TILED_TILE_SIZE, margin=MARGIN, max_workers=1):
+    """Count the colors of an image tile by tile, returning the merged ColorCounts.
+
+count_tile(outer, inner) reads and segments the pixels within the outer bounds and returns the ColorCounts of
+the pixels within the inner bounds, see tile_windows. Tiles are counted on max_workers threads, each reading
+its own tile, so at most max_workers tiles are in memory at once.
+"""
+    windows = tile_windows(heigth, width, tile_size, margin)
+
+    def count_window(window):
+        return count_tile(*window)
+
+    merged = ColorCounts()
+    if max_workers <= 1 or len(windows) == 1:
+        for window in windows:
+            merged = merged.merge(count_window(window))
+        return merged
+
+    from multiprocessing.pool import ThreadPool
+
+    pool = ThreadPool(max_workers)
+    try:
+        for counts in pool.imap_unordered(count_window, windows):
+            merged = merged.merge(counts)
+    finally:
+        pool.terminate()
+    return merged
@@ -109,6 +109,9 @@ MeanShift::MeanShift( void )
 
 	//indicate that the lattice weight map is undefined
 	weightMapDefined			= false;
+
+	//every data point weighs 1
+	pointWeights				= NULL;
 	
 	//allocate memory for error message buffer...
 	ErrorMessage				= new char [256];
@@ -556,6 +559,74 @@ void MeanShift::RemoveLatticeWeightMap(void)
 	//done.
 	return;
 
+}
+
+/*******************************************************/
+/*Set Point Weights                                    */
+/*******************************************************/
+/*Weights each point of the input data set when mean   */
+/*shift is computed using the kd-tree.                 */
+/*******************************************************/
+/*Pre:                                                 */
+/*      - an input data set has been defined using     */
+/*        DefineInput                                  */
+/*      - wt is a floating point array of size L       */
+/*        specifying for each data point a weight      */
+/*Post:                                                */
+/*      - wt has been copied into the point weights.   */
+/*******************************************************/
+
+void MeanShift::SetPointWeights(float *wt)
+{
+	//make sure wt is not NULL
+	if(!wt)
+	{
+		ErrorHandler("MeanShift", "SetPointWeights", "Specified weights are NULL.");
+		return;
+	}
+
+	//make sure that the input has been defined
+	if(!class_state.INPUT_DEFINED)
+	{
+		ErrorHandler("MeanShift", "SetPointWeights", "Input data set has not been defined.");
+		return;
+	}
+
+	//allocate memory for the weights if needed
+	if(!pointWeights)
+		pointWeights = new float [L];
+
+	//populate pointWeights using wt
+	int i;
+	for(i = 0; i < L; i++)
+		pointWeights[i] = wt[i];
+
+	//done.
+	return;
+
+}
+
+/*******************************************************/
+/*Remove Point Weights                                 */
+/*******************************************************/
+/*Removes the point weights.                           */
+/*******************************************************/
+/*Post:                                                */
+/*      - every data point weighs 1.                   */
+/*      - if no weights were defined NO error is       */
+/*        flagged.                                     */
+/*******************************************************/
+
+void MeanShift::RemovePointWeights(void)
+{
+
+	if(pointWeights)
+		delete [] pointWeights;
+	pointWeights = NULL;
+
+	//done.
+	return;
+
 }
 
 
@@ -1447,6 +1518,9 @@ void MeanShift::ResetInput( void )
 	//de-allocate memory of input data structure (BST)
 	if(data)	delete [] data;
 	if(forest)	delete [] forest;
+
+	//point weights belong to the data set
+	RemovePointWeights();
 	
 	//initialize input data structure for re-use
 	data	= NULL;
@@ -1694,9 +1768,21 @@ void MeanShift::uniformSearch(tree *gt, int gd, double *Mh_ptr, double *yk_ptr)
 				
 				if(diff < 1.0)
 				{
-					wsum += 1;
-					for(j = 0; j < N; j++)
-						Mh_ptr[j] += c_t->x[j];
+					if(pointWeights)
+					{
+						// weight of the point, found by its
+						// position in the data set
+						double pw = pointWeights[(c_t->x - data)/N];
+						wsum += pw;
+						for(j = 0; j < N; j++)
+							Mh_ptr[j] += pw*c_t->x[j];
+					}
+					else
+					{
+						wsum += 1;
+						for(j = 0; j < N; j++)
+							Mh_ptr[j] += c_t->x[j];
+					}
 				}
 				
 			}
@@ -1819,7 +1905,7 @@ void MeanShift::generalSearch(tree *gt, int gd, double *Mh_ptr, double *yk_ptr)
 				{
 					
 					// Initialize total weight to 1
-					tw = 1;
+					tw = (pointWeights ? pointWeights[(c_t->x - data)/N] : 1);
 					
 					// Calculate weight factor using weight function
 					// lookup tables and uv
@@ -442,6 +442,71 @@ class MeanShift {
 
   void RemoveLatticeWeightMap(void);
 
+  //--\\||//--\\||//--\\||//--\\||//--\\||//--\\||//--\\||//
+  //<--------------------------------------------------->|//
+  //|                                                    |//
+  //|	Method Name:								     |//
+  //|   ============								     |//
+  //|			    * Set Point Weights *                |//
+  //|                                                    |//
+  //<--------------------------------------------------->|//
+  //|                                                    |//
+  //|	Description:								     |//
+  //|	============								     |//
+  //|                                                    |//
+  //|   Uploads a weight for each point of the input     |//
+  //|   data set, used to weight the kernel when         |//
+  //|   computing mean shift with FindMode. A point of   |//
+  //|   weight w counts as w coincident points, so a     |//
+  //|   histogram can be shifted over its occupied bins. |//
+  //|                                                    |//
+  //|   The arguments to this method are:                |//
+  //|                                                    |//
+  //|   <* weights *>                                    |//
+  //|   A floating point array of size L specifying for  |//
+  //|   each data point a weight.                        |//
+  //|                                                    |//
+  //|   Note: DefineInput must be called prior to call-  |//
+  //|         ing this method.                           |//
+  //|                                                    |//
+  //<--------------------------------------------------->|//
+  //|                                                    |//
+  //|	Usage:      								     |//
+  //|   ======      								     |//
+  //|		SetPointWeights(weights)                     |//
+  //|                                                    |//
+  //<--------------------------------------------------->|//
+  //--\\||//--\\||//--\\||//--\\||//--\\||//--\\||//--\\||//
+
+  void SetPointWeights(float*);
+
+  //--\\||//--\\||//--\\||//--\\||//--\\||//--\\||//--\\||//
+  //<--------------------------------------------------->|//
+  //|                                                    |//
+  //|	Method Name:								     |//
+  //|   ============								     |//
+  //|			  * Remove Point Weights *               |//
+  //|                                                    |//
+  //<--------------------------------------------------->|//
+  //|                                                    |//
+  //|	Description:								     |//
+  //|	============								     |//
+  //|                                                    |//
+  //|   Removes the point weights, every data point      |//
+  //|   weighs 1 again. An error is NOT flagged if no    |//
+  //|   weights were defined.                            |//
+  //|                                                    |//
+  //<--------------------------------------------------->|//
+  //|                                                    |//
+  //|	Usage:      								     |//
+  //|   ======      								     |//
+  //|		RemovePointWeights()                         |//
+  //|                                                    |//
+  //<--------------------------------------------------->|//
+  //--\\||//--\\||//--\\||//--\\||//--\\||//--\\||//--\\||//
+
+  void RemovePointWeights(void);
+
   /*/\/\/\/\/\/\/\/\/\/\/\/\*/
   /* Mean Shift Operations  */
   /*\/\/\/\/\/\/\/\/\/\/\/\/*/
@@ -785,6 +850,9 @@ class MeanShift {
 	bool			weightMapDefined;					// used to indicate if a lattice weight map has been
 														// defined
 
+	float			*pointWeights;						// weights of the input data points used by FindMode,
+														// NULL if every point weighs 1
+
    //##########################################
    //#######        CLASS STATE        ########
    //##########################################
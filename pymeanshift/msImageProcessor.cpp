@@ -47,6 +47,64 @@ Implemented by Chris M. Christoudias, Bogdan Georgescu
 #include	<string.h>
 #include	<stdlib.h>
 
+//include libraries used to filter the lattice on several threads
+#include	<vector>
+#include	<thread>
+#include	<atomic>
+#include	<functional>
+
+//filters the data points of the lattice having an index in [bandStart, bandEnd)
+typedef std::function<void(int bandStart, int bandEnd)> FilterBand;
+
+//number of horizontal bands the lattice is split into when it is
+//filtered on several threads
+#define	FILTER_BANDS		32
+
+/*******************************************************/
+/*Run Filter Bands                                     */
+/*******************************************************/
+/*Applies filterBand to the whole lattice.             */
+/*******************************************************/
+/*Pre:                                                 */
+/*      - filterBand filters the data points of a band */
+/*        and only keeps basin of attraction book-     */
+/*        keeping for data points inside that band     */
+/*Post:                                                */
+/*      - the lattice is split into FILTER_BANDS bands */
+/*        of rows, filtered in order on the calling    */
+/*        thread or taken in turn by several threads.  */
+/*        The bands do not depend on the number of     */
+/*        threads, so neither does the result.         */
+/*******************************************************/
+
+static void RunFilterBands(FilterBand filterBand, int height, int width, int threads)
+{
+	int nBands = (height < FILTER_BANDS) ? height : FILTER_BANDS;
+	if(threads <= 1)
+	{
+		for(int band = 0; band < nBands; band++)
+			filterBand((band*height/nBands)*width, ((band+1)*height/nBands)*width);
+		return;
+	}
+
+	std::atomic<int> nextBand(0);
+	auto worker = [&]()
+	{
+		int band;
+		while((band = nextBand++) < nBands)
+			filterBand((band*height/nBands)*width, ((band+1)*height/nBands)*width);
+	};
+
+	if(threads > nBands)
+		threads = nBands;
+	std::vector<std::thread> pool;
+	for(int t = 1; t < threads; t++)
+		pool.push_back(std::thread(worker));
+	worker();
+	for(size_t t = 0; t < pool.size(); t++)
+		pool[t].join();
+}
+
 /*@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@*/
 /*@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@*/
 /*@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@      PUBLIC METHODS     @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@*/
@@ -109,6 +167,9 @@ msImageProcessor::msImageProcessor( void )
 
 
    LUV_treshold = 1.0;
+
+	//filter on the calling thread only
+	filterThreads		= 1;
 }
 
 /*******************************************************/
@@ -158,6 +219,24 @@ msImageProcessor::~msImageProcessor( void )
 /*******************************************************/
 
 void msImageProcessor::DefineImage(byte *data_, imageType type, int height_, int width_)
+{
+
+	//obtain image dimension from image type
+	int dim;
+	if(type == COLOR)
+		dim	= 3;
+	else
+		dim = 1;
+
+	//the data is stored contiguously
+	DefineImage(data_, type, height_, width_, (long)(width_*dim), (long)(dim), 1);
+
+	//done.
+	return;
+
+}
+
+void msImageProcessor::DefineImage(byte *data_, imageType type, int height_, int width_, long rowStride, long pixelStride, long channelStride)
 {
 
 	//obtain image dimension from image type
@@ -168,17 +247,26 @@ void msImageProcessor::DefineImage(byte *data_, imageType type, int height_, int
 		dim = 1;
 
 	//perfor rgb to luv conversion
-	int		i;
+	int		i, x, y;
+	byte	*pixel, rgb[3];
 	float	*luv	= new float [height_*width_*dim];
-	if(dim == 1)
-	{
-		for(i = 0; i < height_*width_; i++)
-			luv[i]	= (float)(data_[i]);
-	}
-	else
+	for(y = 0, i = 0; y < height_; y++)
 	{
-		for(i = 0; i < height_*width_; i++)
-			RGBtoLUV(&data_[dim*i], &luv[dim*i]);
+		pixel	= data_ + y*rowStride;
+		for(x = 0; x < width_; x++, i++, pixel += pixelStride)
+		{
+			if(dim == 1)
+			{
+				luv[i]	= (float)(pixel[0]);
+			}
+			else
+			{
+				rgb[0]	= pixel[0];
+				rgb[1]	= pixel[channelStride];
+				rgb[2]	= pixel[2*channelStride];
+				RGBtoLUV(rgb, &luv[dim*i]);
+			}
+		}
 	}
 
 	//define input defined on a lattice using mean shift base class
@@ -1181,6 +1269,50 @@ int msImageProcessor::GetRegions(int **labels_out, float **modes_out, int **MPC_
 	return regionCount;
 }
 
+int msImageProcessor::GetLabels(int *labels_out)
+{
+	//check to see if output has been defined for the given input image...
+	if(class_state.OUTPUT_DEFINED == false)
+		return -1;
+
+	//populate labels_out with image labels
+	memcpy(labels_out, labels, L*sizeof(int));
+
+	//done. Return the number of regions resulting from filtering or segmentation.
+	return regionCount;
+}
+
+int msImageProcessor::GetRegionModes(byte *modes_out, int *MPC_out)
+{
+	//check to see if output has been defined for the given input image...
+	if(class_state.OUTPUT_DEFINED == false)
+		return -1;
+
+	//populate modes_out with the color of each region
+	int i, pxValue;
+	for(i = 0; i < regionCount; i++)
+	{
+		if(N == 1)
+		{
+			pxValue = (int)(modes[i]+0.5);
+			if(pxValue < 0)
+				modes_out[i] = (byte)(0);
+			else if(pxValue > 255)
+				modes_out[i] = (byte)(255);
+			else
+				modes_out[i] = (byte)(pxValue);
+		}
+		else
+			LUVtoRGB(&modes[N*i], &modes_out[N*i]);
+	}
+
+	//populate MPC_out with the point count of each region
+	memcpy(MPC_out, modePointCounts, regionCount*sizeof(int));
+
+	//done. Return the number of regions resulting from filtering or segmentation.
+	return regionCount;
+}
+
 /*@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@*/
 /*@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@*/
 /*@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@     PRIVATE METHODS     @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@*/
@@ -3358,8 +3490,7 @@ void msImageProcessor::DestroyOutput( void )
 void msImageProcessor::NewOptimizedFilter1(float sigmaS, float sigmaR)
 {
 	// Declare Variables
-	int		iterationCount, i, j, k, modeCandidateX, modeCandidateY, modeCandidate_i;
-	double	mvAbs, diff, el;
+	int		i, j;
 	
 	//make sure that a lattice height and width have
 	//been defined...
@@ -3379,15 +3510,6 @@ void msImageProcessor::NewOptimizedFilter1(float sigmaS, float sigmaR)
 	//define input data dimension with lattice
 	int lN	= N + 2;
 	
-	// Traverse each data point applying mean shift
-	// to each data point
-	
-	// Allcocate memory for yk
-	double	*yk		= new double [lN];
-	
-	// Allocate memory for Mh
-	double	*Mh		= new double [lN];
-
    // let's use some temporary data
    float* sdata;
    sdata = new float[lN*L];
@@ -3482,7 +3604,6 @@ void msImageProcessor::NewOptimizedFilter1(float sigmaS, float sigmaR)
          }
       }
    }
-   double wsuml, weight;
    double hiLTr = 80.0/sigmaR;
    // done indexing/hashing
 
@@ -3499,7 +3620,24 @@ void msImageProcessor::NewOptimizedFilter1(float sigmaS, float sigmaR)
 #endif
 
 
-	for(i = 0; i < L; i++)
+	// Traverse each data point of a band applying mean shift
+	// to each data point
+	FilterBand filterBand = [&](int bandStart, int bandEnd)
+	{
+		int		iterationCount, i, j, k, modeCandidateX, modeCandidateY, modeCandidate_i;
+		int		idxs, idxd, cBuck1, cBuck2, cBuck3, cBuck;
+		double	mvAbs, diff, el, wsuml, weight;
+
+		// Allocate memory for yk and Mh
+		double	*yk		= new double [lN];
+		double	*Mh		= new double [lN];
+
+		// basin of attraction point list of this band, only points
+		// of the band are ever added to it
+		int		*pointList	= new int [bandEnd - bandStart];
+		int		pointCount;
+
+	for(i = bandStart; i < bandEnd; i++)
 	{
 		// if a mode was already assigned to this data point
 		// then skip this point, otherwise proceed to
@@ -3627,7 +3765,8 @@ void msImageProcessor::NewOptimizedFilter1(float sigmaS, float sigmaR)
 			//     to (modeTable[basin_i] = 1), so assign to
 			//     this data point the same mode as that of basin_i
 
-			if ((modeTable[modeCandidate_i] != 2) && (modeCandidate_i != i))
+			if ((modeTable[modeCandidate_i] != 2) && (modeCandidate_i != i) &&
+				(modeCandidate_i >= bandStart) && (modeCandidate_i < bandEnd))
 			{
 				// obtain the data point at basin_i to
 				// see if it is within h*TC_DIST_FACTOR of
@@ -3817,6 +3956,13 @@ void msImageProcessor::NewOptimizedFilter1(float sigmaS, float sigmaR)
 			break;		
 #endif
 	}
+
+		delete [] yk;
+		delete [] Mh;
+		delete [] pointList;
+	};
+
+	RunFilterBands(filterBand, height, width, filterThreads);
 	
 	// Prompt user that filtering is completed
 #ifdef PROMPT
@@ -3829,9 +3975,6 @@ void msImageProcessor::NewOptimizedFilter1(float sigmaS, float sigmaR)
    delete [] buckets;
    delete [] slist;
    delete [] sdata;
-
-	delete [] yk;
-	delete [] Mh;
 	
 	// done.
 	return;
@@ -3842,8 +3985,7 @@ void msImageProcessor::NewOptimizedFilter1(float sigmaS, float sigmaR)
 void msImageProcessor::NewOptimizedFilter2(float sigmaS, float sigmaR)
 {
 	// Declare Variables
-	int		iterationCount, i, j, k, modeCandidateX, modeCandidateY, modeCandidate_i;
-	double	mvAbs, diff, el;
+	int		i, j;
 	
 	//make sure that a lattice height and width have
 	//been defined...
@@ -3863,15 +4005,6 @@ void msImageProcessor::NewOptimizedFilter2(float sigmaS, float sigmaR)
 	//define input data dimension with lattice
 	int lN	= N + 2;
 	
-	// Traverse each data point applying mean shift
-	// to each data point
-	
-	// Allcocate memory for yk
-	double	*yk		= new double [lN];
-	
-	// Allocate memory for Mh
-	double	*Mh		= new double [lN];
-
    // let's use some temporary data
    float* sdata;
    sdata = new float[lN*L];
@@ -3966,7 +4099,6 @@ void msImageProcessor::NewOptimizedFilter2(float sigmaS, float sigmaR)
          }
       }
    }
-   double wsuml, weight;
    double hiLTr = 80.0/sigmaR;
    // done indexing/hashing
 
@@ -3983,7 +4115,24 @@ void msImageProcessor::NewOptimizedFilter2(float sigmaS, float sigmaR)
 #endif
 
 
-	for(i = 0; i < L; i++)
+	// Traverse each data point of a band applying mean shift
+	// to each data point
+	FilterBand filterBand = [&](int bandStart, int bandEnd)
+	{
+		int		iterationCount, i, j, k, modeCandidateX, modeCandidateY, modeCandidate_i;
+		int		idxs, idxd, cBuck1, cBuck2, cBuck3, cBuck;
+		double	mvAbs, diff, el, wsuml, weight;
+
+		// Allocate memory for yk and Mh
+		double	*yk		= new double [lN];
+		double	*Mh		= new double [lN];
+
+		// basin of attraction point list of this band, only points
+		// of the band are ever added to it
+		int		*pointList	= new int [bandEnd - bandStart];
+		int		pointCount;
+
+	for(i = bandStart; i < bandEnd; i++)
 	{
 		// if a mode was already assigned to this data point
 		// then skip this point, otherwise proceed to
@@ -4051,7 +4200,7 @@ void msImageProcessor::NewOptimizedFilter2(float sigmaS, float sigmaR)
                   wsuml += weight;
 
       				//set basin of attraction mode table
-                  if (diff < speedThreshold)
+                  if ((diff < speedThreshold) && (idxd >= bandStart) && (idxd < bandEnd))
                   {
 				         if(modeTable[idxd] == 0)
 				         {
@@ -4121,7 +4270,8 @@ void msImageProcessor::NewOptimizedFilter2(float sigmaS, float sigmaR)
 			//     to (modeTable[basin_i] = 1), so assign to
 			//     this data point the same mode as that of basin_i
 
-			if ((modeTable[modeCandidate_i] != 2) && (modeCandidate_i != i))
+			if ((modeTable[modeCandidate_i] != 2) && (modeCandidate_i != i) &&
+				(modeCandidate_i >= bandStart) && (modeCandidate_i < bandEnd))
 			{
 				// obtain the data point at basin_i to
 				// see if it is within h*TC_DIST_FACTOR of
@@ -4230,7 +4380,7 @@ void msImageProcessor::NewOptimizedFilter2(float sigmaS, float sigmaR)
                      wsuml += weight;
 
          				//set basin of attraction mode table
-                     if (diff < speedThreshold)
+                     if ((diff < speedThreshold) && (idxd >= bandStart) && (idxd < bandEnd))
                      {
    				         if(modeTable[idxd] == 0)
 				            {
@@ -4322,6 +4472,13 @@ void msImageProcessor::NewOptimizedFilter2(float sigmaS, float sigmaR)
 			break;		
 #endif
 	}
+
+		delete [] yk;
+		delete [] Mh;
+		delete [] pointList;
+	};
+
+	RunFilterBands(filterBand, height, width, filterThreads);
 	
 	// Prompt user that filtering is completed
 #ifdef PROMPT
@@ -4334,9 +4491,6 @@ void msImageProcessor::NewOptimizedFilter2(float sigmaS, float sigmaR)
    delete [] buckets;
    delete [] slist;
    delete [] sdata;
-
-	delete [] yk;
-	delete [] Mh;
 	
 	// done.
 	return;
@@ -4347,8 +4501,7 @@ void msImageProcessor::NewNonOptimizedFilter(float sigmaS, float sigmaR)
 {
 
 	// Declare Variables
-	int   iterationCount, i, j, k;
-	double mvAbs, diff, el;
+	int   i, j;
 	
 	//make sure that a lattice height and width have
 	//been defined...
@@ -4368,15 +4521,6 @@ void msImageProcessor::NewNonOptimizedFilter(float sigmaS, float sigmaR)
 	//define input data dimension with lattice
 	int lN	= N + 2;
 	
-	// Traverse each data point applying mean shift
-	// to each data point
-	
-	// Allcocate memory for yk
-	double	*yk		= new double [lN];
-	
-	// Allocate memory for Mh
-	double	*Mh		= new double [lN];
-
    // let's use some temporary data
    double* sdata;
    sdata = new double[lN*L];
@@ -4471,7 +4615,6 @@ void msImageProcessor::NewNonOptimizedFilter(float sigmaS, float sigmaR)
          }
       }
    }
-   double wsuml, weight;
    double hiLTr = 80.0/sigmaR;
    // done indexing/hashing
 	
@@ -4483,7 +4626,19 @@ void msImageProcessor::NewNonOptimizedFilter(float sigmaS, float sigmaR)
 #endif
 #endif
 
-	for(i = 0; i < L; i++)
+	// Traverse each data point of a band applying mean shift
+	// to each data point
+	FilterBand filterBand = [&](int bandStart, int bandEnd)
+	{
+		int		iterationCount, i, j, k;
+		int		idxs, idxd, cBuck1, cBuck2, cBuck3, cBuck;
+		double	mvAbs, diff, el, wsuml, weight;
+
+		// Allocate memory for yk and Mh
+		double	*yk		= new double [lN];
+		double	*Mh		= new double [lN];
+
+	for(i = bandStart; i < bandEnd; i++)
 	{
 
 		// Assign window center (window centers are
@@ -4677,6 +4832,12 @@ void msImageProcessor::NewNonOptimizedFilter(float sigmaS, float sigmaR)
 			break;
 #endif
 	}
+
+		delete [] yk;
+		delete [] Mh;
+	};
+
+	RunFilterBands(filterBand, height, width, filterThreads);
 	
 	// Prompt user that filtering is completed
 #ifdef PROMPT
@@ -4691,9 +4852,6 @@ void msImageProcessor::NewNonOptimizedFilter(float sigmaS, float sigmaR)
    delete [] slist;
    delete [] sdata;
 
-	delete [] yk;
-	delete [] Mh;
-
 	// done.
 	return;
 
@@ -4704,6 +4862,11 @@ void msImageProcessor::SetSpeedThreshold(float speedUpThreshold)
    speedThreshold = speedUpThreshold;
 }
 
+void msImageProcessor::SetFilterThreads(int threads)
+{
+   filterThreads = (threads < 1) ? 1 : threads;
+}
+
 /*@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@*/
 /*@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@*/
 /*@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@ END OF CLASS DEFINITION @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@*/
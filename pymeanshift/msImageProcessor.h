@@ -144,6 +144,11 @@ public:
   //--\\||//--\\||//--\\||//--\\||//--\\||//--\\||//--\\||//
 
   void DefineImage(byte*,imageType, int, int);
+
+  // Same as above, but the image is read in place from a strided buffer:
+  // pixel (y, x) channel c is at data[y*rowStride + x*pixelStride + c*channelStride]
+  // (strides in bytes, may be negative)
+  void DefineImage(byte*,imageType, int, int, long, long, long);
   void DefineBgImage(byte*, imageType , int , int );
 
 
@@ -617,8 +622,20 @@ public:
 
   int GetRegions(int**, float**, int**);
 
+  // Same as GetRegions, but only writes the label image into a
+  // caller provided array of height x width integers
+  int GetLabels(int*);
+
+  // Writes the mode of each region, converted to RGB (or gray scale)
+  // the same way as by GetResults, and the number of points of each
+  // region into caller provided arrays of regionCount*N bytes and
+  // regionCount integers
+  int GetRegionModes(byte*, int*);
+
 
   void SetSpeedThreshold(float);
+
+  void SetFilterThreads(int);  // number of threads used to filter the lattice
 private:
 
   //========================
@@ -793,6 +810,8 @@ private:
 											//together, thus defining image regions
 
    float speedThreshold; // the % of window radius used in new optimized filter 2.
+
+   int filterThreads; // number of threads used by the new filters
 };
 
 #endif
\ No newline at end of file
@@ -20,6 +20,7 @@
 #include <Python.h>
 #include <numpy/arrayobject.h>
 #include <cstring>
+#include <algorithm>
 
 #include "msImageProcessor.h"
 
@@ -28,28 +29,71 @@
 // PyMeanShift related functions
 // ***************************************************************************
 
-// Segment image function (the only function provided by the extension)
-static PyObject* segment(PyObject* self, PyObject* args)
+// Check that an array given by the caller to receive a result has the expected type and
+// dimensions, and can be written directly (C-contiguous and writeable)
+static int checkOutputArray(PyObject* array, const char* name, int typeNum, int nbDimensions, npy_intp* dimensions)
+{
+  int i;
+
+  if(!PyArray_Check(array) || PyArray_TYPE((PyArrayObject*)array) != typeNum ||
+     PyArray_NDIM((PyArrayObject*)array) != nbDimensions ||
+     !PyArray_IS_C_CONTIGUOUS((PyArrayObject*)array) || !PyArray_ISWRITEABLE((PyArrayObject*)array))
+  {
+    PyErr_Format(PyExc_ValueError, "%s must be a writeable C-contiguous %d dimensional array of %s", name,
+                 nbDimensions, typeNum == NPY_UBYTE ? "uint8" : "int32");
+    return 0;
+  }
+
+  for(i = 0; i < nbDimensions; i++)
+  {
+    if(PyArray_DIM((PyArrayObject*)array, i) != dimensions[i])
+    {
+      PyErr_Format(PyExc_ValueError, "%s does not have the shape of the image", name);
+      return 0;
+    }
+  }
+
+  return 1;
+}
+
+// Orders point indices by decreasing weight
+struct HeavierPoint
+{
+  const float* weights;
+  HeavierPoint(const float* weights_) : weights(weights_) {}
+  bool operator()(int a, int b) const { return weights[a] > weights[b]; }
+};
+
+// Segment image function
+static PyObject* segment(PyObject* self, PyObject* args, PyObject* kwargs)
 {
   PyObject* array = NULL;
-  PyObject* inputImage = NULL;
+  PyObject* outImage = NULL;
+  PyObject* outLabels = NULL;
+  PyArrayObject* inputImage = NULL;
   PyArrayObject* segmentedImage = NULL;
   PyArrayObject* labelImage = NULL;
+  PyArrayObject* regionModes = NULL;
+  PyArrayObject* regionPointCounts = NULL;
   int radiusS[1];
   double radiusR[1];
   unsigned int minDensity[1];
   unsigned int speedUp[1] = { HIGH_SPEEDUP };
+  int threads[1] = { 1 };
+  int returnRegions[1] = { 0 };
+  static char* kwlist[] = { (char*)"image", (char*)"spatial_radius", (char*)"range_radius", (char*)"min_density",
+                            (char*)"speedup_level", (char*)"threads", (char*)"out_image", (char*)"out_labels",
+                            (char*)"return_regions", NULL };
 
   msImageProcessor imageSegmenter;
   SpeedUpLevel speedUpLevel;    
-  int* tmpLabels = NULL;
-  float* tmpModes = NULL;
-  int* tmpModePointCounts = NULL;
   int nbRegions;
-  int dimensions[3];
+  npy_intp dimensions[3];
+  npy_intp regionDimensions[2];
   int nbDimensions;
   
-  if (!PyArg_ParseTuple(args, "OidI|I", &array, &radiusS, &radiusR, &minDensity, &speedUp))
+  if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OidI|IiOOi", kwlist, &array, &radiusS, &radiusR, &minDensity,
+                                   &speedUp, &threads, &outImage, &outLabels, &returnRegions))
     return NULL;
   
   if(radiusS[0] < 0)
@@ -75,28 +119,38 @@ static PyObject* segment(PyObject* self, PyObject* args)
     PyErr_SetString(PyExc_ValueError, "Speedup level must be 0 (no speedup), 1 (medium speedup), or 2 (high speedup)");
     return NULL;
   }
+
+  if(threads[0] < 1)
+  {
+    PyErr_SetString(PyExc_ValueError, "Number of threads must be greater or equal to one");
+    return NULL;
+  }
     
-  // Get ndarray object having 8 unsigned bits per element (uchar) and 
-  inputImage = PyArray_FROM_OTF(array, NPY_UBYTE, NPY_IN_ARRAY);
+  // Get ndarray object having 8 unsigned bits per element (uchar). Arrays, memmaps and other objects
+  // exposing uchar data through the buffer protocol or the array interface are used in place, whatever
+  // their strides, only other element types are converted into a new array.
+  inputImage = (PyArrayObject*) PyArray_FROM_OTF(array, NPY_UBYTE, NPY_ARRAY_ALIGNED);
   if(inputImage == NULL)
     return NULL;
     
-  // Check that the array is 2 dimentional (gray scale image) or 3 dimensional (RGB color image),
-  // and initialize segmenter
+  // Check that the array is 2 dimentional (gray scale image) or 3 dimensional (RGB color image, or RGBA
+  // image whose alpha channel is ignored), and initialize segmenter
   if(PyArray_NDIM(inputImage) == 2)
   {
     nbDimensions = 2;
     dimensions[0] = PyArray_DIM(inputImage, 0);
     dimensions[1] = PyArray_DIM(inputImage, 1);
-    imageSegmenter.DefineImage((unsigned char*)PyArray_DATA(inputImage), GRAYSCALE, dimensions[0], dimensions[1]);
+    imageSegmenter.DefineImage((unsigned char*)PyArray_DATA(inputImage), GRAYSCALE, dimensions[0], dimensions[1],
+                               PyArray_STRIDE(inputImage, 0), PyArray_STRIDE(inputImage, 1), 0);
   }
-  else if(PyArray_NDIM(inputImage) == 3)
+  else if(PyArray_NDIM(inputImage) == 3 && (PyArray_DIM(inputImage, 2) == 3 || PyArray_DIM(inputImage, 2) == 4))
   {
     nbDimensions = 3;
     dimensions[0] = PyArray_DIM(inputImage, 0);
     dimensions[1] = PyArray_DIM(inputImage, 1);      
     dimensions[2] = 3;
-    imageSegmenter.DefineImage((unsigned char*)PyArray_DATA(inputImage), COLOR, dimensions[0], dimensions[1]);
+    imageSegmenter.DefineImage((unsigned char*)PyArray_DATA(inputImage), COLOR, dimensions[0], dimensions[1],
+                               PyArray_STRIDE(inputImage, 0), PyArray_STRIDE(inputImage, 1), PyArray_STRIDE(inputImage, 2));
   }
   else
   {
@@ -105,17 +159,37 @@ static PyObject* segment(PyObject* self, PyObject* args)
     return NULL;
   }
     
-  // Create output images
-  segmentedImage = (PyArrayObject *) PyArray_FromDims(nbDimensions, dimensions, PyArray_UBYTE);
+  // Create output images, or use the ones given by the caller
+  if(outImage == NULL || outImage == Py_None)
+  {
+    segmentedImage = (PyArrayObject *) PyArray_SimpleNew(nbDimensions, dimensions, NPY_UBYTE);
+  }
+  else if(checkOutputArray(outImage, "out_image", NPY_UBYTE, nbDimensions, dimensions))
+  {
+    Py_INCREF(outImage);
+    segmentedImage = (PyArrayObject *) outImage;
+  }
   if(!segmentedImage)
   {
     Py_DECREF(inputImage);
     return NULL;  
   }
 
-  labelImage = (PyArrayObject *) PyArray_FromDims(2, dimensions, PyArray_INT);
+  if(outLabels == NULL || outLabels == Py_None)
+  {
+    labelImage = (PyArrayObject *) PyArray_SimpleNew(2, dimensions, NPY_INT);
+  }
+  else if(checkOutputArray(outLabels, "out_labels", NPY_INT, 2, dimensions))
+  {
+    Py_INCREF(outLabels);
+    labelImage = (PyArrayObject *) outLabels;
+  }
   if(!labelImage)
+  {
+    Py_DECREF(inputImage);
+    Py_DECREF(segmentedImage);
     return NULL;  
+  }
     
   // Set speedup level
   switch(speedUp[0])
@@ -132,26 +206,216 @@ static PyObject* segment(PyObject* self, PyObject* args)
     default:
       speedUpLevel = HIGH_SPEEDUP;
   }
-    
-  // Segment image and get segmented image
+
+  imageSegmenter.SetFilterThreads(threads[0]);
+
+  // The segmenter only works on its own buffers and on the arrays referenced above,
+  // so other Python threads can run while it does the heavy lifting
+  Py_BEGIN_ALLOW_THREADS
+
+  // Segment image and write the segmented image and the label image into the outputs
   imageSegmenter.Segment(radiusS[0], radiusR[0], minDensity[0], speedUpLevel);
   imageSegmenter.GetResults((unsigned char*)PyArray_DATA(segmentedImage));
-    
-  // Get labels images and number of regions
-  nbRegions = imageSegmenter.GetRegions( &tmpLabels, &tmpModes, &tmpModePointCounts);
-  memcpy((int*)PyArray_DATA(labelImage), tmpLabels, dimensions[0]*dimensions[1]*sizeof(int));
+  nbRegions = imageSegmenter.GetLabels((int*)PyArray_DATA(labelImage));
+
+  Py_END_ALLOW_THREADS
         
   // Cleanup
   Py_DECREF(inputImage);
-  delete [] tmpLabels;
-  delete [] tmpModes;
-  delete [] tmpModePointCounts;    
+
+  if(returnRegions[0])
+  {
+    // Get the color and the number of pixels of each region
+    regionDimensions[0] = nbRegions;
+    regionDimensions[1] = 3;
+    regionModes = (PyArrayObject *) PyArray_SimpleNew(nbDimensions - 1, regionDimensions, NPY_UBYTE);
+    regionPointCounts = (PyArrayObject *) PyArray_SimpleNew(1, regionDimensions, NPY_INT);
+    if(!regionModes || !regionPointCounts)
+    {
+      Py_XDECREF(regionModes);
+      Py_XDECREF(regionPointCounts);
+      Py_DECREF(segmentedImage);
+      Py_DECREF(labelImage);
+      return NULL;
+    }
+    imageSegmenter.GetRegionModes((unsigned char*)PyArray_DATA(regionModes), (int*)PyArray_DATA(regionPointCounts));
+
+    // Return a tuple with the segmented image, the label image, the number of regions,
+    // and the color and the point count of each region
+    return Py_BuildValue("(NNiNN)", PyArray_Return(segmentedImage), PyArray_Return(labelImage), nbRegions,
+                         regionModes, regionPointCounts);
+  }
     
   // Return a tuple with the segmented image, the label image, and the number of regions
   return Py_BuildValue("(NNi)", PyArray_Return(segmentedImage), PyArray_Return(labelImage), nbRegions) ;    
 }
 
 
+// Find the modes of a weighted point set, typically the occupied bins of a color histogram weighted by
+// their pixel counts, with the uniform kernel of the MeanShift class. The cost depends on the number of
+// points, not on the number of pixels they stand for.
+static PyObject* histogram_modes(PyObject* self, PyObject* args, PyObject* kwargs)
+{
+  PyObject* pointsArg = NULL;
+  PyObject* weightsArg = NULL;
+  PyArrayObject* points = NULL;
+  PyArrayObject* weights = NULL;
+  PyArrayObject* modes = NULL;
+  PyArrayObject* labels = NULL;
+  PyArrayObject* modeWeights = NULL;
+  double bandwidth[1];
+  static char* kwlist[] = { (char*)"points", (char*)"weights", (char*)"bandwidth", NULL };
+
+  MeanShift meanShift;
+  kernelType kernel[1] = { Uniform };
+  float h[1];
+  int P[1];
+  npy_intp dimensions[2];
+  int nbPoints, nbDimensions, nbModes = 0;
+  int* order = NULL;
+  double* modeBuffer = NULL;
+  double* modeSums = NULL;
+  int i, j, k, point;
+  int failed = 0;
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OOd", kwlist, &pointsArg, &weightsArg, &bandwidth))
+    return NULL;
+
+  if(bandwidth[0] <= 0.)
+  {
+    PyErr_SetString(PyExc_ValueError, "Bandwidth must be greater than zero");
+    return NULL;
+  }
+
+  points = (PyArrayObject*) PyArray_FROM_OTF(pointsArg, NPY_FLOAT, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_FORCECAST);
+  if(points == NULL)
+    return NULL;
+  weights = (PyArrayObject*) PyArray_FROM_OTF(weightsArg, NPY_FLOAT, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_FORCECAST);
+  if(weights == NULL)
+  {
+    Py_DECREF(points);
+    return NULL;
+  }
+
+  if(PyArray_NDIM(points) != 2 || PyArray_DIM(points, 1) < 1 || PyArray_NDIM(weights) != 1 ||
+     PyArray_DIM(weights, 0) != PyArray_DIM(points, 0))
+  {
+    Py_DECREF(points);
+    Py_DECREF(weights);
+    PyErr_SetString(PyExc_ValueError, "Points must be a 2 dimensional array (points, dimensions) and weights a 1 dimensional array (points,)");
+    return NULL;
+  }
+
+  nbPoints = (int) PyArray_DIM(points, 0);
+  nbDimensions = (int) PyArray_DIM(points, 1);
+
+  dimensions[0] = nbPoints;
+  labels = (PyArrayObject *) PyArray_SimpleNew(1, dimensions, NPY_INT);
+  order = new int [nbPoints];
+  modeBuffer = new double [(nbPoints + 1) * nbDimensions];
+  modeSums = new double [nbPoints];
+  if(!labels)
+  {
+    failed = 1;
+    goto cleanup;
+  }
+
+  Py_BEGIN_ALLOW_THREADS
+
+  if(nbPoints > 0)
+  {
+    const float* data = (const float*) PyArray_DATA(points);
+    const float* w = (const float*) PyArray_DATA(weights);
+    int* labelData = (int*) PyArray_DATA(labels);
+    double* mode = modeBuffer + nbPoints * nbDimensions;
+    double* yk = new double [nbDimensions];
+    double distance, diff;
+
+    // a single subspace of all the dimensions, so the kernel is a ball of radius bandwidth
+    h[0] = (float) bandwidth[0];
+    P[0] = nbDimensions;
+    meanShift.DefineKernel(kernel, h, P, 1);
+    meanShift.DefineInput((float*) data, nbPoints, nbDimensions);
+    meanShift.SetPointWeights((float*) w);
+
+    // the heaviest points are shifted first, so they make the modes other points merge into
+    for(i = 0; i < nbPoints; i++)
+      order[i] = i;
+    std::stable_sort(order, order + nbPoints, HeavierPoint(w));
+
+    for(i = 0; i < nbPoints && meanShift.ErrorStatus != EL_ERROR; i++)
+    {
+      point = order[i];
+      for(j = 0; j < nbDimensions; j++)
+        yk[j] = data[point * nbDimensions + j];
+      meanShift.FindMode(mode, yk);
+
+      // modes closer than half the bandwidth are the same mode
+      for(k = 0; k < nbModes; k++)
+      {
+        distance = 0;
+        for(j = 0; j < nbDimensions; j++)
+        {
+          diff = modeBuffer[k * nbDimensions + j] - mode[j];
+          distance += diff * diff;
+        }
+        if(distance < 0.25 * bandwidth[0] * bandwidth[0])
+          break;
+      }
+      if(k == nbModes)
+      {
+        for(j = 0; j < nbDimensions; j++)
+          modeBuffer[k * nbDimensions + j] = mode[j];
+        modeSums[k] = 0;
+        nbModes++;
+      }
+      modeSums[k] += w[point];
+      labelData[point] = k;
+    }
+
+    delete [] yk;
+  }
+
+  Py_END_ALLOW_THREADS
+
+  if(meanShift.ErrorStatus == EL_ERROR)
+  {
+    PyErr_SetString(PyExc_RuntimeError, meanShift.ErrorMessage);
+    failed = 1;
+    goto cleanup;
+  }
+
+  // Copy the modes and their weights into arrays of the number of modes found
+  dimensions[0] = nbModes;
+  dimensions[1] = nbDimensions;
+  modes = (PyArrayObject *) PyArray_SimpleNew(2, dimensions, NPY_DOUBLE);
+  modeWeights = (PyArrayObject *) PyArray_SimpleNew(1, dimensions, NPY_DOUBLE);
+  if(!modes || !modeWeights)
+  {
+    failed = 1;
+    goto cleanup;
+  }
+  std::memcpy(PyArray_DATA(modes), modeBuffer, nbModes * nbDimensions * sizeof(double));
+  std::memcpy(PyArray_DATA(modeWeights), modeSums, nbModes * sizeof(double));
+
+cleanup:
+  delete [] order;
+  delete [] modeBuffer;
+  delete [] modeSums;
+  Py_DECREF(points);
+  Py_DECREF(weights);
+  if(failed)
+  {
+    Py_XDECREF(labels);
+    Py_XDECREF(modes);
+    Py_XDECREF(modeWeights);
+    return NULL;
+  }
+
+  // Return a tuple with the modes, the mode of each point, and the weight of each mode
+  return Py_BuildValue("(NNN)", modes, labels, modeWeights);
+}
+
 // ***************************************************************************
 // Doc strings for Python module and functions
 // ***************************************************************************
@@ -184,24 +448,67 @@ static char pmsSegmentDoc[] = \
    Argument 3 -- The range radius of the search window (double)\n\
    Argument 4 -- The minimum point density of a region in the segmented image (integer)\n\
    Argument 5 -- The speed up level (integer, 0: NO; 1: MEDIUM; 2: HIGH)\n\
+   Argument 6 -- The number of threads used by the mean shift filter (integer, default 1).\n\
+                 The image is always filtered in a fixed number of horizontal bands,\n\
+                 which the threads take in turn, so the result does not depend on\n\
+                 the number of threads.\n\
+   Argument 7 -- Optional array receiving the segmented image (uint8, C-contiguous,\n\
+                 same shape as the image, but with 3 channels for RGBA images)\n\
+   Argument 8 -- Optional array receiving the label image (int32, C-contiguous,\n\
+                 same heigth and width as the image)\n\
+   Argument 9 -- Whether to also return the color and the point count of each region\n\
+                 (boolean, default False)\n\
    \n\
-   Return value: 3-tuple\n\
+   The image can be any object exposing 8 bits per element through the buffer\n\
+   protocol or the array interface; it is read in place whatever its strides.\n\
+   \n\
+   Return value: 3-tuple (5-tuple if return_regions is true)\n\
    Element 1 -- Image (Numpy array) where the color (or grayscale) of the\n\
                 regions is the mean value of the pixels belonging to a region.\n\
-   Element 2 -- Image (2-D Numpy array, 32 unsigned bits per element) where a\n\
+                This is out_image if it was given.\n\
+   Element 2 -- Image (2-D Numpy array, 32 bits signed integers) where a\n\
                 pixel value correspond to the region number the pixel belongs to.\n\
+                This is out_labels if it was given.\n\
    Element 3 -- The number of regions found by the mean shift algorithm.\n\
    \n\
+   If return_regions is true, the tuple has 2 more elements:\n\
+   Element 4 -- The color of each region as in the segmented image (Numpy array\n\
+                of uint8, of shape (regions, 3) or (regions,) for gray scale images)\n\
+   Element 5 -- The number of pixels of each region (1-D Numpy array of int32)\n\
+   \n\
    ";
 
 
+// Histogram modes function doc
+static char pmsHistogramModesDoc[] = \
+  "Find the modes of weighted points with the mean shift algorithm.\n\
+   \n\
+   The points are typically the occupied bins of a color histogram, weighted\n\
+   by their pixel counts. A point of weight w counts as w coincident points,\n\
+   so the cost depends on the number of points, not on their total weight.\n\
+   Points are shifted in order of decreasing weight, and modes closer than\n\
+   half the bandwidth to a mode found before are merged into it.\n\
+   \n\
+   Arguments:\n\
+   Argument 1 -- The points as a Numpy array of shape (points, dimensions), converted to float32\n\
+   Argument 2 -- The weight of each point as a Numpy array of shape (points,), converted to float32\n\
+   Argument 3 -- The radius of the uniform kernel (double)\n\
+   \n\
+   Return value: 3-tuple\n\
+   Element 1 -- The modes (2-D Numpy array of float64, of shape (modes, dimensions))\n\
+   Element 2 -- The mode of each point (1-D Numpy array of int32)\n\
+   Element 3 -- The total weight of the points of each mode (1-D Numpy array of float64)\n\
+   \n\
+   ";
+
 // ***************************************************************************
 // Declaration of Python module functions
 // ***************************************************************************
 
 // Module methods definition
 static PyMethodDef pmsMethods[] = {
-  {"segment", segment, METH_VARARGS, pmsSegmentDoc},
+  {"segment", (PyCFunction)segment, METH_VARARGS | METH_KEYWORDS, pmsSegmentDoc},
+  {"histogram_modes", (PyCFunction)histogram_modes, METH_VARARGS | METH_KEYWORDS, pmsHistogramModesDoc},
   {NULL, NULL}
 };
 
@@ -6,9 +6,22 @@ except ImportError:
     from ez_setup import use_setuptools
     use_setuptools()
     from setuptools import setup, Extension
+from setuptools.command.build_ext import build_ext
 
 from numpy import get_include as np_include
 
+
+class BuildExt(build_ext):
+    # the filter runs on std::thread workers, which gcc and clang need C++11 and pthreads for; MSVC has both
+    # by default and rejects the flags
+    def build_extensions(self):
+        if self.compiler.compiler_type != 'msvc':
+            for extension in self.extensions:
+                extension.extra_compile_args = ['-std=c++11', '-pthread'] + extension.extra_compile_args
+                extension.extra_link_args = ['-pthread'] + extension.extra_link_args
+        build_ext.build_extensions(self)
+
+
 if __name__ == '__main__':
     setup(
         name='colorfinder',
@@ -25,6 +38,7 @@ if __name__ == '__main__':
                                language='c++',
                                include_dirs=[np_include()]
         )],
+        cmdclass={'build_ext': BuildExt},
         package_data={
             'colorfinder': ['*.json'],
         },
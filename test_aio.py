@@ -0,0 +1,49 @@
+import os
+import sys
+import unittest
+
+from colorfinder import ColorFinder
+
+samples_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'samples')
+
+
+@unittest.skipIf(sys.version_info < (3, 7), 'colorfinder.aio requires Python 3.7')
+class FindAsyncTest(unittest.TestCase):
+    def setUp(self):
+        import asyncio
+
+        self.loop = asyncio.new_event_loop()
+        self.finder = ColorFinder(backend='histogram', max_concurrency=2)
+        self.images = [os.path.join(samples_path, name) for name in ('371', '373', '374')]
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_find_async(self):
+        with open(self.images[0], 'rb') as image_file:
+            data = image_file.read()
+        expected = self.finder.find(self.images[0])
+        self.assertEqual(self.loop.run_until_complete(self.finder.find_async(self.images[0])), expected)
+        self.assertEqual(self.loop.run_until_complete(self.finder.find_async(data)), expected)
+
+    def test_find_many_async(self):
+        results = self._collect(self.finder.find_many_async(self.images))
+        self.assertEqual([image for image, colors in results], self.images)
+        for image, colors in results:
+            self.assertEqual(colors, self.finder.find(image))
+
+        results = self._collect(self.finder.find_many_async(self.images, ordered=False))
+        self.assertEqual(sorted(image for image, colors in results), sorted(self.images))
+
+    def _collect(self, generator):
+        # without async for, so the file also parses on Python 2
+        results = []
+        while True:
+            try:
+                results.append(self.loop.run_until_complete(generator.__anext__()))
+            except StopAsyncIteration:
+                return results
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import warnings
+import unittest
+
+import numpy as np
+
+from colorfinder import ColorFinder, MAX_DIMENSION, tune_radius
+from colorfinder.backends import MeanShiftBackend, KMeansBackend, HistogramBackend
+from colorfinder.instrument import FindStats
+from testimages import block_image, gradient_image, QUADRANT_COLORS
+
+
+class ColorFinderBackendTest(unittest.TestCase):
+    def test_pyramid_of_backend_instance(self):
+        finder = ColorFinder(backend=MeanShiftBackend(pyramid_levels=2))
+        self.assertEqual(finder.pyramid_levels, 2)
+        self.assertEqual(finder.max_dimension, MAX_DIMENSION * 4)
+        self.assertEqual(ColorFinder(pyramid_levels=1).max_dimension, MAX_DIMENSION * 2)
+        self.assertEqual(ColorFinder(backend='histogram').max_dimension, 1200)
+
+    def test_spatial_radius_is_counted(self):
+        stats = FindStats()
+        ColorFinder().find_in_array(block_image(), stats=stats)
+        self.assertIn('spatial_radius', stats.counts)
+
+
+class BackendTest(unittest.TestCase):
+    def check_regions(self, backend, image):
+        """Check the (image, labels, n, modes, counts) of a backend against each other, returning modes and
+counts."""
+        heigth, width = image.shape[:2]
+        out_image = np.empty((heigth, width, 3), dtype=np.uint8)
+        out_labels = np.empty((heigth, width), dtype=np.intc)
+        segmented, labels, number_regions, modes, counts = backend.segment(image, tune_radius, out_image=out_image,
+                                                                           out_labels=out_labels)
+        self.assertEqual(segmented.shape, (heigth, width, 3))
+        self.assertEqual(labels.shape, (heigth, width))
+        self.assertEqual(modes.shape, (number_regions, 3))
+        self.assertEqual(modes.dtype, np.uint8)
+        self.assertEqual(counts.shape, (number_regions,))
+        self.assertEqual(counts.sum(), heigth * width)
+        np.testing.assert_array_equal(np.bincount(labels.ravel(), minlength=number_regions), counts)
+        np.testing.assert_array_equal(segmented, modes[labels])
+        # results are written into the given arrays
+        np.testing.assert_array_equal(out_labels, labels)
+        np.testing.assert_array_equal(out_image, segmented)
+        return modes, counts
+
+    def check_blocks(self, modes, counts):
+        """Each block of block_image is mostly covered by a mode close to its color."""
+        for color in [color for row in QUADRANT_COLORS for color in row]:
+            close = np.abs(modes.astype(int) - color).max(axis=1) <= 12
+            self.assertGreaterEqual(counts[close].sum(), 0.9 * counts.sum() / 4, color)
+
+    def test_meanshift(self):
+        self.check_blocks(*self.check_regions(MeanShiftBackend(), block_image()))
+
+    def test_pyramid(self):
+        image = block_image(360, 480)
+        self.check_blocks(*self.check_regions(MeanShiftBackend(pyramid_levels=1), image))
+
+    def test_pyramid_speedup(self):
+        import _pymeanshift
+        from colorfinder.pyramid import build_pyramid
+
+        # gradients, which the speedup of the filter changes the modes of
+        image = gradient_image(360, 480)
+        coarse = build_pyramid(image, 1)[-1]
+        for speedup in (_pymeanshift.SPEEDUP_NO, _pymeanshift.SPEEDUP_HIGH):
+            backend = MeanShiftBackend(speedup=speedup, pyramid_levels=1)
+            _, _, number_regions, modes, _ = backend.segment(image, tune_radius)
+            expected = _pymeanshift.segment(coarse, tune_radius(coarse.shape[1], coarse.shape[0]),
+                                            backend.range_radius, backend.min_density, speedup, return_regions=True)
+            self.assertEqual(number_regions, expected[2])
+            np.testing.assert_array_equal(modes, expected[3])
+
+    def test_kmeans(self):
+        backend = KMeansBackend(clusters=4)
+        modes, counts = self.check_regions(backend, block_image())
+        self.check_blocks(modes, counts)
+        # deterministic
+        again = self.check_regions(backend, block_image())
+        np.testing.assert_array_equal(again[0], modes)
+        np.testing.assert_array_equal(again[1], counts)
+
+    def test_kmeans_more_clusters_than_colors(self):
+        image = np.zeros((20, 30, 3), dtype=np.uint8)
+        image[:, 15:] = 255
+        with warnings.catch_warnings():
+            # scipy warns about the clusters left empty
+            warnings.simplefilter('ignore')
+            modes, counts = self.check_regions(KMeansBackend(clusters=8), image)
+        self.assertEqual(sorted(counts.tolist()), [300, 300])
+
+    def test_histogram(self):
+        self.check_blocks(*self.check_regions(HistogramBackend(), block_image()))
+
+    def test_histogram_single_color(self):
+        image = np.empty((10, 10, 3), dtype=np.uint8)
+        image[...] = (10, 200, 90)
+        modes, counts = self.check_regions(HistogramBackend(), image)
+        self.assertEqual(counts.tolist(), [100])
+        self.assertLessEqual(np.abs(modes[0].astype(int) - (10, 200, 90)).max(), 2)
+
+
+class HistogramModesTest(unittest.TestCase):
+    def test_weights(self):
+        import _pymeanshift
+
+        # two clusters of points; the heavy point pulls the mode of the first cluster towards it
+        points = np.array([[0, 0], [2, 0], [0, 2], [50, 50], [52, 50]], dtype=np.float32)
+        weights = np.array([100, 1, 1, 3, 3], dtype=np.float32)
+        modes, labels, mode_weights = _pymeanshift.histogram_modes(points, weights, 5.0)
+        self.assertEqual(len(modes), 2)
+        self.assertEqual(labels.tolist(), [0, 0, 0, 1, 1])
+        self.assertEqual(mode_weights.tolist(), [102, 6])
+        self.assertLess(np.abs(modes[0]).max(), 0.1)
+        self.assertTrue(np.allclose(modes[1], (51, 50)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+from colorfinder.benchmark import color_agreement, compare, BENCHMARK_VERSION
+
+
+def result(**counts):
+    return dict((label, {'count': count, 'rgb': [0, 0, 0], 'lab': [0.0, 0.0, 0.0]})
+                for label, count in counts.items())
+
+
+class ColorAgreementTest(unittest.TestCase):
+    def test_known_score(self):
+        # shares 0.6/0.4 against 0.3/0.3/0.4: 0.3 of A1 and 0.3 of B2 in common
+        self.assertAlmostEqual(color_agreement(result(A1=60, B2=40), result(A1=30, B2=30, C3=40)), 0.6)
+        self.assertAlmostEqual(color_agreement(result(A1=30, B2=30, C3=40), result(A1=60, B2=40)), 0.6)
+
+    def test_bounds(self):
+        self.assertAlmostEqual(color_agreement(result(A1=5, B2=15), result(A1=10, B2=30)), 1.0)
+        self.assertEqual(color_agreement(result(A1=5), result(B2=5)), 0)
+        self.assertEqual(color_agreement({}, result(A1=5)), 0)
+
+
+class CompareTest(unittest.TestCase):
+    def document(self, **times):
+        return {'version': BENCHMARK_VERSION, 'results': {'371': times}}
+
+    def test_regressions(self):
+        baseline = self.document(decode=0.010, segment=1.0, match=0.001)
+        results = self.document(decode=0.020, segment=1.2, match=0.0019, convert=5.0)
+        # segment is within the threshold, match within min_delta, convert has no baseline
+        self.assertEqual(compare(results, baseline), [('371', 'decode', 0.010, 0.020)])
+        self.assertEqual(compare(results, baseline, threshold=0.1),
+                         [('371', 'decode', 0.010, 0.020), ('371', 'segment', 1.0, 1.2)])
+
+    def test_other_version(self):
+        baseline = dict(self.document(decode=0.01), version=BENCHMARK_VERSION + 1)
+        self.assertRaises(ValueError, compare, self.document(decode=0.01), baseline)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from colorfinder import ColorFinder, ResultCache, cache_key
+from colorfinder.backends import HistogramBackend
+
+samples_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'samples')
+
+COLORS = {'A1': {'count': 10, 'rgb': [1, 2, 3], 'lab': [0.5, 0.1, 0.2]}}
+
+
+class ResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = ResultCache(max_entries=2)
+        cache.put('a', {'a': 1})
+        cache.put('b', {'b': 1})
+        self.assertEqual(cache.get('a'), {'a': 1})
+        cache.put('c', {'c': 1})
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), {'a': 1})
+        self.assertEqual(cache.get('c'), {'c': 1})
+        self.assertEqual(cache.stats(), {'hits': 3, 'memory_hits': 3, 'disk_hits': 0, 'misses': 1, 'entries': 2})
+
+    def test_disk_hit_after_eviction(self):
+        cache = ResultCache(max_entries=1, directory=self.tmp_dir)
+        cache.put('a' * 40, COLORS)
+        cache.put('b' * 40, {})
+        self.assertEqual(cache.get('a' * 40), COLORS)
+        self.assertEqual((cache.memory_hits, cache.disk_hits), (0, 1))
+        # read back into memory
+        self.assertEqual(cache.get('a' * 40), COLORS)
+        self.assertEqual((cache.memory_hits, cache.disk_hits), (1, 1))
+
+    def test_shared_between_instances(self):
+        ResultCache(directory=self.tmp_dir).put('a' * 40, COLORS)
+        cache = ResultCache(directory=self.tmp_dir)
+        self.assertEqual(cache.get('a' * 40), COLORS)
+        self.assertEqual(cache.disk_hits, 1)
+        self.assertIsNone(ResultCache().get('a' * 40))
+
+    def test_get_returns_copies(self):
+        cache = ResultCache()
+        cache.put('a', COLORS)
+        cache.get('a')['A1']['count'] = 0
+        self.assertEqual(cache.get('a'), COLORS)
+
+
+class FindCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.image = os.path.join(samples_path, '371')
+        self.cache = ResultCache()
+
+    def test_shared_between_finders(self):
+        colors = ColorFinder(backend='histogram', cache=self.cache).find(self.image)
+        self.assertEqual(ColorFinder(backend='histogram', cache=self.cache).find(self.image), colors)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_key_changes_with_backend_params(self):
+        ColorFinder(backend=HistogramBackend(range_radius=6), cache=self.cache).find(self.image)
+        ColorFinder(backend=HistogramBackend(range_radius=8), cache=self.cache).find(self.image)
+        ColorFinder(backend=HistogramBackend(bin_size=4), cache=self.cache).find(self.image)
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 3))
+        ColorFinder(backend=HistogramBackend(range_radius=8), cache=self.cache).find(self.image)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_key_changes_with_color_space(self):
+        finder = ColorFinder(backend='histogram', cache=self.cache)
+        finder.find(self.image)
+        finder.find(self.image, color_space='Adobe')
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+
+    def test_cache_key(self):
+        params = {'backend': {'backend': 'meanshift', 'range_radius': 4.5}}
+        self.assertEqual(cache_key(b'image', params), cache_key(b'image', dict(params)))
+        self.assertNotEqual(cache_key(b'image', params), cache_key(b'other image', params))
+        self.assertNotEqual(cache_key(b'image', params),
+                            cache_key(b'image', {'backend': {'backend': 'meanshift', 'range_radius': 6}}))
+
+
+if __name__ == '__main__':
+    unittest.main()
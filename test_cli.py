@@ -0,0 +1,69 @@
+import os
+import csv
+import json
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from colorfinder.__main__ import main, run
+
+
+class ImageTestCase(unittest.TestCase):
+    """A single-color image in a temporary directory."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.image_path = os.path.join(self.tmp_dir, 'red.png')
+        Image.fromarray(np.full((40, 40, 3), (200, 30, 30), dtype=np.uint8)).save(self.image_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+
+class RunTest(ImageTestCase):
+    def test_finds_colors(self):
+        results = list(run([self.image_path], 'colorchecker_sg', workers=1))
+        self.assertEqual(len(results), 1)
+        path, colors, error = results[0]
+        self.assertIsNone(error)
+        self.assertEqual(len(colors), 1)
+
+    def test_input_error_is_raised(self):
+        def paths():
+            yield self.image_path
+            raise IOError('cannot read the list of inputs')
+
+        with self.assertRaises(IOError):
+            list(run(paths(), 'colorchecker_sg', workers=1))
+
+
+class MainTest(ImageTestCase):
+    def setUp(self):
+        super(MainTest, self).setUp()
+        self.output_path = os.path.join(self.tmp_dir, 'colors.out')
+
+    def test_jsonl_output(self):
+        self.assertEqual(main(['--workers', '1', '-o', self.output_path, self.image_path]), 0)
+        with open(self.output_path) as output:
+            lines = output.read().splitlines()
+        self.assertEqual(len(lines), 1)
+        result = json.loads(lines[0])
+        self.assertEqual(result['image'], self.image_path)
+        self.assertEqual(len(result['colors']), 1)
+
+    def test_csv_output(self):
+        self.assertEqual(main(['--workers', '1', '--format', 'csv', '-o', self.output_path, self.image_path]), 0)
+        with open(self.output_path, 'rb') as output:
+            data = output.read()
+        self.assertNotIn(b'\r\r\n', data)
+        rows = list(csv.reader(data.decode('utf-8').splitlines()))
+        self.assertEqual(rows[0][:3], ['image', 'label', 'count'])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][0], self.image_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+from __future__ import division
+import unittest
+
+import numpy as np
+
+from colorfinder import conversion
+
+
+# the scalar conversions the array functions replaced, one color at a time in plain Python
+
+def _decode(c):
+    return ((c + 0.055) / 1.055) ** 2.4 if c > 0.04045 else c / 12.92
+
+
+def _encode(c):
+    return 1.055 * (c ** (1 / 2.4)) - 0.055 if c > 0.0031308 else c * 12.92
+
+
+def _f(t):
+    return t ** (1 / 3) if t > 0.008856 else (7.787 * t) + (16 / 116)
+
+
+def _f_inverse(t):
+    return t ** 3 if t ** 3 > 0.008856 else (t - 16 / 116) / 7.787
+
+
+def reference_rgb_to_xyz(rgb):
+    r, g, b = [_decode(c / 255) * 100 for c in rgb]
+    return [r * 0.4124 + g * 0.3576 + b * 0.1805,
+            r * 0.2126 + g * 0.7152 + b * 0.0722,
+            r * 0.0193 + g * 0.1192 + b * 0.9505]
+
+
+def reference_xyz_to_lab(xyz):
+    x, y, z = _f(xyz[0] / 95.047), _f(xyz[1] / 100.000), _f(xyz[2] / 108.883)
+    return [(116 * y) - 16, 500 * (x - y), 200 * (y - z)]
+
+
+def reference_lab_to_xyz(lab):
+    y = (lab[0] + 16) / 116
+    x = lab[1] / 500 + y
+    z = y - lab[2] / 200
+    return [95.047 * _f_inverse(x), 100.000 * _f_inverse(y), 108.883 * _f_inverse(z)]
+
+
+def reference_xyz_to_rgb(xyz):
+    x, y, z = xyz[0] / 100, xyz[1] / 100, xyz[2] / 100
+    linear = [x * 3.2406 + y * -1.5372 + z * -0.4986,
+              x * -0.9689 + y * 1.8758 + z * 0.0415,
+              x * 0.0557 + y * -0.2040 + z * 1.0570]
+    return [_encode(c) * 255 for c in linear]
+
+
+def random_rgb(count=2000):
+    rgb = np.random.RandomState(0).randint(0, 256, (count, 3))
+    # the ends of the range and the neighbourhood of the linear segment of the transfer curve
+    rgb[:4] = [(0, 0, 0), (255, 255, 255), (10, 11, 12), (255, 0, 128)]
+    return rgb
+
+
+class ArrayConversionTest(unittest.TestCase):
+    def check_reference(self, function, reference, colors):
+        expected = np.array([reference(color) for color in colors.tolist()])
+        np.testing.assert_allclose(function(colors), expected, rtol=1e-9, atol=1e-9)
+
+    def test_agrees_with_scalar_conversions(self):
+        rgb = random_rgb()
+        xyz = np.array([reference_rgb_to_xyz(color) for color in rgb.tolist()])
+        lab = np.array([reference_xyz_to_lab(color) for color in xyz.tolist()])
+        self.check_reference(conversion.rgb_to_xyz_array, reference_rgb_to_xyz, rgb)
+        self.check_reference(conversion.xyz_to_lab_array, reference_xyz_to_lab, xyz)
+        self.check_reference(conversion.lab_to_xyz_array, reference_lab_to_xyz, lab)
+        self.check_reference(conversion.xyz_to_rgb_array, reference_xyz_to_rgb, xyz)
+        for color in rgb[:20].tolist():
+            np.testing.assert_allclose(conversion.rgb_to_lab(color),
+                                       reference_xyz_to_lab(reference_rgb_to_xyz(color)), atol=1e-9)
+
+    def test_round_trip(self):
+        rgb = random_rgb()
+        np.testing.assert_allclose(conversion.lab_to_rgb_array(conversion.rgb_to_lab_array(rgb)), rgb, atol=0.1)
+
+    def test_image_shape(self):
+        image = random_rgb(12 * 10).reshape(12, 10, 3).astype(np.uint8)
+        lab = conversion.rgb_to_lab_array(image)
+        self.assertEqual(lab.shape, (12, 10, 3))
+        np.testing.assert_allclose(lab.reshape(-1, 3), conversion.rgb_to_lab_array(image.reshape(-1, 3)))
+
+    def test_out(self):
+        rgb = random_rgb()
+        expected = conversion.rgb_to_lab_array(rgb)
+        out = np.empty(rgb.shape)
+        self.assertIs(conversion.rgb_to_lab_array(rgb, out=out), out)
+        np.testing.assert_array_equal(out, expected)
+
+        # in place
+        values = rgb.astype(float)
+        self.assertIs(conversion.rgb_to_lab_array(values, out=values), values)
+        np.testing.assert_array_equal(values, expected)
+        self.assertIs(conversion.lab_to_rgb_array(values, out=values), values)
+        np.testing.assert_allclose(values, rgb, atol=0.1)
+
+        # out decides the dtype
+        out = np.empty(rgb.shape, dtype=np.float32)
+        self.assertIs(conversion.rgb_to_lab_array(rgb, out=out), out)
+        np.testing.assert_allclose(out, expected, atol=1e-3)
+
+    def test_out_needs_shape_and_dtype(self):
+        rgb = random_rgb()
+        self.assertRaises(ValueError, conversion.rgb_to_lab_array, rgb, out=np.empty((len(rgb) - 1, 3)))
+        self.assertRaises(ValueError, conversion.rgb_to_lab_array, rgb, out=np.empty(rgb.shape, dtype=np.float32),
+                          dtype=np.float64)
+        self.assertRaises(ValueError, conversion.rgb_to_lab_array, rgb, dtype=np.int32)
+        self.assertRaises(ValueError, conversion.rgb_to_lab_array, rgb[:, :2])
+
+    def test_float32(self):
+        rgb = random_rgb()
+        expected = conversion.rgb_to_lab_array(rgb)
+        for lab in (conversion.rgb_to_lab_array(rgb.astype(np.float32)),
+                    conversion.rgb_to_lab_array(rgb, dtype='float32')):
+            self.assertEqual(lab.dtype, np.float32)
+            np.testing.assert_allclose(lab, expected, atol=1e-3)
+        rgb32 = conversion.lab_to_rgb_array(expected.astype(np.float32))
+        self.assertEqual(rgb32.dtype, np.float32)
+        np.testing.assert_allclose(rgb32, rgb, atol=0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
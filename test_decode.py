@@ -0,0 +1,88 @@
+import io
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from colorfinder import decode_image, EXIF_ORIENTATION
+
+# colors of the quadrants of the test image, far enough apart to survive JPEG compression
+QUADRANTS = np.array([[(220, 30, 30), (30, 200, 40)],
+                      [(40, 50, 210), (240, 240, 240)]], dtype=np.uint8)
+
+# the upright image of a stored image by EXIF orientation
+UPRIGHT = {
+    1: lambda ar: ar,
+    2: lambda ar: ar[:, ::-1],
+    3: lambda ar: ar[::-1, ::-1],
+    4: lambda ar: ar[::-1],
+    5: lambda ar: ar.transpose(1, 0, 2),
+    6: lambda ar: np.rot90(ar, -1),
+    7: lambda ar: ar[::-1, ::-1].transpose(1, 0, 2),
+    8: lambda ar: np.rot90(ar),
+}
+
+
+def quadrant_image(heigth=32, width=64):
+    """An image of four flat quadrants, wider than high so that rotations change its shape."""
+    return QUADRANTS.repeat(heigth // 2, axis=0).repeat(width // 2, axis=1)
+
+
+def encode(ar, format='PNG', mode=None, orientation=None):
+    im = Image.fromarray(ar)
+    if mode is not None:
+        im = im.convert(mode)
+    params = {}
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = orientation
+        params['exif'] = exif.tobytes()
+    data = io.BytesIO()
+    im.save(data, format, **params)
+    data.seek(0)
+    return data
+
+
+def quadrant_colors(ar):
+    """The colors at the centres of the quadrants of an image."""
+    heigth, width = ar.shape[:2]
+    return np.array([[ar[y, x] for x in (width // 4, width * 3 // 4)] for y in (heigth // 4, heigth * 3 // 4)])
+
+
+class DecodeImageTest(unittest.TestCase):
+    def assertColorsClose(self, colors, expected, tolerance=8):
+        self.assertLessEqual(np.abs(colors.astype(int) - expected.astype(int)).max(), tolerance)
+
+    def test_exif_orientations(self):
+        stored = quadrant_image()
+        for orientation, upright in sorted(UPRIGHT.items()):
+            expected = upright(stored)
+            im = decode_image(encode(stored, 'JPEG', orientation=orientation), None, exif_orientation=True)
+            ar = np.asarray(im)
+            self.assertEqual(ar.shape, expected.shape, 'orientation %d' % orientation)
+            self.assertColorsClose(quadrant_colors(ar), quadrant_colors(expected))
+
+    def test_orientation_ignored_by_default(self):
+        stored = quadrant_image()
+        ar = np.asarray(decode_image(encode(stored, 'JPEG', orientation=6), None))
+        self.assertEqual(ar.shape, stored.shape)
+        self.assertColorsClose(quadrant_colors(ar), QUADRANTS)
+
+    def test_modes(self):
+        stored = quadrant_image()
+        for mode in ('L', 'P', 'RGBA'):
+            expected = np.asarray(Image.fromarray(stored).convert(mode).convert('RGB'))
+            im = decode_image(encode(stored, mode=mode), None)
+            self.assertEqual(im.mode, 'RGB', mode)
+            np.testing.assert_array_equal(np.asarray(im), expected)
+
+    def test_downsized(self):
+        stored = quadrant_image(200, 400)
+        for data in (encode(stored), encode(stored, 'JPEG')):
+            ar = np.asarray(decode_image(data, 50))
+            self.assertEqual(ar.shape, (25, 50, 3))
+            self.assertColorsClose(quadrant_colors(ar), QUADRANTS)
+
+
+if __name__ == '__main__':
+    unittest.main()
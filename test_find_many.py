@@ -0,0 +1,45 @@
+import os
+import threading
+import unittest
+
+import numpy as np
+
+from colorfinder import ColorFinder
+
+samples_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'samples')
+
+
+class FindManyTest(unittest.TestCase):
+    def setUp(self):
+        self.finder = ColorFinder()
+        self.images = [os.path.join(samples_path, name) for name in ('371', '373', '511')]
+
+    def test_same_as_find(self):
+        expected = dict((image, self.finder.find(image)) for image in self.images)
+
+        results = list(self.finder.find_many(self.images, max_workers=3))
+        self.assertEqual([image for image, colors in results], self.images)
+        for image, colors in results:
+            self.assertEqual(colors, expected[image])
+
+        results = list(self.finder.find_many(self.images, max_workers=3, ordered=False))
+        self.assertEqual(sorted(image for image, colors in results), sorted(self.images))
+        for image, colors in results:
+            self.assertEqual(colors, expected[image])
+
+    def test_segmentation_releases_gil(self):
+        import _pymeanshift
+
+        image = np.random.RandomState(0).randint(0, 256, (400, 400, 3)).astype(np.uint8)
+        thread = threading.Thread(target=_pymeanshift.segment, args=(image, 6, 4.5, 50, _pymeanshift.SPEEDUP_HIGH))
+        thread.start()
+        # without the GIL released, this thread would not run until the segmentation is done
+        ticks = 0
+        while thread.is_alive():
+            ticks += 1
+        thread.join()
+        self.assertGreater(ticks, 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
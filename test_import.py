@@ -0,0 +1,21 @@
+import sys
+import unittest
+
+from colorfinder.benchmark import import_time, IMPORT_BUDGET, LAZY_MODULES
+
+
+class ImportTest(unittest.TestCase):
+    def test_import_budget(self):
+        # python -X importtime on Python 3.7+, the run time of a fresh interpreter otherwise
+        seconds, loaded = import_time(repeat=3)
+        self.assertEqual(loaded, [], 'import colorfinder loaded %s, of %s' % (', '.join(loaded), LAZY_MODULES))
+        self.assertLess(seconds, IMPORT_BUDGET, 'import colorfinder took %.3fs' % seconds)
+
+    @unittest.skipIf(sys.version_info < (3, 7), 'python -X importtime requires Python 3.7')
+    def test_importtime_is_used(self):
+        seconds, loaded = import_time(repeat=1, module='colorfinder.palette')
+        self.assertGreater(seconds, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
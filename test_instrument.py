@@ -0,0 +1,49 @@
+import sys
+import json
+import subprocess
+import unittest
+
+from colorfinder.instrument import _peak_memory
+
+ALLOCATION = 64 * 1024 * 1024
+
+# the peak memory of a process only grows past its earlier peaks, so the stages are measured in a fresh
+# interpreter, whose peak is its current use
+MEASURE = '''
+import json
+import numpy as np
+from colorfinder.instrument import FindStats
+stats = FindStats()
+with stats.stage('decode'):
+    big = np.ones(%d, dtype=np.uint8)
+del big
+with stats.stage('segment'):
+    small = np.ones(1024, dtype=np.uint8)
+del small
+print(json.dumps(dict((name, stage.as_dict()) for name, stage in stats.stages.items())))
+''' % ALLOCATION
+# on Linux, a child process starts with the peak memory of its parent, so the interpreter measuring the stages is
+# started by a small one rather than by the test process
+LAUNCH = '''
+import sys
+import subprocess
+sys.stdout.write(subprocess.check_output([sys.executable, '-c', sys.argv[1]]).decode('ascii'))
+'''
+
+
+class FindStatsTest(unittest.TestCase):
+    def test_peak_memory_delta(self):
+        if _peak_memory() is None:
+            self.skipTest('peak memory is not measured on this platform')
+        stages = json.loads(subprocess.check_output([sys.executable, '-c', LAUNCH, MEASURE]).decode('ascii'))
+        decode, segment = stages['decode'], stages['segment']
+        # less the few megabytes by which the start-up peak of the interpreter exceeds its use
+        self.assertGreaterEqual(decode['peak_memory_delta'], ALLOCATION * 0.9)
+        self.assertLess(decode['peak_memory_delta'], ALLOCATION * 1.5)
+        # the earlier peak is not charged to the later stage
+        self.assertLess(segment['peak_memory_delta'], 1024 * 1024)
+        self.assertGreaterEqual(segment['process_peak_memory'], decode['process_peak_memory'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+import numpy as np
+
+from colorfinder.lut import build_lut
+from colorfinder.palette import get_palette
+from colorfinder.distance import deltaE_ciede2000
+from colorfinder.conversion import rgb_to_lab_array
+
+
+def near_grey_palette(size=60):
+    """Colors of evenly spaced lightness and random hues close to the grey axis, whose opposite hues make
+CIEDE2000 jump for saturated colors."""
+    rs = np.random.RandomState(0)
+    return np.column_stack([np.linspace(5, 95, size), rs.normal(0, 3, size), rs.normal(0, 3, size)])
+
+
+class QuantizedLUTTest(unittest.TestCase):
+    def check_brute_force(self, palette_lab, queries=300000):
+        table = build_lut(palette_lab, step=4)
+
+        rgb = np.random.RandomState(1).randint(0, 256, (queries, 3))
+        lab = rgb_to_lab_array(rgb)
+        entries = table[rgb[:, 0], rgb[:, 1], rgb[:, 2]]
+        for start in range(0, queries, 4096):
+            dists = deltaE_ciede2000(lab[start:start + 4096, np.newaxis, :], palette_lab[np.newaxis, :, :])
+            np.testing.assert_array_equal(entries['index'][start:start + 4096], dists.argmin(axis=1))
+            np.testing.assert_allclose(entries['dist'][start:start + 4096], dists.min(axis=1), atol=1e-4)
+
+    def test_colorchecker(self):
+        self.check_brute_force(get_palette('colorchecker').lab)
+
+    def test_near_grey(self):
+        self.check_brute_force(near_grey_palette())
+
+
+class DistanceBoundTest(unittest.TestCase):
+    def test_bounds(self):
+        rs = np.random.RandomState(0)
+        lab1 = rs.uniform((0, -100, -100), (100, 100, 100), (10000, 3))
+        lab2 = rs.uniform((0, -100, -100), (100, 100, 100), (10000, 3))
+        dists = deltaE_ciede2000(lab1, lab2)
+        self.assertTrue((deltaE_ciede2000(lab1, lab2, bound='lower') <= dists + 1e-9).all())
+        self.assertTrue((deltaE_ciede2000(lab1, lab2, bound='upper') >= dists - 1e-9).all())
+
+    def test_continuous_across_opposite_hues(self):
+        grey = np.array([[40, -2.5, 0.2]])
+        hues = np.linspace(0, 2 * np.pi, 100001)
+        saturated = np.column_stack([np.full_like(hues, 50), 60 * np.cos(hues), 60 * np.sin(hues)])
+        self.assertGreater(np.abs(np.diff(deltaE_ciede2000(saturated, grey))).max(), 5)
+        for bound in ('lower', 'upper'):
+            self.assertLess(np.abs(np.diff(deltaE_ciede2000(saturated, grey, bound=bound))).max(), 0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from colorfinder import ColorFinder, Palette, get_palette
+
+COLORS = [{'label': u'grey', 'lab': [50.0, 0.0, 0.0], 'name': u'Neutral 5', 'cmyk': [0, 0, 0, 50]},
+          {'label': u'red', 'lab': [45.0, 60.0, 40.0]}]
+
+
+class PaletteTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_labels_are_unicode(self):
+        palette = Palette([[50, 0, 0], [60, 10, 10]], ['grey', b'red'.decode('ascii')])
+        self.assertEqual(palette.labels.dtype.kind, 'U')
+        self.assertEqual(palette[1]['label'], u'red')
+
+    def test_save_and_load(self):
+        palette = get_palette('colorchecker')
+        path = os.path.join(self.tmp_dir, 'colorchecker.npz')
+        palette.save(path)
+        for mmap in (True, False):
+            loaded = Palette.load(path, mmap=mmap)
+            self.assertEqual(loaded.digest, palette.digest)
+            np.testing.assert_array_equal(loaded.lab, palette.lab)
+            self.assertEqual(loaded.to_colors(), palette.to_colors())
+
+    def test_other_keys_are_kept(self):
+        palette = Palette.from_colors(COLORS)
+        self.assertEqual(palette.to_colors(), COLORS)
+        self.assertEqual(list(palette), COLORS)
+        path = os.path.join(self.tmp_dir, 'palette.npz')
+        palette.save(path)
+        for mmap in (True, False):
+            self.assertEqual(Palette.load(path, mmap=mmap).to_colors(), COLORS)
+
+    def test_closest_color_gives_palette_dicts(self):
+        finder = ColorFinder(COLORS)
+        color, distance = finder.closest_color([50, 1, 0], 'lab')
+        self.assertEqual(color, COLORS[0])
+        self.assertEqual(len(finder.palette), 2)
+        self.assertEqual(finder.palette[-1], COLORS[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
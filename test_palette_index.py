@@ -0,0 +1,45 @@
+import unittest
+
+import numpy as np
+
+from colorfinder import ColorFinder, Palette
+from colorfinder.palette_index import PaletteIndex
+from colorfinder.distance import deltaE_ciede2000
+from colorfinder.conversion import rgb_to_lab_array
+
+
+class PaletteIndexTest(unittest.TestCase):
+    def setUp(self):
+        rs = np.random.RandomState(0)
+        self.palette_lab = rgb_to_lab_array(rs.randint(0, 256, (2000, 3)))
+        self.queries = rgb_to_lab_array(rs.randint(0, 256, (20000, 3)))
+
+    def brute_force(self, queries):
+        indices = np.empty(len(queries), dtype=np.intp)
+        distances = np.empty(len(queries))
+        for start in range(0, len(queries), 1000):
+            dists = deltaE_ciede2000(queries[start:start + 1000, np.newaxis, :], self.palette_lab[np.newaxis, :, :])
+            indices[start:start + 1000] = dists.argmin(axis=1)
+            distances[start:start + 1000] = dists.min(axis=1)
+        return indices, distances
+
+    def test_match_is_exact(self):
+        indices, distances = PaletteIndex(self.palette_lab).match(self.queries)
+        expected_indices, expected_distances = self.brute_force(self.queries)
+        np.testing.assert_array_equal(indices, expected_indices)
+        np.testing.assert_allclose(distances, expected_distances)
+
+    def test_palette_colors_match_themselves(self):
+        indices, distances = PaletteIndex(self.palette_lab, candidates=1).match(self.palette_lab[:500])
+        np.testing.assert_array_equal(indices, np.arange(500))
+        np.testing.assert_allclose(distances, 0, atol=1e-9)
+
+    def test_closest_colors_uses_index(self):
+        finder = ColorFinder(Palette(self.palette_lab, ['c%d' % i for i in range(len(self.palette_lab))]))
+        self.assertIsNotNone(finder.palette_index)
+        labels, indices, distances = finder.closest_colors(self.queries[:2000], 'lab')
+        np.testing.assert_array_equal(indices, self.brute_force(self.queries[:2000])[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
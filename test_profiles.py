@@ -0,0 +1,50 @@
+import unittest
+
+import numpy as np
+
+from colorfinder.conversion import RGB_TO_XYZ, linear_to_srgb
+from colorfinder.profiles import get_color_space, srgb_transform
+
+
+def reference_transform(color_space, rgb):
+    """Convert 8-bit RGB to 8-bit sRGB in float64 throughout, without tables."""
+    space = get_color_space(color_space)
+    linear = np.asarray(space.to_linear(rgb / 255), dtype=float)
+    linear = np.dot(linear, np.dot(np.linalg.inv(RGB_TO_XYZ), space.to_xyz).T)
+    return np.round(linear_to_srgb(np.clip(linear, 0, 1)) * 255)
+
+
+def sample_colors(count=200000):
+    rgb = np.random.RandomState(0).randint(0, 256, (count, 3)).astype(np.uint8)
+    # the corners of the RGB cube, the greys and the dark levels of the linear segments of the curves
+    corners = np.array([[r, g, b] for r in (0, 255) for g in (0, 255) for b in (0, 255)])
+    levels = np.arange(256)[:, np.newaxis].repeat(3, axis=1)
+    return np.concatenate([corners, levels, rgb]).astype(np.uint8)
+
+
+class SRGBTransformTest(unittest.TestCase):
+    def test_within_one_level_of_float_reference(self):
+        rgb = sample_colors()
+        for name in ('Adobe', 'DisplayP3', 'ProPhoto', 'sRGB'):
+            result = srgb_transform(name).apply(rgb)
+            self.assertEqual(result.dtype, np.uint8)
+            difference = np.abs(result.astype(int) - reference_transform(name, rgb.astype(float)))
+            self.assertLessEqual(difference.max(), 1, name)
+
+    def test_srgb_is_identity(self):
+        rgb = sample_colors()
+        self.assertLessEqual(np.abs(srgb_transform('sRGB').apply(rgb).astype(int) - rgb).max(), 1)
+
+    def test_in_place_image(self):
+        image = sample_colors(20 * 30 - 264).reshape(20, 30, 3)
+        expected = srgb_transform('Adobe').apply(image)
+        self.assertIs(srgb_transform('Adobe').apply(image, out=image), image)
+        np.testing.assert_array_equal(image, expected)
+
+    def test_needs_uint8(self):
+        self.assertRaises(ValueError, srgb_transform('Adobe').apply, np.zeros((2, 3), dtype=np.int32))
+        self.assertRaises(ValueError, srgb_transform('Adobe').apply, np.zeros((2, 4), dtype=np.uint8))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+import numpy as np
+
+from colorfinder import ColorFinder
+from colorfinder.progressive import count_progressive, tile_order
+from testimages import block_image
+
+
+def count_by_color(palette):
+    """A count_tile that counts the pixels of a tile by exact palette color, without segmenting."""
+    def count_tile(tile):
+        rgb = tile.reshape(-1, 3)
+        indices = np.array([palette.index(tuple(color)) for color in rgb.tolist()])
+        return np.arange(len(palette)), np.bincount(indices, minlength=len(palette))
+    return count_tile
+
+
+class CountProgressiveTest(unittest.TestCase):
+    def test_tiles_cover_the_image(self):
+        covered = np.zeros((530, 470), dtype=int)
+        for top, bottom, left, right in tile_order(530, 470):
+            covered[top:bottom, left:right] += 1
+            self.assertGreaterEqual(min(bottom - top, right - left), 50)
+        self.assertTrue((covered == 1).all())
+
+    def test_uniform_image_stops_early(self):
+        image = np.empty((800, 800, 3), dtype=np.uint8)
+        image[...] = (120, 40, 200)
+        counts, consumed = count_progressive(image, count_by_color([(120, 40, 200)]), 1, 0.05)
+        self.assertLess(consumed, 800 * 800 // 2)
+        self.assertEqual(counts.tolist(), [consumed])
+
+    def test_changing_image_is_counted_whole(self):
+        # every tile has its own share of the two colors, so the shares keep moving
+        image = np.empty((400, 400, 3), dtype=np.uint8)
+        rs = np.random.RandomState(0)
+        for top in range(0, 400, 100):
+            for left in range(0, 400, 100):
+                mask = rs.rand(100, 100) < rs.rand()
+                image[top:top + 100, left:left + 100] = np.where(mask[..., np.newaxis], [255, 0, 0], [0, 0, 255])
+        counts, consumed = count_progressive(image, count_by_color([(255, 0, 0), (0, 0, 255)]), 2, 0.001)
+        self.assertEqual(consumed, 400 * 400)
+        self.assertEqual(counts[0], (image[..., 0] == 255).sum())
+
+    def test_find_in_array(self):
+        image = block_image(600, 600, [[(200, 30, 30)]])
+        for backend in ('histogram', 'meanshift'):
+            colors = ColorFinder(backend=backend, progressive=0.05).find_in_array(image)
+            self.assertEqual(len(colors), 1, backend)
+            color = list(colors.values())[0]
+            self.assertLess(color['consumed'], 0.5, backend)
+            self.assertEqual(color['count'], int(round(color['consumed'] * 600 * 600)), backend)
+
+    def test_find_in_array_shares(self):
+        # two colors in every tile, so the shares converge at the same values with both backends
+        image = block_image(600, 600, [[(200, 30, 30), (40, 60, 200)] * 6])
+        for backend in ('histogram', 'meanshift'):
+            colors = ColorFinder(backend=backend, progressive=0.05).find_in_array(image)
+            self.assertEqual(len(colors), 2, backend)
+            counts = [color['count'] for color in colors.values()]
+            self.assertAlmostEqual(counts[0] / float(sum(counts)), 0.5, delta=0.02)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+
+import numpy as np
+
+from colorfinder import segment
+from testimages import gradient_image
+
+
+class SegmentTest(unittest.TestCase):
+    def test_threads_are_deterministic(self):
+        image = gradient_image()
+        single_image, single_labels, single_regions = segment(image, 4, 8, 50, threads=1)
+        for threads in (2, 3, 4):
+            banded_image, banded_labels, banded_regions = segment(image, 4, 8, 50, threads=threads)
+            again_image, again_labels, again_regions = segment(image, 4, 8, 50, threads=threads)
+            np.testing.assert_array_equal(banded_labels, again_labels)
+            np.testing.assert_array_equal(banded_image, again_image)
+            self.assertEqual(banded_regions, again_regions)
+            np.testing.assert_array_equal(banded_labels, single_labels)
+            np.testing.assert_array_equal(banded_image, single_image)
+            self.assertEqual(banded_regions, single_regions)
+
+
+if __name__ == '__main__':
+    unittest.main()
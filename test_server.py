@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import subprocess
+import threading
+import unittest
+try:
+    from urllib.request import Request, urlopen
+    from urllib.error import HTTPError
+except ImportError:
+    from urllib2 import Request, urlopen, HTTPError
+
+from colorfinder import ColorFinder
+from colorfinder.server import ColorFinderService, make_server
+
+samples_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'samples')
+
+
+class ServerTest(unittest.TestCase):
+    def setUp(self):
+        self.finder = ColorFinder(backend='histogram')
+        self.server = make_server(('127.0.0.1', 0), ColorFinderService({'colorchecker_sg': self.finder},
+                                                                       'colorchecker_sg'))
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        self.images = [os.path.join(samples_path, name) for name in ('371', '373')]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def _post(self, path, body, content_type='application/octet-stream'):
+        request = Request(self.url + path, data=body, headers={'Content-Type': content_type})
+        return json.loads(urlopen(request).read().decode('utf-8'))
+
+    def test_find(self):
+        with open(self.images[0], 'rb') as image_file:
+            result = self._post('/find', image_file.read())
+        expected = self.finder.find(self.images[0])
+        self.assertEqual(sorted(result), sorted(expected))
+        for label in expected:
+            self.assertEqual(result[label]['count'], expected[label]['count'])
+
+    def test_batch(self):
+        boundary = 'colorfinder-test-boundary'
+        body = b''
+        for image in self.images:
+            with open(image, 'rb') as image_file:
+                body += ('--%s\r\nContent-Disposition: form-data; name="%s"; filename="%s"\r\n'
+                         'Content-Type: application/octet-stream\r\n\r\n'
+                         % (boundary, os.path.basename(image), os.path.basename(image))).encode('latin-1')
+                body += image_file.read() + b'\r\n'
+        body += ('--%s--\r\n' % boundary).encode('latin-1')
+        result = self._post('/batch', body, 'multipart/form-data; boundary=%s' % boundary)
+        self.assertEqual(sorted(result), ['371', '373'])
+        for image in self.images:
+            self.assertEqual(sorted(result[os.path.basename(image)]), sorted(self.finder.find(image)))
+
+    def test_bad_image(self):
+        with self.assertRaises(HTTPError) as context:
+            self._post('/find', b'not an image')
+        self.assertEqual(context.exception.code, 400)
+
+    def test_metrics(self):
+        with open(self.images[0], 'rb') as image_file:
+            self._post('/find', image_file.read())
+        metrics = urlopen(self.url + '/metrics').read().decode('utf-8')
+        self.assertIn('colorfinder_requests_total{status="200"} 1', metrics)
+        self.assertIn('colorfinder_stage_seconds_count{stage="segment"} 1', metrics)
+
+
+class WarmUpTest(unittest.TestCase):
+    def test_warm_up_loads_lazy_modules(self):
+        # in a fresh interpreter, as this one already imported them
+        code = ('import sys; from colorfinder.server import warm_up; warm_up(); '
+                'print(" ".join(m for m in ("PIL.Image", "PIL.JpegImagePlugin", "_pymeanshift") if m in sys.modules))')
+        loaded = subprocess.check_output([sys.executable, '-c', code]).decode('ascii').split()
+        self.assertEqual(loaded, ['PIL.Image', 'PIL.JpegImagePlugin', '_pymeanshift'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+from colorfinder import ColorFinder
+from colorfinder.backends import HistogramBackend, MeanShiftBackend
+from testimages import block_image
+
+
+class CountingBackend(object):
+    """A backend counting the pixels it segments."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.pixels = 0
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def segment(self, ar, *args, **kwargs):
+        self.pixels += ar.shape[0] * ar.shape[1]
+        return self.backend.segment(ar, *args, **kwargs)
+
+
+def frame(seed=0):
+    """A frame of two halves, with new noise for every seed."""
+    return block_image(240, 300, [[(200, 30, 30), (40, 60, 200)]], noise=2, seed=seed)
+
+
+class FindStreamTest(unittest.TestCase):
+    def make_backend(self):
+        return HistogramBackend()
+
+    def setUp(self):
+        self.backend = CountingBackend(self.make_backend())
+        self.stats = []
+        self.finder = ColorFinder(backend=self.backend, instrument=self.stats.append)
+
+    def test_unchanged_frames_are_skipped(self):
+        # the same frame with new noise, then a frame with a changed corner
+        changed = frame(2)
+        changed[:80, :100] = (30, 160, 40)
+        results = list(self.finder.find_stream([frame(0), frame(1), frame(0), changed]))
+
+        self.assertEqual(results[1], results[0])
+        self.assertEqual(results[2], results[0])
+        self.assertNotEqual(results[3], results[0])
+        self.assertEqual([stats.counts['changed_tiles'] for stats in self.stats[1:3]], [0, 0])
+        self.assertEqual(self.stats[3].counts['changed_tiles'], 1)
+        self.assertNotIn('segment', self.stats[1].stages)
+        # the first frame in full, and one tile of the last one
+        self.assertLess(self.backend.pixels, 240 * 300 * 1.5)
+
+    def test_counts_every_pixel(self):
+        colors = next(self.finder.find_stream([frame()]))
+        self.assertEqual(sum(color['count'] for color in colors.values()), 240 * 300)
+
+    def test_new_size_starts_over(self):
+        small = frame()[:120, :150]
+        results = list(self.finder.find_stream([frame(), small]))
+        self.assertEqual(sum(color['count'] for color in results[1].values()), 120 * 150)
+
+
+class MeanShiftFindStreamTest(FindStreamTest):
+    def make_backend(self):
+        return MeanShiftBackend()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import itertools
+import unittest
+
+import numpy as np
+
+from colorfinder import ColorFinder, rgb_hash_array
+from colorfinder.benchmark import color_agreement
+from colorfinder.tiled import ColorCounts, tile_windows, tile_seams
+from testimages import block_image
+
+
+class ColorCountsTest(unittest.TestCase):
+    def test_merge_is_order_independent(self):
+        rs = np.random.RandomState(0)
+        parts = []
+        for _ in range(4):
+            keys = np.unique(rs.randint(0, 50, 20)).astype(np.uint32)
+            parts.append(ColorCounts(keys, rs.randint(1, 1000, len(keys))))
+        merged = []
+        for order in itertools.permutations(parts):
+            counts = ColorCounts()
+            for part in order:
+                counts = counts.merge(part)
+            merged.append(counts)
+        # and as a tree, as parallel workers would
+        merged.append(parts[0].merge(parts[1]).merge(parts[2].merge(parts[3])))
+        for counts in merged:
+            np.testing.assert_array_equal(counts.keys, merged[0].keys)
+            np.testing.assert_array_equal(counts.counts, merged[0].counts)
+        self.assertEqual(merged[0].total, sum(part.total for part in parts))
+
+    def test_fuse_across_seams(self):
+        # two tiles side by side, whose colors meet along the seam between them, and a color of the left tile
+        # close to the top ones away from the seam
+        top, bottom, close = rgb_hash_array(np.array([(120, 100, 90), (40, 60, 200), (122, 101, 91)]))
+        left = np.array([[close, top, top], [bottom, bottom, bottom]], dtype=np.uint32).repeat(5, axis=0)
+        right = np.array([[top + 1, top + 1, top + 1], [top, top, top]], dtype=np.uint32).repeat(5, axis=0)
+        parts = []
+        for keys, offset in ((left, 0), (right, 3)):
+            colors, counts = np.unique(keys, return_counts=True)
+            parts.append(ColorCounts(colors, counts, tile_seams(keys, 0, offset)))
+        merged = parts[0].merge(parts[1])
+        fused = merged.fuse(12)
+        self.assertEqual(fused.total, merged.total)
+        # the top colors are fused, the bottom one is too far from the top one it meets, the close one does not
+        # meet them
+        self.assertEqual(sorted(fused.counts.tolist()), [5, 15, 40])
+        self.assertIn(close, fused.keys)
+        self.assertIn(bottom, fused.keys)
+        np.testing.assert_array_equal(parts[1].merge(parts[0]).fuse(12).keys, fused.keys)
+        self.assertEqual(len(merged.fuse(0.1)), len(merged))
+
+    def test_windows_cover_the_image(self):
+        covered = np.zeros((700, 900), dtype=int)
+        for outer, inner in tile_windows(700, 900, 256, 16):
+            top, bottom, left, right = outer
+            self.assertTrue(0 <= top and bottom <= 700 and 0 <= left and right <= 900)
+            inner_top, inner_bottom, inner_left, inner_right = inner
+            covered[top + inner_top:top + inner_bottom, left + inner_left:left + inner_right] += 1
+        self.assertTrue((covered == 1).all())
+
+
+class FindTiledTest(unittest.TestCase):
+    def setUp(self):
+        self.image = block_image(600, 700, [[(200, 30, 30), (40, 60, 200)]])
+        self.finder = ColorFinder(backend='histogram')
+
+    def test_counts_every_pixel_once(self):
+        for workers in (1, 3):
+            colors = self.finder.find_tiled(self.image, max_workers=workers)
+            self.assertEqual(sorted(color['count'] for color in colors.values()), [600 * 350, 600 * 350])
+
+    def test_max_dimension_of_arrays(self):
+        with self.assertRaises(ValueError):
+            self.finder.find_tiled(self.image, max_dimension=300)
+
+
+class FindTiledAgreementTest(unittest.TestCase):
+    def setUp(self):
+        self.finder = ColorFinder(counting='regions')
+
+    def check_agreement(self, image, tile_size):
+        whole = self.finder.find_in_array(image)
+        self.assertGreaterEqual(color_agreement(whole, self.finder.find_tiled(image, tile_size=tile_size)), 0.9)
+
+    def test_regions_across_tiles(self):
+        # bands a few levels apart, which the region fusion of the whole image fuses into one region across the
+        # tiles; without fusing the tiles, they are matched with other colors
+        colors = [[(110 + 4 * i, 100 + 4 * i, 95 + 4 * i) for i in range(8)]]
+        self.check_agreement(block_image(200, 400, colors, noise=2), 100)
+
+    def test_distinct_colors_across_tiles(self):
+        self.check_agreement(block_image(400, 400), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
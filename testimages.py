@@ -0,0 +1,31 @@
+"""Synthetic images shared by the tests."""
+from __future__ import division
+
+import numpy as np
+
+# the colors of the four quadrants of block_image by default, as rows of colors
+QUADRANT_COLORS = [[(200, 30, 30), (30, 160, 40)],
+                   [(40, 60, 200), (230, 220, 210)]]
+
+
+def block_image(heigth=60, width=80, colors=QUADRANT_COLORS, noise=3, seed=0):
+    """Blocks of flat color, given as rows of colors that split the image evenly, with uniform noise of up to
+noise levels."""
+    colors = np.asarray(colors, dtype=np.int16)
+    rows = np.arange(heigth) * colors.shape[0] // heigth
+    columns = np.arange(width) * colors.shape[1] // width
+    image = colors[rows[:, np.newaxis], columns[np.newaxis, :]]
+    image += np.random.RandomState(seed).randint(-noise, noise + 1, image.shape).astype(np.int16)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def gradient_image(heigth=90, width=120, seed=0):
+    """Smooth color gradients with noise, so the filter has regions and boundaries to find."""
+    rs = np.random.RandomState(seed)
+    y, x = np.mgrid[:heigth, :width]
+    image = np.empty((heigth, width, 3), dtype=float)
+    image[..., 0] = 255 * x / width
+    image[..., 1] = 255 * y / heigth
+    image[..., 2] = 128 + 100 * np.sin(x / 10.0) * np.cos(y / 15.0)
+    image += rs.normal(0, 6, image.shape)
+    return np.clip(image, 0, 255).astype(np.uint8)